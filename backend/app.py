@@ -2,30 +2,90 @@
 Stock Portfolio Analyzer API
 Main application file
 """
-from flask import Flask, jsonify
+import logging
+import time
+
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 
 from config import Config
-from models import Portfolio
-from services import UnifiedStockService, AIService
-from routes import portfolio_bp, init_routes
+from models import Portfolio, PortfolioStore
+from services import AlertEngine, UnifiedStockService, AIService, CorporateActions, CorrelationTracker, FXService, MetadataResolver, PortfolioOptimizer, ProjectionEngine, RequestProfiler, RiskEngine, SymbolIndex, TickStore
+from services.alert_service import build_notifier
+from services.metrics_service import REQUEST_LATENCY
+from routes import portfolio_bp, init_routes, admin_bp, init_admin_routes
+
+
+def create_app(portfolio=None, stock_service=None, ai_service=None, portfolio_store=None,
+               symbol_index=None, metadata=None, actions=None):
+    """Application factory
 
+    Services default to the ones described by Config; pass replacements to
+    run the app against stub providers (benchmarks, load tests). `portfolio`
+    becomes the default portfolio of a store rooted at Config.PORTFOLIOS_DIR.
+    """
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 
-def create_app():
-    """Application factory"""
     app = Flask(__name__)
     CORS(app)
 
     # Initialize services
-    portfolio = Portfolio(Config.CSV_FILE)
-    stock_service = UnifiedStockService(Config.ALPHA_VANTAGE_API_KEY)
-    ai_service = AIService(Config.GEMINI_API_KEY)
+    if portfolio_store is None:
+        portfolio_store = PortfolioStore(Config.PORTFOLIOS_DIR, portfolio or Portfolio(Config.CSV_FILE))
+    if stock_service is None:
+        stock_service = UnifiedStockService(Config.ALPHA_VANTAGE_API_KEY, Config.MARKET_DATA_MODE,
+                                            Config.MARKET_DATA_RECORDINGS_DIR, Config.REPLAY_OPTIONS,
+                                            Config.PROVIDER_BREAKER_FAILURES, Config.PROVIDER_BREAKER_COOLDOWN,
+                                            Config.PROVIDER_HEDGE_PERCENTILE, Config.PROVIDER_HEDGE_MAX_DELAY)
+    if ai_service is None:
+        ai_service = AIService(Config.GEMINI_API_KEY, Config.GEMINI_MODEL_CACHE_FILE, Config.GEMINI_MODEL)
+    if symbol_index is None:
+        symbol_index = SymbolIndex(Config.SYMBOL_LISTING_FILE, Config.SYMBOL_INDEX_FILE, strict=Config.SYMBOL_STRICT)
+    if metadata is None:
+        metadata = MetadataResolver(Config.METADATA_STORE_FILE, stock_service.get_company_profiles,
+                                    Config.SECTOR_MAP, Config.METADATA_TTL_DAYS)
+
+    risk_engine = RiskEngine(stock_service, Config.RISK_BENCHMARK, Config.RISK_WINDOW_DAYS)
+    correlations = CorrelationTracker(stock_service, Config.CORRELATION_WINDOW_DAYS)
+    projections = ProjectionEngine(risk_engine, Config.PROJECTION_WORKERS or None,
+                                   parallel_threshold=Config.PROJECTION_PARALLEL_PATHS)
+    optimizer = PortfolioOptimizer(risk_engine, Config.RISK_FREE_RATE)
+    fx = FXService(stock_service, Config.BASE_CURRENCY)
+    if actions is None:
+        actions = CorporateActions(Config.CORPORATE_ACTIONS_FILE, stock_service.get_corporate_actions,
+                                   Config.CORPORATE_ACTIONS_REFRESH_HOURS,
+                                   write_wait=Config.CORPORATE_ACTIONS_WAIT_SECONDS)
+    ticks = TickStore(Config.INTRADAY_CAPACITY, Config.INTRADAY_MIN_INTERVAL, Config.INTRADAY_MAX_TICKERS)
+    alerts = AlertEngine(Config.ALERTS_FILE, build_notifier(Config.ALERT_WEBHOOK_URL, Config.ALERT_LOG_FILE))
+    profiler = RequestProfiler(Config.PROFILE_DIR, Config.PROFILE_SAMPLE_EVERY,
+                               Config.PROFILE_INTERVAL_MS, admin_token=Config.ADMIN_TOKEN)
 
     # Initialize routes with dependencies
-    init_routes(portfolio, stock_service, ai_service, Config.SECTOR_MAP)
+    init_routes(portfolio_store, stock_service, ai_service, metadata, symbol_index, risk_engine, correlations,
+                projections, optimizer, alerts, fx, actions, ticks)
+    init_admin_routes(profiler)
 
     # Register blueprints
     app.register_blueprint(portfolio_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+
+    # Profile API views on demand (X-Profile header, ?profile=1) or by sampling
+    for endpoint, view in app.view_functions.items():
+        if endpoint.startswith('portfolio.'):
+            app.view_functions[endpoint] = profiler.wrap(view)
+
+    # Per-route latency for /api/metrics
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        if 'request_start' in g:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.observe(time.perf_counter() - g.request_start,
+                                    method=request.method, route=route, status=response.status_code)
+        return response
 
     # Error handlers
     @app.errorhandler(404)
@@ -54,14 +114,29 @@ if __name__ == '__main__':
 
     print("\nAPI Documentation:")
     print("   GET  /api/health            - Health check")
+    print("   GET  /api/portfolios        - List portfolios (POST to create)")
+    print("   POST /api/portfolios/refresh-prices - Refresh all portfolios at once")
+    print("   ...  /api/portfolios/<id>/...  - Any portfolio route scoped to one portfolio")
     print("   GET  /api/portfolio         - Get complete portfolio")
     print("   GET  /api/holdings          - Get all holdings")
     print("   POST /api/holdings          - Add new holding")
     print("   DELETE /api/holdings/<id>   - Delete holding")
+    print("   POST /api/transactions      - Record buys, sells and splits in the ledger")
+    print("   GET  /api/positions         - Ledger positions, cost basis and realized P&L")
+    print("   GET  /api/symbols?prefix=   - Ticker autocomplete from the local symbol index")
     print("   POST /api/refresh-prices    - Refresh stock prices")
     print("   GET  /api/portfolio-history - Get portfolio history")
     print("   GET  /api/sector-breakdown  - Get sector allocation")
     print("   GET  /api/portfolio-metrics - Get detailed metrics")
+    print("   GET  /api/risk              - Volatility, beta, VaR and max drawdown")
+    print("   GET  /api/correlation       - Rolling correlation matrix and diversification")
+    print("   GET  /api/projection        - Monte Carlo projection with percentile bands")
+    print("   POST /api/optimize          - Min-variance / max-Sharpe target weights and trades")
+    print("   GET  /api/intraday/<ticker> - Intraday sparkline from recorded quotes")
+    print("   GET  /api/export/holdings   - Arrow/Parquet exports (also /export/values, /export/prices)")
+    print("   GET  /api/alerts            - Price alerts (POST to create, DELETE /api/alerts/<id>)")
     print("   POST /api/ai-insights       - Get AI-powered portfolio insights")
+    print("   GET  /api/metrics           - Prometheus metrics")
+    print("   GET  /api/admin/profiles    - Recent request profiles (add ?profile=1 to any request)")
 
     app.run(debug=Config.DEBUG, host=Config.HOST, port=Config.PORT)
\ No newline at end of file
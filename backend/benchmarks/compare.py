@@ -0,0 +1,49 @@
+"""
+Compare two benchmark reports produced by benchmarks.suite
+
+Usage (from the backend directory):
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 1.2]
+
+Exits with status 1 when any case's median latency regressed by more than
+the threshold ratio, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path: str) -> dict:
+    """Index a report's results by (case name, portfolio size)"""
+    with open(path, 'r') as file:
+        report = json.load(file)
+    return {(r['name'], r['size']): r for r in report['results']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='median latency ratio treated as a regression')
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+
+    regressions = 0
+    print(f"{'case':<55} {'size':>7} {'base ms':>10} {'new ms':>10} {'ratio':>7} {'peak kb':>10}")
+    for key in sorted(baseline.keys() & candidate.keys(), key=lambda k: (k[1], k[0])):
+        old, new = baseline[key], candidate[key]
+        ratio = new['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{key[0]:<55} {key[1]:>7} {old['median_ms']:>10.3f} {new['median_ms']:>10.3f} "
+              f"{ratio:>7.2f} {new['peak_kb']:>10.1f}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
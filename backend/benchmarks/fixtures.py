@@ -0,0 +1,178 @@
+"""
+Synthetic portfolios, price histories and stub providers for offline benchmarks
+
+Everything here is deterministic for a given seed and never touches the
+network, so benchmark numbers only reflect the backend's own work.
+"""
+import datetime
+import random
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Optional, List, Dict
+
+from config import Config
+from services import SymbolIndex
+from services.symbol_index import write_index
+
+SECTORS = sorted(set(Config.SECTOR_MAP.values())) + ['Other']
+
+PERIOD_DAYS = {
+    '5d': 5,
+    '1mo': 30,
+    '3mo': 90,
+    '6mo': 180,
+    '1y': 365,
+    '2y': 730,
+    '5y': 1825,
+    '10y': 3650
+}
+
+
+def synthetic_ticker(index: int) -> str:
+    """Deterministic fake ticker symbol for position `index`"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def synthetic_symbol_index(count: int, index_file: str) -> SymbolIndex:
+    """Strict symbol index listing synthetic_ticker(0) .. synthetic_ticker(count - 1)"""
+    write_index({synthetic_ticker(i): f'Synthetic Corp {i}' for i in range(count)}, index_file)
+    return SymbolIndex(None, index_file, strict=True)
+
+
+def generate_holdings(count: int, seed: int = 42) -> List[Dict]:
+    """Build `count` holdings in the same shape Portfolio.load_holdings returns"""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    holdings = []
+    for i in range(count):
+        buy_price = round(rng.uniform(5, 900), 2)
+        holdings.append({
+            'id': i + 1,
+            'ticker': synthetic_ticker(i),
+            'shares': float(rng.randint(1, 500)),
+            'buy_price': buy_price,
+            'current_price': round(buy_price * rng.uniform(0.5, 2.5), 2),
+            'purchase_date': (today - datetime.timedelta(days=rng.randint(30, 3650))).strftime('%Y-%m-%d'),
+            'sector': rng.choice(SECTORS)
+        })
+    return holdings
+
+
+@lru_cache(maxsize=16)
+def _business_days(days: int) -> tuple:
+    """(date, formatted_date) strings for weekdays in the last `days` days"""
+    start = datetime.date.today() - datetime.timedelta(days=days)
+    dates = (start + datetime.timedelta(days=offset) for offset in range(days + 1))
+    return tuple((d.isoformat(), d.strftime('%b %d')) for d in dates if d.weekday() < 5)
+
+
+@lru_cache(maxsize=1024)
+def generate_price_history(ticker: str, days: int, seed: int = 42) -> tuple:
+    """Geometric random walk of business-day OHLCV rows ending today"""
+    rng = random.Random(f"{seed}-{ticker}")
+    price = rng.uniform(20, 500)
+    rows = []
+    for date_str, formatted_date in _business_days(days):
+        open_price = price
+        price = max(0.5, price * (1 + rng.gauss(0.0003, 0.018)))
+        spread = abs(rng.gauss(0, 0.005))
+        rows.append({
+            'date': date_str,
+            'formatted_date': formatted_date,
+            'price': round(price, 2),
+            'open': round(open_price, 2),
+            'high': round(max(open_price, price) * (1 + spread), 2),
+            'low': round(min(open_price, price) * (1 - spread), 2),
+            'volume': rng.randint(100_000, 50_000_000)
+        })
+    return tuple(rows)
+
+
+class StubStockService:
+    """Drop-in replacement for UnifiedStockService backed by synthetic data"""
+
+    refresh_delay = 0
+
+    def __init__(self, seed: int = 42):
+        self.seed = seed
+
+    def get_real_time_price(self, ticker: str) -> Optional[float]:
+        """Deterministic per-ticker quote (cheap, so it does not skew route timings)"""
+        return round(random.Random(f"{self.seed}-{ticker}-quote").uniform(20, 500), 2)
+
+    def get_real_time_prices(self, tickers: List[str]) -> Dict[str, Optional[float]]:
+        return {ticker.upper(): self.get_real_time_price(ticker.upper()) for ticker in tickers}
+
+    def get_historical_price(self, ticker: str, date_str: str) -> Optional[float]:
+        """Close on or before `date_str` from a 10-year synthetic history"""
+        history = generate_price_history(ticker, PERIOD_DAYS['10y'], self.seed)
+        price = None
+        for row in history:
+            if row['date'] > date_str:
+                break
+            price = row['price']
+        return price if price is not None else history[0]['price']
+
+    def get_historical_prices_bulk(self, dates_by_ticker: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """Closes for many (ticker, date) pairs, one synthetic history per ticker"""
+        resolved = {}
+        for ticker, dates in dates_by_ticker.items():
+            history = generate_price_history(ticker, PERIOD_DAYS['10y'], self.seed)
+            history_dates = [row['date'] for row in history]
+            resolved[ticker] = {
+                'prices': {d: history[max(bisect_right(history_dates, d) - 1, 0)]['price'] for d in dates},
+                'latest': history[-1]['price']
+            }
+        return resolved
+
+    def get_close_histories(self, tickers: List[str], start_date: str) -> Dict[str, List]:
+        """Daily (date, close) pairs since start_date from the 10-year synthetic history"""
+        histories = {}
+        for ticker in tickers:
+            history = generate_price_history(ticker, PERIOD_DAYS['10y'], self.seed)
+            dates = [row['date'] for row in history]
+            histories[ticker] = [(row['date'], row['price']) for row in history[bisect_left(dates, start_date):]]
+        return histories
+
+    def get_stock_history(self, ticker: str, period: str = '1mo') -> List[Dict]:
+        """Synthetic OHLCV rows covering `period`"""
+        return list(generate_price_history(ticker, PERIOD_DAYS.get(period, 30), self.seed))
+
+    def get_corporate_actions(self, tickers: List[str]) -> Dict[str, Dict]:
+        """No splits or dividends (the synthetic histories have none)"""
+        return {ticker: {'splits': [], 'dividends': []} for ticker in tickers}
+
+    def get_company_profiles(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Deterministic sector per ticker"""
+        return {ticker: {'sector': random.Random(f"{self.seed}-{ticker}-sector").choice(SECTORS[:-1]),
+                         'industry': None, 'name': f'{ticker} Corp'} for ticker in tickers}
+
+
+class StubAIService:
+    """Drop-in replacement for AIService that answers instantly"""
+
+    def is_configured(self) -> bool:
+        return True
+
+    def generate_portfolio_insights(self, portfolio_context: Dict) -> str:
+        return f"Stub insights for {portfolio_context['total_holdings']} holdings"
+
+    def answer_question(self, portfolio_context: Dict, question: str) -> str:
+        return f"Stub answer to: {question}"
+
+    def generate_suggestions(self, portfolio_context: Dict) -> List[Dict]:
+        return self._get_fallback_suggestions()
+
+    def _get_fallback_suggestions(self) -> List[Dict]:
+        return [
+            {
+                'title': 'Stub suggestion',
+                'description': 'Synthetic suggestion for benchmarking',
+                'recommendation': 'No action required.'
+            }
+        ]
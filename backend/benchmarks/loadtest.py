@@ -0,0 +1,292 @@
+"""
+HTTP load generator and capacity report
+
+Serves the app from create_app() on a local threaded server backed by stub
+(or replayed) market data and a stub AI service, then drives a weighted mix
+of user scenarios at increasing concurrency. Each stage reports throughput
+and p50/p95/p99 latency per endpoint; the report ends with the saturation
+point and the highest concurrency that stayed within the latency SLO.
+
+Usage (from the backend directory):
+    python -m benchmarks.loadtest [--concurrency 1 2 4 8 16 32] [--duration 10]
+                                  [--holdings 50] [--provider stub|replay]
+                                  [--mix dashboard=70,holdings=10,refresh=5,ai=15]
+                                  [--slo-ms 500] [--output loadtest.json]
+"""
+import argparse
+import datetime
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from config import Config
+from models import Portfolio
+from services import CorporateActions, MetadataResolver, UnifiedStockService
+from .fixtures import StubStockService, StubAIService, generate_holdings, synthetic_symbol_index, synthetic_ticker
+from .suite import git_commit
+
+DEFAULT_MIX = 'dashboard=70,holdings=10,refresh=5,ai=15'
+# Listed synthetic tickers the holdings scenario adds, beyond those already held
+ADDABLE_TICKERS = 100_000
+
+
+class LoadClient:
+    """Issues requests and records per-endpoint latencies"""
+
+    def __init__(self, base_url: str, first_ticker: int):
+        self.base_url = base_url
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+        self._ticker_ids = itertools.cycle(range(first_ticker, first_ticker + ADDABLE_TICKERS))
+
+    def request(self, method: str, path: str, endpoint: str, payload=None):
+        """Send one request; `endpoint` is the label results are grouped under"""
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        body = None
+        failed = False
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                body = response.read()
+        except (urllib.error.URLError, OSError):
+            failed = True
+        elapsed = (time.perf_counter() - start) * 1000
+
+        label = f'{method} {endpoint}'
+        with self._lock:
+            self.latencies[label].append(elapsed)
+            if failed:
+                self.errors[label] += 1
+        return json.loads(body) if body else None
+
+    def next_ticker(self) -> str:
+        with self._lock:
+            index = next(self._ticker_ids)
+        return synthetic_ticker(index)
+
+
+def dashboard(client: LoadClient, rng: random.Random) -> None:
+    """A user opening the home page"""
+    client.request('GET', '/api/portfolio', '/api/portfolio')
+    client.request('GET', '/api/portfolio-metrics', '/api/portfolio-metrics')
+    client.request('GET', '/api/portfolio-history?days=30', '/api/portfolio-history')
+    client.request('GET', '/api/sector-breakdown', '/api/sector-breakdown')
+
+
+def holdings(client: LoadClient, rng: random.Random) -> None:
+    """A user adding a position, viewing holdings, then removing it"""
+    created = client.request('POST', '/api/holdings', '/api/holdings', {
+        'ticker': client.next_ticker(),
+        'shares': rng.randint(1, 100),
+        'purchase_date': '2023-06-15'
+    })
+    client.request('GET', '/api/holdings', '/api/holdings')
+    if created and 'holding' in created:
+        client.request('DELETE', f"/api/holdings/{created['holding']['id']}", '/api/holdings/<id>')
+
+
+def refresh(client: LoadClient, rng: random.Random) -> None:
+    """A user pressing refresh prices"""
+    client.request('POST', '/api/refresh-prices', '/api/refresh-prices', {})
+
+
+def ai(client: LoadClient, rng: random.Random) -> None:
+    """A user on the insights page asking a question"""
+    client.request('GET', '/api/ai-suggestions', '/api/ai-suggestions')
+    client.request('POST', '/api/ai-chat', '/api/ai-chat', {'question': 'Where is my biggest risk?'})
+
+
+SCENARIOS = {
+    'dashboard': dashboard,
+    'holdings': holdings,
+    'refresh': refresh,
+    'ai': ai
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse 'dashboard=70,ai=30' into scenario weights"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_stage(base_url: str, concurrency: int, duration: float, weights: Dict[str, float], seed: int,
+              first_ticker: int) -> Dict:
+    """Run `concurrency` simulated users for `duration` seconds"""
+    client = LoadClient(base_url, first_ticker)
+    names = list(weights)
+    deadline = time.perf_counter() + duration
+
+    def user(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(names, weights=[weights[n] for n in names])[0]
+            SCENARIOS[scenario](client, rng)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=user, args=(i,)) for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    all_latencies = []
+    for label, values in sorted(client.latencies.items()):
+        values.sort()
+        all_latencies.extend(values)
+        endpoints[label] = {
+            'requests': len(values),
+            'errors': client.errors[label],
+            'throughput_rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+            'mean_ms': round(statistics.mean(values), 2)
+        }
+    all_latencies.sort()
+    total = len(all_latencies)
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'requests': total,
+        'errors': sum(client.errors.values()),
+        'throughput_rps': round(total / elapsed, 2),
+        'p50_ms': round(percentile(all_latencies, 50), 2) if total else None,
+        'p95_ms': round(percentile(all_latencies, 95), 2) if total else None,
+        'p99_ms': round(percentile(all_latencies, 99), 2) if total else None,
+        'endpoints': endpoints
+    }
+
+
+def capacity(stages: List[Dict], slo_ms: float, min_gain: float = 0.05, max_error_rate: float = 0.01) -> Dict:
+    """Find where throughput stops scaling and the largest stage within the SLO"""
+    saturation = None
+    for previous, current in zip(stages, stages[1:]):
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 + min_gain):
+            saturation = previous['concurrency']
+            break
+
+    within_slo = [s for s in stages if s['p95_ms'] is not None and s['p95_ms'] <= slo_ms
+                  and s['errors'] <= s['requests'] * max_error_rate]
+    return {
+        'slo_p95_ms': slo_ms,
+        'saturation_concurrency': saturation,
+        'peak_throughput_rps': max(s['throughput_rps'] for s in stages),
+        'max_concurrency_within_slo': within_slo[-1]['concurrency'] if within_slo else None
+    }
+
+
+def build_app(provider: str, holding_count: int, data_dir: str):
+    """create_app() wired to stub or replayed providers and a synthetic portfolio"""
+    portfolio = Portfolio(os.path.join(data_dir, 'holdings.csv'))
+    portfolio.save_holdings(generate_holdings(holding_count))
+    if provider == 'replay':
+        stock_service = UnifiedStockService(None, 'replay', Config.MARKET_DATA_RECORDINGS_DIR, Config.REPLAY_OPTIONS)
+    else:
+        stock_service = StubStockService()
+    symbol_index = synthetic_symbol_index(holding_count + ADDABLE_TICKERS, os.path.join(data_dir, 'symbols.idx'))
+    metadata = MetadataResolver(os.path.join(data_dir, 'metadata.db'), stock_service.get_company_profiles,
+                                Config.SECTOR_MAP)
+    actions = CorporateActions(os.path.join(data_dir, 'corporate_actions.db'), stock_service.get_corporate_actions)
+    return create_app(portfolio=portfolio, stock_service=stock_service, ai_service=StubAIService(),
+                      symbol_index=symbol_index, metadata=metadata, actions=actions)
+
+
+def print_stage(stage: Dict) -> None:
+    print(f"\nconcurrency={stage['concurrency']}  {stage['throughput_rps']} req/s  "
+          f"p50={stage['p50_ms']}ms p95={stage['p95_ms']}ms p99={stage['p99_ms']}ms  "
+          f"errors={stage['errors']}", file=sys.stderr)
+    for label, e in stage['endpoints'].items():
+        print(f"  {label:<32} {e['requests']:>6} req {e['throughput_rps']:>8} rps  "
+              f"p50={e['p50_ms']:>8} p95={e['p95_ms']:>8} p99={e['p99_ms']:>8}  err={e['errors']}",
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                        help='simulated concurrent users per stage')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per stage')
+    parser.add_argument('--holdings', type=int, default=50, help='holdings in the synthetic portfolio')
+    parser.add_argument('--provider', choices=['stub', 'replay'], default='stub',
+                        help='market data source (replay uses MARKET_DATA_RECORDINGS_DIR)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='scenario weights')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p95 latency objective')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='loadtest_results.json', help='where to write the JSON report')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as data_dir:
+        app = build_app(args.provider, args.holdings, data_dir)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        stages = []
+        try:
+            for concurrency in args.concurrency:
+                stage = run_stage(base_url, concurrency, args.duration, weights, args.seed, args.holdings)
+                print_stage(stage)
+                stages.append(stage)
+        finally:
+            server.shutdown()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'holdings': args.holdings,
+            'provider': args.provider,
+            'mix': weights,
+            'duration_s': args.duration
+        },
+        'stages': stages,
+        'capacity': capacity(stages, args.slo_ms)
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    summary = report['capacity']
+    print(f"\nPeak throughput: {summary['peak_throughput_rps']} req/s", file=sys.stderr)
+    print(f"Throughput saturates at: {summary['saturation_concurrency'] or 'not reached'} concurrent users", file=sys.stderr)
+    print(f"Max concurrent users with p95 <= {args.slo_ms}ms: {summary['max_concurrency_within_slo']}", file=sys.stderr)
+    print(f"Wrote report to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Startup-time benchmark
+
+Measures how long a fresh interpreter takes to import the app and build it
+with create_app(). Each run happens in its own subprocess so module caches
+from earlier runs do not hide import cost.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup [--runs 10] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SNIPPET = """
+import time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+ready = time.perf_counter()
+print(f"{imported - start} {ready - imported}")
+"""
+
+
+def run_once() -> dict:
+    """Start one interpreter and return its import and create_app timings"""
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SNIPPET],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    import_time, create_time = map(float, result.stdout.strip().splitlines()[-1].split())
+    return {'import': import_time, 'create_app': create_time, 'total': import_time + create_time}
+
+
+def slowest_imports(limit: int = 15) -> list:
+    """Return the modules with the highest cumulative import time"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # Format: "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        rows.append({'module': name.strip(), 'cumulative_ms': int(cumulative_us) / 1000})
+    rows.sort(key=lambda r: r['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='number of cold starts to time')
+    parser.add_argument('--importtime', action='store_true', help='include the slowest imports')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    report = {'runs': args.runs}
+    for key in ('import', 'create_app', 'total'):
+        values = [r[key] for r in runs]
+        report[key] = {
+            'min_ms': round(min(values) * 1000, 2),
+            'median_ms': round(statistics.median(values) * 1000, 2),
+            'max_ms': round(max(values) * 1000, 2)
+        }
+    if args.importtime:
+        report['slowest_imports'] = slowest_imports()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
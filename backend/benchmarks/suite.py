@@ -0,0 +1,211 @@
+"""
+Offline benchmark suite for API routes and portfolio analytics
+
+Builds synthetic portfolios of increasing size, runs the app from
+create_app() against stub market-data and AI providers, and records latency
+and peak Python memory for every route plus the Portfolio model operations.
+Results are written as JSON so runs from different commits can be compared
+with benchmarks.compare.
+
+Usage (from the backend directory):
+    python -m benchmarks.suite [--sizes 10 100 1000 10000 100000]
+                               [--iterations 5] [--output results.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from app import create_app
+from config import Config
+from models import Portfolio
+from services import CorporateActions, MetadataResolver
+from .fixtures import StubStockService, StubAIService, generate_holdings, synthetic_symbol_index, synthetic_ticker
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def measure(fn: Callable, iterations: int, setup: Optional[Callable] = None) -> Dict:
+    """Time `fn` over several iterations, then measure its peak allocation once
+
+    `setup`, when given, runs untimed before every call.
+    """
+    timings = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'min_ms': round(timings[0], 3),
+        'max_ms': round(timings[-1], 3),
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+
+def expect_ok(response) -> None:
+    """Fail loudly if a benchmarked route did not succeed"""
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.path} -> "
+                           f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+
+def model_cases(portfolio: Portfolio, holdings: List[Dict]) -> Dict[str, Callable]:
+    """Portfolio model operations to benchmark"""
+    return {
+        'Portfolio.load_holdings': portfolio.load_holdings,
+        'Portfolio.save_holdings': lambda: portfolio.save_holdings(holdings),
+        'Portfolio.calculate_metrics': lambda: portfolio.calculate_metrics(holdings),
+        'Portfolio.get_best_worst_performers': lambda: portfolio.get_best_worst_performers(holdings)
+    }
+
+
+def route_cases(client, size: int) -> Dict:
+    """One callable per route in portfolio_routes, sized for `size` holdings
+
+    A case may be a (fn, setup) pair when it needs untimed preparation.
+    """
+    added_ids = []
+    counter = iter(range(size, size * 10 + 1000))
+    sample_ticker = synthetic_ticker(0)
+
+    def get(path):
+        return lambda: expect_ok(client.get(path))
+
+    def post(path, payload=None):
+        return lambda: expect_ok(client.post(path, json=payload or {}))
+
+    def add_holding():
+        response = client.post('/api/holdings', json={
+            'ticker': synthetic_ticker(next(counter)),
+            'shares': 10,
+            'purchase_date': '2022-03-15'
+        })
+        expect_ok(response)
+        added_ids.append(response.get_json()['holding']['id'])
+
+    import_lots = [{'ticker': synthetic_ticker(i % max(size // 10, 1)), 'shares': 1, 'purchase_date': '2022-03-15'}
+                   for i in range(min(size, 5000))]
+
+    def delete_holding():
+        expect_ok(client.delete(f"/api/holdings/{added_ids.pop()}"))
+
+    return {
+        'GET /api/health': get('/api/health'),
+        'GET /api/portfolio': get('/api/portfolio'),
+        'GET /api/holdings': get('/api/holdings'),
+        'GET /api/holdings?limit=50&sort=-value': get('/api/holdings?limit=50&sort=-value'),
+        'POST /api/holdings': add_holding,
+        'DELETE /api/holdings/<id>': (delete_holding, add_holding),
+        'POST /api/holdings/import': post('/api/holdings/import', {'holdings': import_lots}),
+        'POST /api/refresh-prices': post('/api/refresh-prices'),
+        'POST /api/portfolios/refresh-prices': post('/api/portfolios/refresh-prices'),
+        'GET /api/stock-history/<ticker>?period=5y': get(f'/api/stock-history/{sample_ticker}?period=5y'),
+        'GET /api/stock-history/<ticker>?period=5y&format=columns&points=500':
+            get(f'/api/stock-history/{sample_ticker}?period=5y&format=columns&points=500'),
+        'GET /api/real-time-prices': get('/api/real-time-prices'),
+        'GET /api/portfolio-history?days=1825': get('/api/portfolio-history?days=1825'),
+        'GET /api/portfolio-history?days=1825&format=columns&points=500':
+            get('/api/portfolio-history?days=1825&format=columns&points=500'),
+        'GET /api/sector-breakdown': get('/api/sector-breakdown'),
+        'GET /api/portfolio-metrics': get('/api/portfolio-metrics'),
+        'GET /api/risk': get('/api/risk'),
+        'GET /api/correlation': get('/api/correlation'),
+        'GET /api/projection': get('/api/projection?seed=1'),
+        'POST /api/optimize': post('/api/optimize', {'objective': 'max_sharpe', 'max_weight': 0.2}),
+        'POST /api/ai-insights': post('/api/ai-insights'),
+        'POST /api/ai-chat': post('/api/ai-chat', {'question': 'How diversified am I?'}),
+        'GET /api/ai-suggestions': get('/api/ai-suggestions')
+    }
+
+
+def run_size(size: int, iterations: int, data_dir: str) -> List[Dict]:
+    """Benchmark every case against a portfolio of `size` holdings"""
+    holdings = generate_holdings(size)
+    portfolio = Portfolio(os.path.join(data_dir, f'holdings_{size}.csv'))
+    portfolio.save_holdings(holdings)
+
+    # Covers every ticker route_cases can add
+    symbol_index = synthetic_symbol_index(size * 10 + 1000, os.path.join(data_dir, f'symbols_{size}.idx'))
+    stock_service = StubStockService()
+    metadata = MetadataResolver(os.path.join(data_dir, f'metadata_{size}.db'), stock_service.get_company_profiles,
+                                Config.SECTOR_MAP)
+    actions = CorporateActions(os.path.join(data_dir, f'corporate_actions_{size}.db'), stock_service.get_corporate_actions)
+    app = create_app(portfolio=portfolio, stock_service=stock_service, ai_service=StubAIService(),
+                     symbol_index=symbol_index, metadata=metadata, actions=actions)
+    client = app.test_client()
+
+    results = []
+    cases = {**model_cases(portfolio, holdings), **route_cases(client, size)}
+    for name, case in cases.items():
+        fn, setup = case if isinstance(case, tuple) else (case, None)
+        print(f"  {name} ({size} holdings)", file=sys.stderr)
+        results.append({'name': name, 'size': size, **measure(fn, iterations, setup)})
+        # Mutating routes must not leak into the next case
+        portfolio.save_holdings(holdings)
+    return results
+
+
+def git_commit() -> str:
+    """Current commit hash, or 'unknown' outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='portfolio sizes to test')
+    parser.add_argument('--iterations', type=int, default=5, help='timed iterations per case')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the JSON report')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        for size in args.sizes:
+            results.extend(run_size(size, args.iterations, data_dir))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'sizes': args.sizes
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
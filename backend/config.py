@@ -13,16 +13,84 @@ class Config:
     DEBUG = True
     HOST = '0.0.0.0'
     PORT = 5000
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
 
     # API Configuration
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL')  # Skips model discovery when set
 
     # File paths
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     CSV_FILE = os.path.join(BASE_DIR, 'portfolio_holdings.csv')
+    PORTFOLIOS_DIR = os.path.join(BASE_DIR, 'portfolios')  # Additional portfolios, one CSV each
+    GEMINI_MODEL_CACHE_FILE = os.path.join(BASE_DIR, '.gemini_model_cache.json')
 
-    # Sector mapping for stocks
+    # Request profiling: flag a request with ?profile=1 or the X-Profile header,
+    # or profile one in every PROFILE_SAMPLE_EVERY requests (0 disables sampling)
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+    PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '1'))
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')  # Required for profiling and /api/admin; unset allows loopback only
+
+    # Market data source: 'live', 'record' (live + save responses) or 'replay' (offline)
+    MARKET_DATA_MODE = os.getenv('MARKET_DATA_MODE', 'live')
+    MARKET_DATA_RECORDINGS_DIR = os.getenv('MARKET_DATA_RECORDINGS_DIR', os.path.join(BASE_DIR, 'recordings'))
+    REPLAY_OPTIONS = {
+        'latency_ms': float(os.getenv('REPLAY_LATENCY_MS', '0')),
+        'latency_sigma': float(os.getenv('REPLAY_LATENCY_SIGMA', '0.5')),
+        'error_rate': float(os.getenv('REPLAY_ERROR_RATE', '0')),
+        'rate_limit_rate': float(os.getenv('REPLAY_RATE_LIMIT_RATE', '0')),
+        'requests_per_minute': int(os.getenv('REPLAY_REQUESTS_PER_MINUTE')) if os.getenv('REPLAY_REQUESTS_PER_MINUTE') else None,
+        'seed': int(os.getenv('REPLAY_SEED')) if os.getenv('REPLAY_SEED') else None
+    }
+
+    # Provider resilience: skip a provider for a cool-down after repeated failures, and
+    # start a Yahoo Finance backup once a lookup runs past Alpha Vantage's recent p95 latency
+    PROVIDER_BREAKER_FAILURES = int(os.getenv('PROVIDER_BREAKER_FAILURES', '5'))
+    PROVIDER_BREAKER_COOLDOWN = float(os.getenv('PROVIDER_BREAKER_COOLDOWN', '60'))
+    PROVIDER_HEDGE_PERCENTILE = float(os.getenv('PROVIDER_HEDGE_PERCENTILE', '95'))
+    PROVIDER_HEDGE_MAX_DELAY = float(os.getenv('PROVIDER_HEDGE_MAX_DELAY', '2'))
+
+    # Ticker symbol index: validation and /api/symbols autocomplete without network calls.
+    # Refresh the listing with `python -m services.symbol_index --refresh`
+    SYMBOL_LISTING_FILE = os.getenv('SYMBOL_LISTING_FILE', os.path.join(BASE_DIR, 'data', 'symbols.txt'))
+    SYMBOL_INDEX_FILE = os.getenv('SYMBOL_INDEX_FILE', os.path.join(BASE_DIR, 'symbols.idx'))
+    SYMBOL_STRICT = os.getenv('SYMBOL_STRICT', 'false').lower() == 'true'  # Reject unlisted tickers outright
+
+    # Company metadata (sector, industry, name) fetched in the background and cached on disk
+    METADATA_STORE_FILE = os.getenv('METADATA_STORE_FILE', os.path.join(BASE_DIR, 'metadata.db'))
+    METADATA_TTL_DAYS = float(os.getenv('METADATA_TTL_DAYS', '30'))
+
+    # Risk analytics: benchmark for beta and the default look-back in trading days
+    RISK_BENCHMARK = os.getenv('RISK_BENCHMARK', 'SPY')
+    RISK_WINDOW_DAYS = int(os.getenv('RISK_WINDOW_DAYS', '252'))
+    CORRELATION_WINDOW_DAYS = int(os.getenv('CORRELATION_WINDOW_DAYS', '63'))
+    RISK_FREE_RATE = float(os.getenv('RISK_FREE_RATE', '0.04'))  # Annual rate for Sharpe ratios in /api/optimize
+    # Monte Carlo projections: runs this large fan out to a process pool (0 workers = CPU count)
+    PROJECTION_PARALLEL_PATHS = int(os.getenv('PROJECTION_PARALLEL_PATHS', '200000'))
+    PROJECTION_WORKERS = int(os.getenv('PROJECTION_WORKERS', '0'))
+
+    # Currency portfolio values are reported in (override per request with ?currency=)
+    BASE_CURRENCY = os.getenv('BASE_CURRENCY', 'USD')
+
+    # Splits and dividends per ticker, cached on disk and refetched in the background after this many hours
+    CORPORATE_ACTIONS_FILE = os.getenv('CORPORATE_ACTIONS_FILE', os.path.join(BASE_DIR, 'corporate_actions.db'))
+    CORPORATE_ACTIONS_REFRESH_HOURS = float(os.getenv('CORPORATE_ACTIONS_REFRESH_HOURS', '24'))
+    # Longest a write (adding a holding, recording trades) waits for a ticker's actions on first sight
+    CORPORATE_ACTIONS_WAIT_SECONDS = float(os.getenv('CORPORATE_ACTIONS_WAIT_SECONDS', '2'))
+
+    # Intraday sparklines: quotes kept per ticker in a fixed ring buffer (8 bytes each), for at most this many tickers
+    INTRADAY_CAPACITY = int(os.getenv('INTRADAY_CAPACITY', '2048'))
+    INTRADAY_MIN_INTERVAL = float(os.getenv('INTRADAY_MIN_INTERVAL', '5'))  # Seconds; faster price changes replace the last tick
+    INTRADAY_MAX_TICKERS = int(os.getenv('INTRADAY_MAX_TICKERS', '10000'))
+
+    # Price alerts: rules are stored in ALERTS_FILE; triggered alerts go to the webhook when set, else ALERT_LOG_FILE
+    ALERTS_FILE = os.getenv('ALERTS_FILE', os.path.join(BASE_DIR, 'alerts.json'))
+    ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL')
+    ALERT_LOG_FILE = os.getenv('ALERT_LOG_FILE', os.path.join(BASE_DIR, 'alerts.log.jsonl'))
+
+    # Sector overrides; any other ticker is resolved through the metadata store
     SECTOR_MAP = {
         'AAPL': 'Technology',
         'GOOGL': 'Technology',
@@ -0,0 +1 @@
+"""Pytest configuration: tests import the backend packages (models, services) from this directory"""
@@ -1,4 +1,8 @@
 """Models package"""
-from .portfolio import Portfolio
+from .holdings_index import HoldingsIndex
+from .ledger import Position, TransactionLedger
+from .portfolio import HoldingsSnapshot, Portfolio, VersionConflict
+from .portfolio_store import PortfolioStore
 
-__all__ = ['Portfolio']
\ No newline at end of file
+__all__ = ['HoldingsIndex', 'HoldingsSnapshot', 'Portfolio', 'PortfolioStore', 'Position', 'TransactionLedger',
+           'VersionConflict']
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Sorted views of a portfolio's holdings for paged queries
+
+A HoldingsIndex is built from one snapshot of the holdings and answers
+sorted, filtered pages with a binary search plus a slice. Sort orders are
+built on first use, per field, sector and ticker prefix; when a few
+holdings change, HoldingsIndex.updated derives the next index by moving
+just those rows within copies of the cached orders, so the previous index
+stays intact for readers still paging it. Pagination uses keyset cursors
+(the last row's sort key and id), so a cursor stays valid when rows are
+added or removed between pages.
+"""
+import base64
+import binascii
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+SORT_FIELDS = ('id', 'ticker', 'value', 'return', 'weight', 'date')
+# Prefix orders kept per index; the oldest is dropped past this
+PREFIX_ORDERS = 256
+# Rows an update may move within one sort order before the order is rebuilt instead
+MOVE_LIMIT = 64
+
+
+def _sort_key(field: str, row: Dict):
+    if field == 'id':
+        return row['id']
+    if field == 'ticker':
+        return row['ticker']
+    if field in ('value', 'weight'):
+        return row['market_value']
+    if field == 'return':
+        return row['return_pct']
+    return row['purchase_date']
+
+
+def _matches(row: Dict, sector: Optional[str], prefix: Optional[str]) -> bool:
+    return (sector is None or row['sector'] == sector) and (prefix is None or row['ticker'].startswith(prefix))
+
+
+def encode_cursor(field: str, key, holding_id: int) -> str:
+    raw = json.dumps([field, key, holding_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, field: str) -> Tuple:
+    """(sort key, id) from a cursor issued for the same sort field"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_field, key, holding_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if cursor_field != field:
+        raise ValueError(f'Cursor was issued for sort={cursor_field}')
+    # The key is compared against the sort order's keys, so it must have the field's type
+    if field in ('ticker', 'date'):
+        valid = isinstance(key, str)
+    else:
+        valid = isinstance(key, int if field == 'id' else (int, float)) and not isinstance(key, bool)
+    if not valid or not isinstance(holding_id, int) or isinstance(holding_id, bool):
+        raise ValueError('Invalid cursor')
+    return key, holding_id
+
+
+class HoldingsIndex:
+    """Precomputed sort orders, sector buckets and ticker prefixes over a holdings snapshot"""
+
+    def __init__(self, holdings: List[Dict], rates: Optional[Tuple[List[float], List[float]]] = None):
+        """
+        holdings: one snapshot; rows are copied and given market_value and return_pct
+        rates: (current, purchase-date) FX rate per holding into the base currency; values are in it
+        """
+        # id -> (holding as given, row, value, cost, dividend income), amounts in the base currency
+        self._entries: Dict[int, Tuple] = {}
+        self._totals = [0.0, 0.0, 0.0]
+        self._sectors = Counter()
+        self._orders: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[List, List[Dict]]] = {}
+        self._lock = threading.RLock()
+        self._put(holdings, rates)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def metrics(self) -> Dict:
+        """Portfolio summary metrics (see Portfolio.calculate_metrics)"""
+        total_value, total_cost, dividend_income = self._totals
+        gain = total_value - total_cost
+        return {
+            'total_value': round(total_value, 2),
+            'total_cost': round(total_cost, 2),
+            'total_gain_loss': round(gain, 2),
+            'gain_loss_percentage': round(gain / total_cost * 100, 2) if total_cost > 0 else 0,
+            'dividend_income': round(dividend_income, 2)
+        }
+
+    def updated(self, holdings: List[Dict],
+                valuation: Optional[Callable[[List[Dict]], Optional[Tuple[List[float], List[float]]]]] = None
+                ) -> 'HoldingsIndex':
+        """Index of a later snapshot, sharing the rows and sort orders that did not change
+
+        valuation returns the FX rates of the holdings passed to it and is
+        called for the changed holdings only, so rates must not have changed
+        since this index was built. Each cached sort order moves the changed
+        rows in a copy of itself (O(log n) to find, O(n) memory moves), or is
+        dropped to be rebuilt on use once more than MOVE_LIMIT rows move in
+        it; rows whose keys did not change are swapped in place. When more
+        than a quarter of the holdings changed (a price refresh) the index is
+        rebuilt instead.
+        """
+        entries = self._entries
+        changed = [holding for holding in holdings
+                   if (entry := entries.get(holding['id'])) is None or (entry[0] is not holding and entry[0] != holding)]
+        removed = []
+        added = sum(1 for holding in changed if holding['id'] not in entries)
+        if len(holdings) - added != len(entries):
+            current = {holding['id'] for holding in holdings}
+            removed = [holding_id for holding_id in entries if holding_id not in current]
+        if not changed and not removed:
+            return self
+        if len(changed) + len(removed) > len(entries) // 4:
+            # Keying every row against every order costs about as much as sorting again
+            return HoldingsIndex(holdings, valuation(holdings) if valuation is not None else None)
+
+        index = HoldingsIndex([])
+        index._entries = dict(entries)
+        index._totals = list(self._totals)
+        index._sectors = Counter(self._sectors)
+        moves = [(entries[holding_id][1], None) for holding_id in removed]
+        for holding_id in removed:
+            index._drop(holding_id)
+        for holding in changed:
+            if holding['id'] in entries:
+                index._drop(holding['id'])
+        index._put(changed, valuation(changed) if valuation is not None and changed else None)
+        moves += [(entries[holding['id']][1] if holding['id'] in entries else None, index._entries[holding['id']][1])
+                  for holding in changed]
+
+        with self._lock:
+            orders = list(self._orders.items())
+        for cache_key, order in orders:
+            order = self._moved(cache_key, order, moves, index._entries)
+            if order is not None:
+                index._orders[cache_key] = order
+        return index
+
+    def page(self, sort: str = 'id', descending: bool = False, limit: int = 50, cursor: Optional[str] = None,
+             sector: Optional[str] = None, prefix: Optional[str] = None) -> Dict:
+        """One page of rows in sort order, the number of matching rows and the cursor of the next page
+
+        O(log n + limit) once the order for the sort field, sector and
+        prefix is cached; a new prefix is found by bisecting the ticker
+        order and only its matches are sorted.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+        keys, rows = self._order(sort, sector, prefix.upper() if prefix else None)
+
+        if descending:
+            end = bisect_left(keys, decode_cursor(cursor, sort)) if cursor else len(keys)
+            start = max(end - limit, 0)
+            page = rows[start:end][::-1]
+            more = start > 0
+        else:
+            start = bisect_right(keys, decode_cursor(cursor, sort)) if cursor else 0
+            end = min(start + limit, len(keys))
+            page = rows[start:end]
+            more = end < len(keys)
+
+        next_cursor = None
+        if more and page:
+            last = page[-1]
+            next_cursor = encode_cursor(sort, _sort_key(sort, last), last['id'])
+        # Weights follow the total, so they are added per page rather than stored in the shared rows
+        total_value = self._totals[0]
+        page = [{**row, 'weight': round(row['market_value'] / total_value, 6) if total_value > 0 else 0.0}
+                for row in page]
+        return {'holdings': page, 'total': len(keys), 'next_cursor': next_cursor}
+
+    def _put(self, holdings: List[Dict], rates: Optional[Tuple[List[float], List[float]]]) -> None:
+        value_rates, cost_rates = rates or ([1.0] * len(holdings), [1.0] * len(holdings))
+        for holding, value_rate, cost_rate in zip(holdings, value_rates, cost_rates):
+            value = holding['shares'] * holding['current_price'] * value_rate
+            cost = holding['shares'] * holding['buy_price'] * cost_rate
+            dividends = holding.get('dividend_income', 0) * value_rate
+            row = {
+                **holding,
+                'market_value': round(value, 2),
+                'return_pct': round((value - cost) / cost * 100, 2) if cost > 0 else 0.0
+            }
+            self._entries[holding['id']] = (holding, row, value, cost, dividends)
+            self._totals[0] += value
+            self._totals[1] += cost
+            self._totals[2] += dividends
+            self._sectors[holding['sector']] += 1
+
+    def _drop(self, holding_id: int) -> None:
+        holding, _, value, cost, dividends = self._entries.pop(holding_id)
+        self._totals[0] -= value
+        self._totals[1] -= cost
+        self._totals[2] -= dividends
+        self._sectors[holding['sector']] -= 1
+        if not self._sectors[holding['sector']]:
+            del self._sectors[holding['sector']]
+
+    @staticmethod
+    def _moved(cache_key: Tuple, order: Tuple[List, List[Dict]], moves: List[Tuple[Optional[Dict], Optional[Dict]]],
+               entries: Dict[int, Tuple]) -> Optional[Tuple[List, List[Dict]]]:
+        """Copy of a sort order with rows replaced (old row or None, new row or None); None to rebuild it
+
+        entries are the new index's; when many rows keep their keys the
+        order is re-read from them rather than searched row by row.
+        """
+        field, sector, prefix = cache_key
+        swaps = []
+        shifts = []
+        for old, new in moves:
+            old_key = (_sort_key(field, old), old['id']) if old is not None and _matches(old, sector, prefix) else None
+            new_key = (_sort_key(field, new), new['id']) if new is not None and _matches(new, sector, prefix) else None
+            if old_key is None and new_key is None:
+                continue
+            if old_key == new_key:
+                swaps.append((old_key, new))
+            else:
+                shifts.append((old_key, new_key, new))
+                if len(shifts) > MOVE_LIMIT:
+                    return None
+        if not swaps and not shifts:
+            return order
+        keys = list(order[0])
+        if len(swaps) > len(keys) // 8:
+            rows = [entries[holding_id][1] for _, holding_id in keys]
+        else:
+            rows = list(order[1])
+            for key, row in swaps:
+                rows[bisect_left(keys, key)] = row
+        for old_key, new_key, row in shifts:
+            if old_key is not None:
+                position = bisect_left(keys, old_key)
+                del keys[position]
+                del rows[position]
+            if new_key is not None:
+                position = bisect_left(keys, new_key)
+                keys.insert(position, new_key)
+                rows.insert(position, row)
+        return keys, rows
+
+    def _order(self, field: str, sector: Optional[str], prefix: Optional[str] = None) -> Tuple[List, List[Dict]]:
+        """(sorted (key, id) pairs, rows in the same order), built once per field, sector and prefix"""
+        cache_key = (field, sector, prefix)
+        order = self._orders.get(cache_key)
+        if order is not None:
+            return order
+        with self._lock:
+            order = self._orders.get(cache_key)
+            if order is None:
+                if prefix is not None:
+                    # Bisect the ticker order for the prefix, then sort only its matches
+                    keys, rows = self._order('ticker', sector)
+                    start = bisect_left(keys, (prefix,))
+                    end = bisect_left(keys, (prefix + '\uffff',), start)
+                    rows = rows[start:end]
+                    if field != 'ticker':
+                        rows = sorted(rows, key=lambda row: (_sort_key(field, row), row['id']))
+                    prefixes = [key for key in self._orders if key[2] is not None]
+                    if len(prefixes) >= PREFIX_ORDERS:
+                        del self._orders[prefixes[0]]
+                elif sector is None:
+                    rows = sorted((entry[1] for entry in self._entries.values()),
+                                  key=lambda row: (_sort_key(field, row), row['id']))
+                elif sector not in self._sectors:
+                    rows = []
+                else:
+                    rows = [row for row in self._order(field, None)[1] if row['sector'] == sector]
+                order = ([(_sort_key(field, row), row['id']) for row in rows], rows)
+                self._orders[cache_key] = order
+        return order
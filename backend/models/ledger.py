@@ -0,0 +1,305 @@
+"""
+Append-only transaction ledger with per-ticker tax lots
+
+Every buy, sell, split and removal is appended as one JSON line and applied
+to that ticker's Position, which keeps its open lots (ordered by purchase
+date, sold first in, first out), quantity, cost basis and realized P&L up
+to date, so reads never replay history. Every
+`compact_every` appends the positions are written to a checkpoint and the
+log restarts empty; entries carry a sequence number, so entries already in
+the checkpoint are skipped if a compaction is interrupted.
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = ('buy', 'sell', 'split', 'remove')
+# Quantities below this are treated as a closed position (float residue from sells and splits)
+EPSILON = 1e-9
+
+
+class Position:
+    """Open lots and running totals for one ticker"""
+
+    __slots__ = ('ticker', 'lots', 'quantity', 'cost_basis', 'realized_pnl', 'split_date')
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.lots = deque()  # [shares, price, date], oldest first
+        self.quantity = 0.0
+        self.cost_basis = 0.0
+        self.realized_pnl = 0.0
+        # Date of the latest recorded split; lots already reflect splits up to it
+        self.split_date: Optional[str] = None
+
+    @property
+    def average_cost(self) -> float:
+        return self.cost_basis / self.quantity if self.quantity > EPSILON else 0.0
+
+    @property
+    def first_date(self) -> Optional[str]:
+        return min(lot[2] for lot in self.lots) if self.lots else None
+
+    def held_on(self, date: str) -> float:
+        """Shares of the open lots bought on or before `date`"""
+        return sum(lot[0] for lot in self.lots if lot[2] <= date)
+
+    def check(self, transaction: Dict) -> None:
+        """Raise ValueError if a sell needs shares bought after its date"""
+        if transaction['type'] == 'sell':
+            available = self.held_on(transaction['date'])
+            if transaction['shares'] > available + EPSILON:
+                raise ValueError(f"{self.ticker}: cannot sell {transaction['shares']:g} shares on "
+                                 f"{transaction['date']}, only {available:g} held by then")
+
+    def apply(self, transaction: Dict) -> None:
+        """Update lots and totals for one transaction; sells consume the earliest-dated lots first"""
+        kind = transaction['type']
+        if kind == 'buy':
+            # Lots stay in purchase-date order, whatever order they were recorded in
+            i = len(self.lots)
+            while i and self.lots[i - 1][2] > transaction['date']:
+                i -= 1
+            self.lots.insert(i, [transaction['shares'], transaction['price'], transaction['date']])
+            self.quantity += transaction['shares']
+            self.cost_basis += transaction['shares'] * transaction['price']
+        elif kind == 'sell':
+            remaining = transaction['shares']
+            while remaining > EPSILON and self.lots:
+                lot = self.lots[0]
+                used = min(lot[0], remaining)
+                self.realized_pnl += used * (transaction['price'] - lot[1])
+                self.cost_basis -= used * lot[1]
+                lot[0] -= used
+                remaining -= used
+                if lot[0] <= EPSILON:
+                    self.lots.popleft()
+            self.quantity -= transaction['shares']
+            if self.quantity <= EPSILON or not self.lots:
+                self.lots.clear()
+                self.quantity, self.cost_basis = 0.0, 0.0
+        elif kind == 'split':
+            ratio = transaction['ratio']
+            for lot in self.lots:
+                lot[0] *= ratio
+                lot[1] /= ratio
+            self.quantity *= ratio
+            self.split_date = max(self.split_date or '', transaction['date']) or None
+
+    def to_dict(self, include_lots: bool = False) -> Dict:
+        data = {
+            'ticker': self.ticker,
+            'quantity': round(self.quantity, 6),
+            'cost_basis': round(self.cost_basis, 2),
+            'average_cost': round(self.average_cost, 4),
+            'realized_pnl': round(self.realized_pnl, 2),
+            'open_lots': len(self.lots),
+            'first_date': self.first_date,
+            'split_date': self.split_date
+        }
+        if include_lots:
+            data['lots'] = [{'shares': round(shares, 6), 'price': round(price, 4), 'date': date}
+                            for shares, price, date in self.lots]
+        return data
+
+    def state(self) -> Dict:
+        return {'lots': [list(lot) for lot in self.lots], 'quantity': self.quantity,
+                'cost_basis': self.cost_basis, 'realized_pnl': self.realized_pnl, 'split_date': self.split_date}
+
+    @classmethod
+    def from_state(cls, ticker: str, state: Dict) -> 'Position':
+        position = cls(ticker)
+        position.lots = deque(sorted((list(lot) for lot in state['lots']), key=lambda lot: lot[2]))
+        position.quantity = state['quantity']
+        position.cost_basis = state['cost_basis']
+        position.realized_pnl = state['realized_pnl']
+        position.split_date = state.get('split_date')
+        return position
+
+
+def normalize_transaction(transaction: Dict) -> Dict:
+    """Validated copy of a transaction; raises ValueError with a user-facing message"""
+    kind = str(transaction.get('type', '')).lower()
+    if kind not in TRANSACTION_TYPES:
+        raise ValueError(f"type must be one of {', '.join(TRANSACTION_TYPES)}")
+    ticker = str(transaction.get('ticker') or '').upper().strip()
+    if not ticker:
+        raise ValueError('Missing ticker')
+
+    # Removals are bookkeeping and default to today; trades need their date
+    date = str(transaction.get('date') or (datetime.date.today().isoformat() if kind == 'remove' else '')).strip()
+    try:
+        parsed = datetime.datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{ticker}: date must be YYYY-MM-DD')
+    if parsed > datetime.date.today():
+        raise ValueError(f'{ticker}: date cannot be in the future')
+    normalized = {'type': kind, 'ticker': ticker, 'date': parsed.isoformat()}
+    if kind in ('buy', 'sell'):
+        shares = float(transaction.get('shares') or 0)
+        price = float(transaction.get('price') or 0)
+        if shares <= 0 or price <= 0:
+            raise ValueError(f'{ticker}: {kind} needs positive shares and price')
+        normalized.update(shares=shares, price=price)
+    elif kind == 'split':
+        ratio = float(transaction.get('ratio') or 0)
+        if ratio <= 0:
+            raise ValueError(f'{ticker}: split needs a positive ratio (e.g. 4 for a 4-for-1 split)')
+        normalized['ratio'] = ratio
+    return normalized
+
+
+class TransactionLedger:
+    """Append-only log of transactions with incrementally maintained positions"""
+
+    def __init__(self, log_file: str, compact_every: int = 1000):
+        """
+        log_file: JSON-lines log; the checkpoint is stored next to it
+        compact_every: appends between compactions
+        """
+        self.log_file = log_file
+        self.checkpoint_file = f'{log_file}.checkpoint'
+        self.compact_every = compact_every
+        self._positions: Optional[Dict[str, Position]] = None
+        self._seq = 0
+        self._since_compaction = 0
+        self._lock = threading.Lock()
+
+    def position(self, ticker: str) -> Optional[Position]:
+        with self._lock:
+            return self._load().get(ticker.upper())
+
+    def positions(self) -> Dict[str, Position]:
+        with self._lock:
+            return dict(self._load())
+
+    def append(self, transactions: Iterable[Dict]) -> Dict[str, Position]:
+        """Validate, log and apply transactions in one write; returns the touched positions
+
+        An invalid transaction, or a sell larger than the shares bought by
+        its date, rejects the whole batch before anything is written.
+        """
+        with self._lock:
+            positions = self._load()
+            batch = [normalize_transaction(transaction) for transaction in transactions]
+            # Dry run on copies of the touched positions
+            trial = {}
+            for transaction in batch:
+                ticker = transaction['ticker']
+                if ticker not in trial:
+                    trial[ticker] = Position.from_state(ticker, positions[ticker].state()) if ticker in positions \
+                        else Position(ticker)
+                if transaction['type'] == 'remove':
+                    trial[ticker] = Position(ticker)
+                    continue
+                trial[ticker].check(transaction)
+                trial[ticker].apply(transaction)
+
+            lines = []
+            for transaction in batch:
+                self._seq += 1
+                transaction['seq'] = self._seq
+                lines.append(json.dumps(transaction, separators=(',', ':')))
+            with open(self.log_file, 'a') as file:
+                file.write('\n'.join(lines) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+
+            touched = {}
+            for transaction in batch:
+                touched[transaction['ticker']] = self._apply(positions, transaction)
+            self._since_compaction += len(batch)
+            if self._since_compaction >= self.compact_every:
+                self._compact(positions)
+            return touched
+
+    def compact(self) -> None:
+        """Checkpoint the positions and start an empty log"""
+        with self._lock:
+            self._compact(self._load())
+
+    def _apply(self, positions: Dict[str, Position], transaction: Dict) -> Position:
+        ticker = transaction['ticker']
+        if transaction['type'] == 'remove':
+            positions.pop(ticker, None)
+            return Position(ticker)
+        position = positions.get(ticker)
+        if position is None:
+            position = positions[ticker] = Position(ticker)
+        position.apply(transaction)
+        return position
+
+    def _load(self) -> Dict[str, Position]:
+        """Positions from the checkpoint plus the log after it, read on first use (caller holds the lock)"""
+        if self._positions is not None:
+            return self._positions
+        positions = {}
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, 'r') as file:
+                checkpoint = json.load(file)
+            self._seq = checkpoint['seq']
+            positions = {ticker: Position.from_state(ticker, state) for ticker, state in checkpoint['positions'].items()}
+        if os.path.exists(self.log_file):
+            self._truncate_torn_tail()
+            with open(self.log_file, 'r') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        transaction = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable line in {self.log_file}")
+                        continue
+                    if transaction['seq'] <= self._seq:
+                        continue
+                    self._seq = transaction['seq']
+                    self._apply(positions, transaction)
+                    self._since_compaction += 1
+        self._positions = positions
+        return positions
+
+    def _truncate_torn_tail(self) -> None:
+        """Cut a partial final line left by a crash mid-append, so the next append starts on a fresh line"""
+        with open(self.log_file, 'rb+') as file:
+            size = file.seek(0, os.SEEK_END)
+            if not size:
+                return
+            file.seek(size - 1)
+            if file.read(1) == b'\n':
+                return
+            # Scan back in blocks for the last complete line
+            end = size
+            while end > 0:
+                start = max(end - 65536, 0)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            logger.warning(f"Truncating {size - end} bytes of a torn final line in {self.log_file}")
+            file.truncate(end)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _compact(self, positions: Dict[str, Position]) -> None:
+        tmp_file = f'{self.checkpoint_file}.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump({'seq': self._seq, 'positions': {ticker: position.state() for ticker, position in positions.items()}},
+                      file, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_file, self.checkpoint_file)
+        open(self.log_file, 'w').close()
+        self._since_compaction = 0
+
+    def delete_files(self) -> None:
+        for path in (self.log_file, self.checkpoint_file):
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,29 +1,288 @@
 """
 Portfolio data models and CSV operations
+
+Holdings live in memory as immutable, versioned snapshots; the CSV file is
+their durable copy. Readers take the current snapshot without locking.
+Writers build a new holdings list and commit it with the version they
+started from: the commit writes the CSV and swaps the snapshot in one step,
+and fails with VersionConflict if another commit got there first.
+
+Trades go through the transaction ledger instead: a buy, sell or split on a
+held ticker is one ledger append plus a snapshot swap, and the CSV is only
+rewritten when a ticker is added or closed out. Shares and average cost of
+tickers with ledger history come from their ledger positions, including
+when the CSV is loaded.
+
+Prices are in each holding's listing currency (`currency`, USD when
+absent). Metrics and the holdings index take optional per-holding FX rates
+(see services.fx_service) to report values in a base currency, with cost
+converted at the purchase date's rate.
+
+Shares and buy prices are stored as traded; readers restate them for
+splits since purchase (see services.corporate_actions). `split_date` on a
+ledger-backed holding marks the splits its lots already include.
 """
 import csv
 import os
-from typing import List, Dict
+import threading
+from typing import Any, Callable, List, Dict, Optional, Tuple
+
+from .holdings_index import HoldingsIndex
+from .ledger import EPSILON, Position, TransactionLedger
+
+FIELDNAMES = ['id', 'ticker', 'shares', 'buy_price', 'current_price', 'purchase_date', 'sector', 'currency']
+
+
+class VersionConflict(Exception):
+    """A commit was based on a snapshot that is no longer current"""
+
+
+class HoldingsSnapshot:
+    """One committed state of a portfolio's holdings; never modified after it is published"""
+
+    __slots__ = ('version', 'holdings', '_rows')
+
+    def __init__(self, version: int, holdings: Tuple[Dict, ...], rows: Optional[Dict[str, int]] = None):
+        self.version = version
+        self.holdings = holdings
+        self._rows = rows
+
+    def rows(self) -> Dict[str, int]:
+        """Position of each ticker in `holdings`, built on first use"""
+        if self._rows is None:
+            self._rows = {holding['ticker'].upper(): i for i, holding in enumerate(self.holdings)}
+        return self._rows
+
+    def copy(self) -> List[Dict]:
+        """Holdings as new dicts the caller may modify"""
+        return [dict(holding) for holding in self.holdings]
 
 
 class Portfolio:
     """Portfolio data management"""
 
-    def __init__(self, csv_file_path: str):
+    def __init__(self, csv_file_path: str, initial_data: Optional[List[Dict]] = None):
+        """initial_data seeds a missing CSV; defaults to the demo holdings
+
+        Like every row, the demo holdings are stored as traded, so each is
+        dated after its ticker's last split (corporate actions restate
+        earlier purchases).
+        """
         self.csv_file = csv_file_path
-        self.initial_data = [
-            {"id": 1, "ticker": "AAPL", "shares": 10, "buy_price": 150.00, "current_price": 185.20, "purchase_date": "2024-06-15", "sector": "Technology"},
-            {"id": 2, "ticker": "GOOGL", "shares": 5, "buy_price": 2400.00, "current_price": 2650.30, "purchase_date": "2024-05-20", "sector": "Technology"},
-            {"id": 3, "ticker": "TSLA", "shares": 8, "buy_price": 200.00, "current_price": 245.80, "purchase_date": "2024-07-10", "sector": "Consumer Cyclical"},
-            {"id": 4, "ticker": "MSFT", "shares": 12, "buy_price": 300.00, "current_price": 380.50, "purchase_date": "2024-04-01", "sector": "Technology"},
-            {"id": 5, "ticker": "NVDA", "shares": 6, "buy_price": 400.00, "current_price": 875.20, "purchase_date": "2024-03-15", "sector": "Technology"}
+        self.initial_data = initial_data if initial_data is not None else [
+            {"id": 1, "ticker": "AAPL", "shares": 10, "buy_price": 150.00, "current_price": 185.20, "purchase_date": "2024-06-15", "sector": "Technology", "currency": "USD"},
+            {"id": 2, "ticker": "GOOGL", "shares": 5, "buy_price": 176.00, "current_price": 165.30, "purchase_date": "2024-05-20", "sector": "Technology", "currency": "USD"},
+            {"id": 3, "ticker": "TSLA", "shares": 8, "buy_price": 200.00, "current_price": 245.80, "purchase_date": "2024-07-10", "sector": "Consumer Cyclical", "currency": "USD"},
+            {"id": 4, "ticker": "MSFT", "shares": 12, "buy_price": 300.00, "current_price": 380.50, "purchase_date": "2024-04-01", "sector": "Technology", "currency": "USD"},
+            {"id": 5, "ticker": "NVDA", "shares": 60, "buy_price": 98.90, "current_price": 132.80, "purchase_date": "2024-08-07", "sector": "Technology", "currency": "USD"}
         ]
+        self.ledger = TransactionLedger(f'{os.path.splitext(csv_file_path)[0]}.ledger.jsonl')
+        self._snapshot: Optional[HoldingsSnapshot] = None
+        self._write_lock = threading.Lock()
+        self._index = None
+        self._index_signature = None
+        self._index_lock = threading.Lock()
+
+    def snapshot(self) -> HoldingsSnapshot:
+        """The current holdings snapshot; only the first call reads the CSV"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._write_lock:
+                if self._snapshot is None:
+                    self._snapshot = HoldingsSnapshot(0, tuple(self._apply_positions(self._read_csv())))
+                snapshot = self._snapshot
+        return snapshot
 
     def load_holdings(self) -> List[Dict]:
-        """Load holdings from CSV file"""
+        """Copy of the current holdings"""
+        return self.snapshot().copy()
+
+    def save_holdings(self, holdings: List[Dict], expected_version: Optional[int] = None) -> HoldingsSnapshot:
+        """Commit holdings as the next snapshot
+
+        With expected_version, raises VersionConflict unless that is still
+        the current version; without it the commit is unconditional.
+        """
+        return self._commit(tuple({**holding, 'currency': holding.get('currency') or 'USD'} for holding in holdings),
+                            expected_version)
+
+    def update(self, mutate: Callable[[List[Dict]], Any], retries: int = 5) -> Tuple[HoldingsSnapshot, Any]:
+        """Apply mutate to a copy of the latest holdings and commit it, retrying on conflicts
+
+        mutate edits the list in place and may run more than once, so it
+        must not have side effects beyond the list; whatever it returns on
+        the committed run is passed back with the new snapshot.
+        """
+        for _ in range(retries):
+            snapshot = self.snapshot()
+            holdings = snapshot.copy()
+            result = mutate(holdings)
+            try:
+                return self._commit(tuple(holdings), snapshot.version), result
+            except VersionConflict:
+                continue
+        raise VersionConflict(f'Holdings changed {retries} times during the update; try again')
+
+    def record(self, transactions: List[Dict], sectors: Optional[Dict[str, str]] = None,
+               current_prices: Optional[Dict[str, float]] = None,
+               currencies: Optional[Dict[str, str]] = None) -> Tuple[HoldingsSnapshot, Dict[str, Position]]:
+        """Append trades to the ledger and apply them to the holdings in one commit
+
+        Buys of tickers not held yet create holdings (sector, current price
+        and currency from `sectors`/`current_prices`/`currencies`, else
+        'Other', the trade price and USD); positions sold down to zero or removed are dropped. Holdings
+        without ledger history get an opening buy from their current row
+        before their first trade. Returns the new snapshot and the touched positions.
+        """
+        self.snapshot()
+        with self._write_lock:
+            current = self._snapshot
+            rows = current.rows()
+            opening = []
+            trades = {str(t.get('ticker') or '').upper().strip() for t in transactions if t.get('type') != 'remove'}
+            for ticker in trades:
+                position = self.ledger.position(ticker)
+                if ticker in rows and position is None:
+                    row = current.holdings[rows[ticker]]
+                    opening.append({'type': 'buy', 'ticker': ticker, 'shares': row['shares'],
+                                    'price': row['buy_price'], 'date': row['purchase_date']})
+                elif ticker not in rows and position is not None and position.quantity > EPSILON:
+                    # Left over from a holding deleted before its ledger entry was written
+                    opening.append({'type': 'remove', 'ticker': ticker})
+            touched = self.ledger.append(opening + list(transactions))
+
+            holdings = list(current.holdings)
+            next_id = None
+            structural = False
+            for ticker, position in touched.items():
+                i = rows.get(ticker)
+                if position.quantity <= EPSILON:
+                    if i is not None:
+                        holdings[i] = None
+                        structural = True
+                elif i is not None:
+                    holdings[i] = {**holdings[i], **self._position_fields(position)}
+                else:
+                    fields = self._position_fields(position)
+                    next_id = next_id or max([h['id'] for h in holdings if h is not None], default=0) + 1
+                    holdings.append({
+                        'id': next_id,
+                        'ticker': ticker,
+                        'shares': fields['shares'],
+                        'buy_price': fields['buy_price'],
+                        'current_price': (current_prices or {}).get(ticker) or position.lots[-1][1],
+                        'purchase_date': fields['purchase_date'],
+                        'sector': (sectors or {}).get(ticker, 'Other'),
+                        'currency': (currencies or {}).get(ticker, 'USD'),
+                        **fields
+                    })
+                    next_id += 1
+                    structural = True
+
+            # Share and cost changes live in the ledger; only added or closed tickers change the CSV
+            if structural:
+                holdings = tuple(holding for holding in holdings if holding is not None)
+                self._write_csv(holdings)
+                self._snapshot = HoldingsSnapshot(current.version + 1, holdings)
+            else:
+                self._snapshot = HoldingsSnapshot(current.version + 1, tuple(holdings), rows)
+            return self._snapshot, touched
+
+    def get_index(self, resolve_sector: Optional[Callable[[str], str]] = None, generation=None,
+                  valuation: Optional[Callable[[List[Dict]], Optional[Tuple[List[float], List[float]]]]] = None,
+                  adjust: Optional[Callable[[List[Dict]], List[Dict]]] = None) -> HoldingsIndex:
+        """Sorted views of the holdings for paged reads
+
+        Built once per snapshot version and `generation`; resolve_sector
+        fills sectors stored as 'Other', valuation returns the FX rates of
+        the holdings (see calculate_metrics) and adjust restates them for
+        corporate actions, so `generation` must change with them.
+
+        Within one generation the next index is derived from the cached one
+        (see HoldingsIndex.updated), so a write moves only the holdings it
+        changed in the sort orders already built; a new generation rebuilds.
+        """
+        snapshot = self.snapshot()
+        signature = (snapshot.version, generation)
+        with self._index_lock:
+            if self._index is not None and signature == self._index_signature:
+                return self._index
+
+        holdings = snapshot.holdings
+        if adjust is not None:
+            holdings = adjust(list(holdings))
+        if resolve_sector is not None:
+            holdings = [{**holding, 'sector': resolve_sector(holding['ticker'])}
+                        if holding['sector'] in ('Other', '') else holding for holding in holdings]
+        holdings = list(holdings)
+        with self._index_lock:
+            previous, previous_signature = self._index, self._index_signature
+        if previous is not None and previous_signature[1] == generation:
+            index = previous.updated(holdings, valuation)
+        else:
+            index = HoldingsIndex(holdings, valuation(holdings) if valuation is not None else None)
+        with self._index_lock:
+            if self._index_signature is None or signature[0] >= self._index_signature[0]:
+                self._index, self._index_signature = index, signature
+        return index
+
+    def _commit(self, holdings: Tuple[Dict, ...], expected_version: Optional[int]) -> HoldingsSnapshot:
+        """Write the CSV and publish the new snapshot (the holdings tuple must not be shared)"""
+        with self._write_lock:
+            current = self._snapshot
+            version = current.version if current is not None else 0
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(f'Expected version {expected_version}, current is {version}')
+            self._release_positions(holdings)
+            self._write_csv(holdings)
+            self._snapshot = HoldingsSnapshot(version + 1, holdings)
+            return self._snapshot
+
+    def _release_positions(self, holdings: Tuple[Dict, ...]) -> None:
+        """Drop ledger positions that a direct edit replaced, so the edited rows stay authoritative"""
+        positions = self.ledger.positions()
+        if not positions:
+            return
+        rows = {holding['ticker'].upper(): holding for holding in holdings}
+        released = []
+        for ticker, position in positions.items():
+            row = rows.get(ticker)
+            if row is None and position.quantity <= EPSILON:
+                # Closed out; kept for its realized P&L
+                continue
+            fields = self._position_fields(position)
+            if row is None or abs(row['shares'] - fields['shares']) > EPSILON or row['buy_price'] != fields['buy_price']:
+                released.append({'type': 'remove', 'ticker': ticker})
+        if released:
+            self.ledger.append(released)
+
+    @staticmethod
+    def _position_fields(position: Position) -> Dict:
+        fields = {'shares': round(position.quantity, 6), 'buy_price': round(position.average_cost, 2),
+                  'purchase_date': position.first_date}
+        if position.split_date:
+            # Lots already reflect splits up to this date (see services.corporate_actions)
+            fields['split_date'] = position.split_date
+        return fields
+
+    def _apply_positions(self, holdings: List[Dict]) -> List[Dict]:
+        """Shares and cost from ledger positions, which are newer than the CSV"""
+        positions = self.ledger.positions()
+        if not positions:
+            return holdings
+        applied = []
+        for holding in holdings:
+            position = positions.get(holding['ticker'].upper())
+            if position is None:
+                applied.append(holding)
+            elif position.quantity > EPSILON:
+                applied.append({**holding, **self._position_fields(position)})
+        return applied
+
+    def _read_csv(self) -> List[Dict]:
         if not os.path.exists(self.csv_file):
-            self.save_holdings(self.initial_data)
-            return self.initial_data
+            self._write_csv(self.initial_data)
+            return [dict(holding) for holding in self.initial_data]
 
         holdings = []
         with open(self.csv_file, 'r', newline='') as file:
@@ -36,50 +295,69 @@ class Portfolio:
                     'buy_price': float(row['buy_price']),
                     'current_price': float(row['current_price']),
                     'purchase_date': row['purchase_date'],
-                    'sector': row['sector']
+                    'sector': row['sector'],
+                    'currency': row.get('currency') or 'USD'
                 })
         return holdings
 
-    def save_holdings(self, holdings: List[Dict]) -> None:
-        """Save holdings to CSV file"""
-        with open(self.csv_file, 'w', newline='') as file:
-            fieldnames = ['id', 'ticker', 'shares', 'buy_price', 'current_price', 'purchase_date', 'sector']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
+    def _write_csv(self, holdings) -> None:
+        """Replace the CSV atomically, so a crash mid-write leaves the previous file intact"""
+        tmp_file = f'{self.csv_file}.tmp'
+        with open(tmp_file, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=FIELDNAMES, extrasaction='ignore')
             writer.writeheader()
             writer.writerows(holdings)
+        os.replace(tmp_file, self.csv_file)
+
+    def calculate_metrics(self, holdings: List[Dict], rates: Optional[Tuple[List[float], List[float]]] = None) -> Dict:
+        """Calculate portfolio summary metrics
 
-    def calculate_metrics(self, holdings: List[Dict]) -> Dict:
-        """Calculate portfolio summary metrics"""
-        total_value = sum(h['shares'] * h['current_price'] for h in holdings)
-        total_cost = sum(h['shares'] * h['buy_price'] for h in holdings)
+        rates: (current, purchase-date) FX rate per holding into the base
+        currency, from FXService.valuation; None when all holdings are in it.
+        dividend_income sums the holdings' dividends since purchase (set by
+        the corporate-actions adjustment) at current rates.
+        """
+        if rates is None:
+            total_value = sum(h['shares'] * h['current_price'] for h in holdings)
+            total_cost = sum(h['shares'] * h['buy_price'] for h in holdings)
+        else:
+            value_rates, cost_rates = rates
+            total_value = sum(h['shares'] * h['current_price'] * rate for h, rate in zip(holdings, value_rates))
+            total_cost = sum(h['shares'] * h['buy_price'] * rate for h, rate in zip(holdings, cost_rates))
         total_gain_loss = total_value - total_cost
         gain_loss_percentage = (total_gain_loss / total_cost * 100) if total_cost > 0 else 0
+        value_rates = rates[0] if rates is not None else [1.0] * len(holdings)
+        dividend_income = sum(h.get('dividend_income', 0) * rate for h, rate in zip(holdings, value_rates))
 
         return {
             'total_value': round(total_value, 2),
             'total_cost': round(total_cost, 2),
             'total_gain_loss': round(total_gain_loss, 2),
-            'gain_loss_percentage': round(gain_loss_percentage, 2)
+            'gain_loss_percentage': round(gain_loss_percentage, 2),
+            'dividend_income': round(dividend_income, 2)
         }
 
-    def get_best_worst_performers(self, holdings: List[Dict]) -> Dict:
-        """Get best and worst performing holdings"""
+    def get_best_worst_performers(self, holdings: List[Dict], rates: Optional[Tuple[List[float], List[float]]] = None) -> Dict:
+        """Get best and worst performing holdings (returns in the base currency when rates are given)"""
         if not holdings:
             return {
                 'best_performer': None,
                 'worst_performer': None
             }
 
-        best_performer = max(holdings, key=lambda h: ((h['current_price'] - h['buy_price']) / h['buy_price']) * 100)
-        worst_performer = min(holdings, key=lambda h: ((h['current_price'] - h['buy_price']) / h['buy_price']) * 100)
+        value_rates, cost_rates = rates or ([1.0] * len(holdings), [1.0] * len(holdings))
+        returns = [((h['current_price'] * value_rate - h['buy_price'] * cost_rate) / (h['buy_price'] * cost_rate)) * 100
+                   for h, value_rate, cost_rate in zip(holdings, value_rates, cost_rates)]
+        best = max(range(len(holdings)), key=returns.__getitem__)
+        worst = min(range(len(holdings)), key=returns.__getitem__)
 
         return {
             'best_performer': {
-                'ticker': best_performer['ticker'],
-                'return_pct': round(((best_performer['current_price'] - best_performer['buy_price']) / best_performer['buy_price']) * 100, 2)
+                'ticker': holdings[best]['ticker'],
+                'return_pct': round(returns[best], 2)
             },
             'worst_performer': {
-                'ticker': worst_performer['ticker'],
-                'return_pct': round(((worst_performer['current_price'] - worst_performer['buy_price']) / worst_performer['buy_price']) * 100, 2)
+                'ticker': holdings[worst]['ticker'],
+                'return_pct': round(returns[worst], 2)
             }
         }
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Registry of portfolios, each stored in its own CSV file
+"""
+import json
+import os
+import re
+import threading
+import uuid
+from typing import List, Dict, Optional, Tuple
+
+from .portfolio import Portfolio
+
+
+class PortfolioStore:
+    """Portfolio and account bookkeeping with per-portfolio storage"""
+
+    DEFAULT_ID = 'default'
+    _ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+    def __init__(self, storage_dir: str, default_portfolio: Portfolio):
+        """
+        storage_dir: holds portfolios.json and one CSV per extra portfolio
+        default_portfolio: the original single portfolio, served as 'default'
+        """
+        self.storage_dir = storage_dir
+        self.index_file = os.path.join(storage_dir, 'portfolios.json')
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Dict] = {
+            self.DEFAULT_ID: {'id': self.DEFAULT_ID, 'name': 'My Portfolio', 'account': 'default'}
+        }
+        self._portfolios: Dict[str, Portfolio] = {self.DEFAULT_ID: default_portfolio}
+
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as file:
+                for meta in json.load(file)['portfolios']:
+                    self._meta[meta['id']] = meta
+
+    def get(self, portfolio_id: str) -> Optional[Portfolio]:
+        """Portfolio model for an id, or None if it does not exist"""
+        with self._lock:
+            if portfolio_id not in self._meta:
+                return None
+            if portfolio_id not in self._portfolios:
+                self._portfolios[portfolio_id] = Portfolio(self._csv_path(portfolio_id), initial_data=[])
+            return self._portfolios[portfolio_id]
+
+    def all(self) -> List[Tuple[str, Portfolio]]:
+        """Every (portfolio id, Portfolio) pair"""
+        return [(portfolio_id, self.get(portfolio_id)) for portfolio_id in list(self._meta)]
+
+    def list_portfolios(self, account: Optional[str] = None) -> List[Dict]:
+        """Portfolio metadata, optionally limited to one account"""
+        with self._lock:
+            portfolios = list(self._meta.values())
+        if account:
+            portfolios = [p for p in portfolios if p['account'] == account]
+        return portfolios
+
+    def create(self, name: str, account: str = 'default', portfolio_id: Optional[str] = None) -> Dict:
+        """Register a new, empty portfolio"""
+        portfolio_id = portfolio_id or uuid.uuid4().hex[:8]
+        if not self._ID_PATTERN.match(portfolio_id):
+            raise ValueError('Portfolio id may only contain letters, digits, "-" and "_"')
+
+        with self._lock:
+            if portfolio_id in self._meta:
+                raise ValueError(f'Portfolio {portfolio_id} already exists')
+            meta = {'id': portfolio_id, 'name': name, 'account': account}
+            self._meta[portfolio_id] = meta
+            self._save_index()
+        return meta
+
+    def delete(self, portfolio_id: str) -> bool:
+        """Remove a portfolio and its holdings file; the default cannot be deleted"""
+        if portfolio_id == self.DEFAULT_ID:
+            raise ValueError('The default portfolio cannot be deleted')
+
+        with self._lock:
+            if portfolio_id not in self._meta:
+                return False
+            del self._meta[portfolio_id]
+            portfolio = self._portfolios.pop(portfolio_id, None)
+            self._save_index()
+        csv_file = self._csv_path(portfolio_id)
+        if os.path.exists(csv_file):
+            os.remove(csv_file)
+        (portfolio or Portfolio(csv_file, initial_data=[])).ledger.delete_files()
+        return True
+
+    def _csv_path(self, portfolio_id: str) -> str:
+        return os.path.join(self.storage_dir, f'{portfolio_id}.csv')
+
+    def _save_index(self) -> None:
+        """Persist non-default portfolio metadata (caller holds the lock)"""
+        os.makedirs(self.storage_dir, exist_ok=True)
+        extra = [meta for portfolio_id, meta in self._meta.items() if portfolio_id != self.DEFAULT_ID]
+        tmp_file = f'{self.index_file}.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump({'portfolios': extra}, file, indent=2)
+        os.replace(tmp_file, self.index_file)
@@ -1,4 +1,5 @@
 """Routes package"""
 from .portfolio_routes import portfolio_bp, init_routes
+from .admin_routes import admin_bp, init_admin_routes
 
-__all__ = ['portfolio_bp', 'init_routes']
\ No newline at end of file
+__all__ = ['portfolio_bp', 'init_routes', 'admin_bp', 'init_admin_routes']
\ No newline at end of file
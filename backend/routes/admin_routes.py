@@ -0,0 +1,44 @@
+"""
+Admin API routes
+"""
+from flask import Blueprint, Response, request, jsonify
+
+admin_bp = Blueprint('admin', __name__)
+
+# Injected by the main app
+profiler = None
+
+
+def init_admin_routes(request_profiler):
+    """Initialize admin routes with dependencies"""
+    global profiler
+    profiler = request_profiler
+
+
+@admin_bp.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List the most recent request profiles, optionally for one route"""
+    if not profiler.is_authorized():
+        return jsonify({'error': 'Admin token required'}), 403
+
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(profiler.recent(request.args.get('route'), limit)), 200
+
+
+@admin_bp.route('/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Get one profile; format=folded returns flamegraph-ready collapsed stacks"""
+    if not profiler.is_authorized():
+        return jsonify({'error': 'Admin token required'}), 403
+
+    profile = profiler.get(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+
+    if request.args.get('format') == 'folded':
+        lines = [f"{stack} {count}" for stack, count in profile['stacks'].items()]
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain')
+    return jsonify(profile), 200
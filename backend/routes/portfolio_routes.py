@@ -1,27 +1,345 @@
 """
 Portfolio API routes
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, g, request, jsonify
+import csv
 import datetime
+import io
+import logging
 import random
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional, Tuple
+
+from models.portfolio import VersionConflict
+from services.export_service import EXPORT_FORMATS, EXTENSIONS, MIMETYPES, arrow_available, holdings_table, prices_table, stream, values_table
+from services.fx_service import currency_for_ticker, holding_currency, normalize_currency
+from services.metrics_service import metrics
+from services.series import downsample, lttb_indices, msgpack_available, pack, to_columns
+from services.trading_calendar import get_calendar
 
 portfolio_bp = Blueprint('portfolio', __name__)
+logger = logging.getLogger(__name__)
 
 # These will be injected by the main app
-portfolio_model = None
+portfolio_store = None
 stock_service = None
 ai_service = None
-sector_map = None
-
-
-def init_routes(portfolio, stock_svc, ai_svc, sectors):
+metadata = None
+symbol_index = None
+risk_engine = None
+correlation_tracker = None
+projection_engine = None
+portfolio_optimizer = None
+alert_engine = None
+fx_service = None
+corporate_actions = None
+tick_store = None
+
+HISTORY_FORMATS = ('rows', 'columns', 'msgpack')
+PAGE_PARAMS = ('limit', 'cursor', 'sort', 'sector', 'prefix')
+
+
+def init_routes(portfolios, stock_svc, ai_svc, metadata_resolver, symbols=None, risk=None, correlations=None,
+                projections=None, optimizer=None, alerts=None, fx=None, actions=None, ticks=None):
     """Initialize routes with dependencies"""
-    global portfolio_model, stock_service, ai_service, sector_map
-    portfolio_model = portfolio
+    global portfolio_store, stock_service, ai_service, metadata, symbol_index, risk_engine, correlation_tracker
+    global projection_engine, portfolio_optimizer, alert_engine, fx_service, corporate_actions, tick_store
+    portfolio_store = portfolios
     stock_service = stock_svc
     ai_service = ai_svc
-    sector_map = sectors
+    metadata = metadata_resolver
+    symbol_index = symbols
+    risk_engine = risk
+    correlation_tracker = correlations
+    projection_engine = projections
+    portfolio_optimizer = optimizer
+    alert_engine = alerts
+    fx_service = fx
+    corporate_actions = actions
+    tick_store = ticks
+
+
+@portfolio_bp.url_value_preprocessor
+def pull_portfolio_id(endpoint, values):
+    """Routes without a /portfolios/<portfolio_id> prefix act on the default portfolio"""
+    g.portfolio_id = (values or {}).pop('portfolio_id', portfolio_store.DEFAULT_ID)
+
+
+@portfolio_bp.before_request
+def load_portfolio():
+    """Resolve the portfolio the request is scoped to"""
+    g.portfolio = portfolio_store.get(g.portfolio_id)
+    if g.portfolio is None:
+        return jsonify({'error': f'Portfolio {g.portfolio_id} not found'}), 404
+
+
+def apply_prices(holdings: List[Dict], prices: Dict[str, float], variations: Dict[str, float]) -> int:
+    """Set current prices from a quote batch; returns how many came from live data
+
+    Tickers without a live quote move by a simulated variation shared by every
+    portfolio holding that ticker.
+    """
+    updated_count = 0
+    for holding in holdings:
+        ticker = holding['ticker'].upper()
+        real_price = prices.get(ticker)
+        if real_price:
+            holding['current_price'] = real_price
+            updated_count += 1
+        else:
+            variation = variations.setdefault(ticker, 0.95 + random.random() * 0.1)
+            holding['current_price'] = round(holding['current_price'] * variation, 2)
+    return updated_count
+
+
+def check_alerts(prices: Dict[str, Optional[float]]) -> List[Dict]:
+    """Evaluate live quotes against the price alerts; returns the alerts they triggered"""
+    return alert_engine.evaluate(prices) if alert_engine is not None else []
+
+
+def observe_quotes(prices: Dict[str, Optional[float]]) -> List[Dict]:
+    """Feed a quote batch to the intraday tick buffers and the price alerts; returns the alerts triggered"""
+    if tick_store is not None:
+        tick_store.record(prices)
+    return check_alerts(prices)
+
+
+def fill_sectors(holdings: List[Dict]) -> List[Dict]:
+    """Fill unresolved sectors from the metadata cache, in place"""
+    for holding in holdings:
+        if holding['sector'] in ('Other', ''):
+            holding['sector'] = metadata.sector(holding['ticker'])
+    return holdings
+
+
+def adjust_splits(holdings: List[Dict]) -> List[Dict]:
+    """Shares and buy prices restated for splits since purchase, with dividend income"""
+    return corporate_actions.adjust_holdings(holdings) if corporate_actions is not None else holdings
+
+
+def load_holdings() -> List[Dict]:
+    """Holdings of the request's portfolio, split-adjusted, with unresolved sectors filled from the metadata cache"""
+    return fill_sectors(adjust_splits(g.portfolio.load_holdings()))
+
+
+def as_traded_prices(tickers: List[str], dates: List[str], prices: List[float]) -> List[float]:
+    """Provider closes (split-adjusted) as the prices actually traded on those dates"""
+    if corporate_actions is None or not tickers:
+        return prices
+    corporate_actions.ensure(set(tickers))
+    factors = corporate_actions.split_factors(tickers, dates).tolist()
+    return [round(price * factor, 4) for price, factor in zip(prices, factors)]
+
+
+def is_iso_date(value) -> bool:
+    try:
+        datetime.date.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def restate_for_splits(transactions: List[Dict]) -> List[Dict]:
+    """Trades with the ledger brought onto one split basis per ticker
+
+    Lots are recorded as traded and restated on read from their position's
+    first purchase. When trades would mix lots from both sides of a split
+    (a held ticker, or several lots in one batch), the position is first
+    restated to today's shares with a split entry dated today, and the new
+    lots are recorded in today's shares too. Tickers with a split in the
+    batch are left as given.
+    """
+    if corporate_actions is None:
+        return transactions
+    tickers = [str(t.get('ticker') or '').upper().strip() for t in transactions]
+    kinds = [str(t.get('type', '')).lower() for t in transactions]
+    recorded = {ticker for ticker, kind in zip(tickers, kinds) if kind == 'split'}
+    # Trades without a valid date are left for the ledger to reject
+    trades = [i for i, kind in enumerate(kinds)
+              if kind in ('buy', 'sell') and is_iso_date(transactions[i].get('date')) and tickers[i] not in recorded]
+    snapshot = g.portfolio.snapshot()
+    rows = snapshot.rows()
+    counts: Dict[str, int] = {}
+    for i in trades:
+        counts[tickers[i]] = counts.get(tickers[i], 0) + 1
+    mixed = sorted(ticker for ticker, count in counts.items() if ticker in rows or count > 1)
+    if not mixed:
+        return transactions
+    corporate_actions.ensure(mixed)
+
+    held = [snapshot.holdings[rows[ticker]] for ticker in mixed if ticker in rows]
+    existing = dict(zip([h['ticker'].upper() for h in held], corporate_actions.split_factors(
+        [h['ticker'] for h in held], [max(h['purchase_date'], h.get('split_date') or '') for h in held]).tolist()))
+    factors = dict(zip(trades, corporate_actions.split_factors(
+        [tickers[i] for i in trades], [transactions[i]['date'] for i in trades]).tolist()))
+    restated = {ticker for ticker in mixed
+                if abs(existing.get(ticker, 1.0) - 1) > 1e-9
+                or any(abs(factor - 1) > 1e-9 for i, factor in factors.items() if tickers[i] == ticker)}
+    if not restated:
+        return transactions
+
+    today = datetime.date.today().isoformat()
+    result = [{'type': 'split', 'ticker': ticker, 'ratio': existing.get(ticker, 1.0), 'date': today}
+              for ticker in sorted(restated)]
+    for i, transaction in enumerate(transactions):
+        if i in factors and tickers[i] in restated:
+            factor = factors[i]
+            transaction = {**transaction, 'shares': float(transaction.get('shares') or 0) * factor,
+                           'price': float(transaction.get('price') or 0) / factor}
+        result.append(transaction)
+    return result
+
+
+def is_listed(ticker: str) -> Optional[bool]:
+    """Check a ticker against the local symbol index
+
+    True if listed, False if the index rules it out, None when the index
+    cannot decide (no index, or a non-strict index that has not seen it).
+    """
+    if symbol_index is None or not symbol_index.is_available():
+        return None
+    if symbol_index.contains(ticker):
+        return True
+    return False if symbol_index.strict else None
+
+
+def unknown_ticker_message(ticker: str) -> str:
+    suggestions = symbol_index.suggest(ticker) if symbol_index is not None else []
+    hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ''
+    return f'Unknown ticker symbol "{ticker}".{hint}'
+
+
+def wants_page() -> bool:
+    return any(param in request.args for param in PAGE_PARAMS)
+
+
+def base_currency() -> str:
+    """Currency values are reported in: ?currency=, else the configured base currency"""
+    default = fx_service.base_currency if fx_service is not None else 'USD'
+    return normalize_currency(request.args.get('currency') or default)
+
+
+def valuation_rates(holdings: List[Dict]) -> Optional[Tuple[List[float], List[float]]]:
+    """Per-holding FX rates into the base currency (current, purchase date); None if no conversion is needed"""
+    base = base_currency()
+    if fx_service is None:
+        if any(holding_currency(holding) != base for holding in holdings):
+            raise ValueError('Currency conversion is not configured')
+        return None
+    return fx_service.valuation(holdings, base)
+
+
+def value_conversion(holdings: List[Dict]):
+    """Rate lookup for value series in the base currency (see RiskEngine.value_series); None if no conversion is needed"""
+    base = base_currency()
+    if all(holding_currency(holding) == base for holding in holdings):
+        return None
+    if fx_service is None:
+        raise ValueError('Currency conversion is not configured')
+    return lambda currencies, dates: fx_service.rate_table(currencies, dates, base)
+
+
+def portfolio_metrics(holdings: List[Dict], rates=None) -> Dict:
+    """Summary metrics in the base currency"""
+    rates = rates if rates is not None else valuation_rates(holdings)
+    return {**g.portfolio.calculate_metrics(holdings, rates), 'currency': base_currency()}
+
+
+def ai_context(holdings: List[Dict]) -> Dict:
+    """Portfolio summary sent to the AI service; values are in the base currency, prices as listed"""
+    rates = valuation_rates(holdings)
+    metrics = portfolio_metrics(holdings, rates)
+    value_rates, cost_rates = rates or ([1.0] * len(holdings), [1.0] * len(holdings))
+    context = {
+        'total_holdings': len(holdings),
+        'currency': metrics['currency'],
+        'total_value': metrics['total_value'],
+        'total_gain_loss': metrics['total_gain_loss'],
+        'gain_loss_percentage': metrics['gain_loss_percentage'],
+        'holdings': []
+    }
+    for holding, value_rate, cost_rate in zip(holdings, value_rates, cost_rates):
+        market_value = holding['shares'] * holding['current_price'] * value_rate
+        cost = holding['shares'] * holding['buy_price'] * cost_rate
+        context['holdings'].append({
+            'ticker': holding['ticker'],
+            'sector': holding['sector'],
+            'shares': holding['shares'],
+            'buy_price': holding['buy_price'],
+            'current_price': holding['current_price'],
+            'currency': holding_currency(holding),
+            'market_value': round(market_value, 2),
+            'return_percentage': (market_value - cost) / cost * 100 if cost > 0 else 0,
+            'purchase_date': holding['purchase_date']
+        })
+    return context
+
+
+def holdings_index():
+    """Cached sorted views of the request's portfolio, rebuilt when holdings, prices, resolved sectors, FX rates or corporate actions change"""
+    base = base_currency()
+    fx_version = fx_service.version if fx_service is not None else None
+    actions_version = corporate_actions.version if corporate_actions is not None else None
+    return g.portfolio.get_index(metadata.sector, (metadata.version, base, fx_version, actions_version),
+                                 valuation_rates, adjust_splits)
+
+
+def holdings_page(index) -> Dict:
+    """Page of holdings for the request's paging parameters"""
+    limit = int(request.args.get('limit', 50))
+    if not 1 <= limit <= 1000:
+        raise ValueError('limit must be between 1 and 1000')
+    sort = request.args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    page = index.page(sort, descending, limit, request.args.get('cursor') or None,
+                      request.args.get('sector') or None, request.args.get('prefix') or None)
+    return {**page, 'sort': sort, 'order': 'desc' if descending else 'asc'}
+
+
+def history_options() -> Tuple[Optional[int], str]:
+    """Validated ?points= and ?format= for history endpoints"""
+    points = request.args.get('points')
+    output_format = request.args.get('format', 'rows')
+    if output_format not in HISTORY_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(HISTORY_FORMATS)}")
+    if output_format == 'msgpack' and not msgpack_available():
+        raise ValueError('format=msgpack requires the msgpack package (pip install msgpack)')
+    if points is not None:
+        points = int(points)
+        if points < 3:
+            raise ValueError('points must be at least 3')
+    return points, output_format
+
+
+def history_response(body: Dict, output_format: str):
+    """JSON, or MessagePack for format=msgpack"""
+    if output_format == 'msgpack':
+        return Response(pack(body), mimetype='application/msgpack'), 200
+    return jsonify(body), 200
+
+
+def export_options() -> Tuple[str, int]:
+    """Validated ?format= and ?days= for export endpoints"""
+    output_format = request.args.get('format', 'arrow')
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if not arrow_available():
+        raise ValueError('Exports require the pyarrow package (pip install pyarrow)')
+    days = int(request.args.get('days', 365))
+    if not 1 <= days <= 3650:
+        raise ValueError('days must be between 1 and 3650')
+    return output_format, days
+
+
+def export_response(table, name: str, output_format: str, headers: Optional[Dict] = None) -> Response:
+    """Stream a table as an Arrow IPC stream or Parquet file attachment"""
+    filename = f'{g.portfolio_id}-{name}.{EXTENSIONS[output_format]}'
+    return Response(stream(table, output_format), mimetype=MIMETYPES[output_format], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Row-Count': str(table.num_rows),
+        **(headers or {})
+    })
 
 
 @portfolio_bp.route('/health', methods=['GET'])
@@ -30,45 +348,181 @@ def health_check():
     return jsonify({'status': 'healthy', 'timestamp': datetime.datetime.now().isoformat()})
 
 
+@portfolio_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics: route latency, provider latency/errors, cache hit rates"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@portfolio_bp.route('/portfolios', methods=['GET'])
+def list_portfolios():
+    """List portfolios, optionally filtered by account"""
+    return jsonify(portfolio_store.list_portfolios(request.args.get('account'))), 200
+
+
+@portfolio_bp.route('/portfolios', methods=['POST'])
+def create_portfolio():
+    """Create a new, empty portfolio"""
+    try:
+        data = request.get_json() or {}
+        name = data.get('name', '').strip()
+        if not name:
+            return jsonify({'error': 'Portfolio name is required'}), 400
+
+        meta = portfolio_store.create(name, data.get('account', 'default').strip() or 'default', data.get('id'))
+        return jsonify({'message': f'Created portfolio {name}', 'portfolio': meta}), 201
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/portfolios/<portfolio_id>', methods=['DELETE'])
+def delete_portfolio():
+    """Delete a portfolio and its holdings"""
+    try:
+        portfolio_store.delete(g.portfolio_id)
+        return jsonify({'message': 'Portfolio deleted successfully'}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/portfolios/refresh-prices', methods=['POST'])
+def refresh_all_prices():
+    """Refresh every portfolio, fetching each distinct ticker only once
+
+    Quotes are fetched without holding anything; each portfolio then applies
+    them to its latest snapshot, so holdings added or removed meanwhile are
+    kept.
+    """
+    try:
+        portfolios = portfolio_store.all()
+        tickers = {h['ticker'].upper() for _, portfolio in portfolios for h in portfolio.snapshot().holdings}
+
+        prices = stock_service.get_real_time_prices(sorted(tickers))
+        triggered = observe_quotes(prices)
+        variations = {}
+
+        results = []
+        for portfolio_id, portfolio in portfolios:
+            snapshot, updated_count = portfolio.update(lambda holdings: apply_prices(holdings, prices, variations))
+            results.append({
+                'portfolio_id': portfolio_id,
+                'holdings': len(snapshot.holdings),
+                'updated_from_live_data': updated_count
+            })
+
+        return jsonify({
+            'message': f'Refreshed {len(results)} portfolios from {len(tickers)} distinct tickers',
+            'distinct_tickers': len(tickers),
+            'live_quotes': sum(1 for price in prices.values() if price),
+            'alerts_triggered': len(triggered),
+            'portfolios': results
+        }), 200
+
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
 @portfolio_bp.route('/portfolio', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>', methods=['GET'])
 def get_portfolio():
-    """Get complete portfolio data including holdings and metrics"""
-    holdings = portfolio_model.load_holdings()
-    metrics = portfolio_model.calculate_metrics(holdings)
+    """Get complete portfolio data including holdings and metrics
+
+    With any of the /holdings paging parameters, 'holdings' is one page and
+    the response adds 'total' and 'next_cursor'.
+    """
+    if wants_page():
+        try:
+            index = holdings_index()
+            return jsonify({**holdings_page(index), 'metrics': {**index.metrics, 'currency': base_currency()}})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    try:
+        holdings = load_holdings()
+        metrics = portfolio_metrics(holdings)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({
         'holdings': holdings,
         'metrics': metrics
     })
 
 
+@portfolio_bp.route('/symbols', methods=['GET'])
+def search_symbols():
+    """Ticker autocomplete answered from the local symbol index"""
+    try:
+        prefix = request.args.get('prefix', '').strip()
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        if not prefix:
+            return jsonify({'error': 'Query parameter prefix is required'}), 400
+        if symbol_index is None or not symbol_index.is_available():
+            return jsonify({'error': 'Symbol index is not available'}), 503
+        matches = symbol_index.prefix_search(prefix, limit)
+        return jsonify({'prefix': prefix.upper(), 'symbols': matches, 'count': len(matches)})
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @portfolio_bp.route('/holdings', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/holdings', methods=['GET'])
 def get_holdings():
-    """Get all stock holdings"""
-    holdings = portfolio_model.load_holdings()
-    return jsonify(holdings)
+    """Get all stock holdings, or one sorted and filtered page
+
+    Paging query: limit (default 50, max 1000), cursor (next_cursor of the
+    previous page), sort (id, ticker, value, return, weight or date; prefix
+    with '-' for descending), sector, prefix (ticker prefix). Without any of
+    these the full list is returned as before.
+    """
+    if not wants_page():
+        return jsonify(load_holdings())
+    try:
+        return jsonify(holdings_page(holdings_index()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 
 @portfolio_bp.route('/holdings', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/holdings', methods=['POST'])
 def add_holding():
-    """Add a new stock holding"""
+    """Add a stock holding, or another purchase (tax lot) of a ticker already held"""
     try:
         data = request.get_json()
-        print(f"Received request to add holding: {data}")
+        logger.debug(f"Received request to add holding: {data}")
 
         ticker = data.get('ticker', '').upper().strip()
         shares = data.get('shares')
         purchase_date = data.get('purchase_date')
         manual_buy_price = data.get('buy_price')
+        currency = data.get('currency')
 
         if not ticker or shares is None or not purchase_date:
             error_msg = 'Missing required fields: ticker, shares, purchase_date'
-            print(f"Validation error: {error_msg}")
+            logger.info(f"Validation error: {error_msg}")
             return jsonify({'error': error_msg}), 400
 
-        shares = float(shares)
-        print(f"Processing: {ticker}, {shares} shares, purchased on {purchase_date}")
+        # Parsed on their own so that later ValueErrors (ledger validation) keep their message
+        try:
+            shares = float(shares)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid number format for shares'}), 400
+        try:
+            manual_buy_price = float(manual_buy_price) if manual_buy_price else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid number format for buy_price'}), 400
+        logger.debug(f"Processing: {ticker}, {shares} shares, purchased on {purchase_date}")
         if manual_buy_price:
-            print(f"Manual buy price provided: ${manual_buy_price}")
+            logger.debug(f"Manual buy price provided: ${manual_buy_price}")
 
         # Validation
         if not ticker:
@@ -85,148 +539,457 @@ def add_holding():
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
 
-        holdings = portfolio_model.load_holdings()
-        existing_tickers = [h['ticker'].upper() for h in holdings]
-        if ticker in existing_tickers:
-            error_msg = f'Stock {ticker} already exists in portfolio'
-            print(f"Duplicate ticker error: {error_msg}")
+        # Prices are in the listing currency; without one it follows the exchange suffix (e.g. .L, .TO)
+        try:
+            currency = normalize_currency(currency) if currency else currency_for_ticker(ticker)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        listed = is_listed(ticker)
+        if listed is False:
+            error_msg = unknown_ticker_message(ticker)
+            logger.info(f"Ticker validation error: {error_msg}")
             return jsonify({'error': error_msg}), 400
 
         if manual_buy_price:
-            buy_price = float(manual_buy_price)
-            print(f"Using manual buy price: ${buy_price}")
+            buy_price = manual_buy_price
+            logger.debug(f"Using manual buy price: ${buy_price}")
         else:
-            print(f"Fetching historical price for {ticker} on {purchase_date}...")
+            logger.debug(f"Fetching historical price for {ticker} on {purchase_date}...")
 
-            # First try to get current price to validate ticker
-            current_validation_price = stock_service.get_real_time_price(ticker)
-            if current_validation_price is None:
+            # Tickers the symbol index does not know are validated with a live quote
+            if listed is None and stock_service.get_real_time_price(ticker) is None:
                 error_msg = f'Invalid ticker symbol "{ticker}". Please verify the ticker symbol is correct. Common examples: AAPL (Apple), GOOGL (Google), MSFT (Microsoft), TSLA (Tesla).'
-                print(f"Ticker validation error: {error_msg}")
+                logger.info(f"Ticker validation error: {error_msg}")
                 return jsonify({'error': error_msg}), 400
 
-            buy_price = stock_service.get_historical_price(ticker, purchase_date)
+            # Weekend and holiday purchases are priced at the prior session's close
+            price_date = get_calendar().previous_session(parsed_date.date()).isoformat()
+            buy_price = stock_service.get_historical_price(ticker, price_date)
+            if buy_price is not None:
+                buy_price = as_traded_prices([ticker], [price_date], [buy_price])[0]
             if buy_price is None:
                 error_msg = f'Could not fetch historical price for {ticker} on {purchase_date}. The ticker appears valid but data is not available for that date. Please try: (1) A different date, (2) Wait 60 seconds if rate limited, (3) Enter the price manually.'
-                print(f"Price fetch error: {error_msg}")
+                logger.warning(f"Price fetch error: {error_msg}")
                 return jsonify({
                     'error': error_msg,
                     'suggestion': f'Try a more recent date or enter the historical price manually.'
                 }), 400
-            print(f"Successfully fetched buy price: ${buy_price}")
+            logger.debug(f"Successfully fetched buy price: ${buy_price}")
 
-        current_price = buy_price
+        # A ticker already held gets another tax lot; a new one becomes a holding
+        held = any(h['ticker'].upper() == ticker for h in g.portfolio.snapshot().holdings)
+        snapshot, positions = g.portfolio.record(
+            restate_for_splits([{'type': 'buy', 'ticker': ticker, 'shares': shares, 'price': buy_price, 'date': purchase_date}]),
+            sectors={ticker: metadata.sector(ticker)}, currencies={ticker: currency})
+        holding = adjust_splits([next(h for h in snapshot.holdings if h['ticker'].upper() == ticker)])[0]
 
-        # Create new holding
-        new_holding = {
-            'id': max([h['id'] for h in holdings], default=0) + 1,
-            'ticker': ticker,
-            'shares': shares,
-            'buy_price': buy_price,
-            'current_price': current_price,
-            'purchase_date': purchase_date,
-            'sector': sector_map.get(ticker, 'Other')
-        }
+        action = f'Added {shares:g} shares of {ticker}' if held else f'Successfully added {ticker} to portfolio'
+        return jsonify({
+            'message': f"{action} (bought at {'$' if currency == 'USD' else currency + ' '}{buy_price} on {purchase_date})",
+            'holding': holding,
+            'position': positions[ticker].to_dict()
+        }), 201
+
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
 
-        holdings.append(new_holding)
-        portfolio_model.save_holdings(holdings)
+
+# Accepted column names for bulk imports (brokerage exports vary)
+IMPORT_FIELD_ALIASES = {
+    'ticker': ('ticker', 'symbol'),
+    'shares': ('shares', 'quantity', 'qty'),
+    'purchase_date': ('purchase_date', 'date', 'trade_date'),
+    'buy_price': ('buy_price', 'price', 'cost_per_share'),
+    'currency': ('currency', 'ccy')
+}
+
+
+def read_import_rows() -> List[Dict]:
+    """Rows from a multipart 'file' upload, a text/csv body or a JSON body"""
+    if 'file' in request.files:
+        return list(csv.DictReader(io.StringIO(request.files['file'].read().decode('utf-8-sig'))))
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+
+    data = request.get_json()
+    rows = data.get('holdings') if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise ValueError('Expected CSV, a JSON list of holdings, or {"holdings": [...]}')
+    return rows
+
+
+def normalize_lot(row: Dict, today: datetime.date) -> Dict:
+    """Validate one imported row; raises ValueError with a user-facing message"""
+    fields = {key.strip().lower(): value for key, value in row.items() if key}
+    lot = {}
+    for field, aliases in IMPORT_FIELD_ALIASES.items():
+        lot[field] = next((fields[a] for a in aliases if fields.get(a) not in (None, '')), None)
+
+    ticker = str(lot['ticker'] or '').upper().strip()
+    if not ticker:
+        raise ValueError('Missing ticker')
+    if lot['shares'] is None or not lot['purchase_date']:
+        raise ValueError(f'{ticker}: missing shares or purchase_date')
+
+    shares = float(lot['shares'])
+    if shares <= 0:
+        raise ValueError(f'{ticker}: number of shares must be positive')
+    try:
+        purchase_date = datetime.datetime.strptime(str(lot['purchase_date']).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{ticker}: invalid date format, use YYYY-MM-DD')
+    if purchase_date > today:
+        raise ValueError(f'{ticker}: purchase date cannot be in the future')
+
+    buy_price = float(lot['buy_price']) if lot['buy_price'] is not None else None
+    if buy_price is not None and buy_price <= 0:
+        raise ValueError(f'{ticker}: buy price must be positive')
+
+    return {
+        'ticker': ticker,
+        'shares': shares,
+        'purchase_date': purchase_date.strftime('%Y-%m-%d'),
+        'buy_price': buy_price,
+        'currency': normalize_currency(lot['currency']) if lot['currency'] else currency_for_ticker(ticker)
+    }
+
+
+@portfolio_bp.route('/holdings/import', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/holdings/import', methods=['POST'])
+def import_holdings():
+    """Bulk-import lots from CSV or JSON in a single write
+
+    Missing buy prices are resolved with one batched history download for
+    all tickers. Every lot is recorded as a buy in the ledger, so lots of the
+    same ticker, including positions already held, form one position at
+    their weighted average cost. Any invalid row rejects the whole import
+    unless ?skip_invalid=true.
+    """
+    try:
+        rows = read_import_rows()
+        skip_invalid = request.args.get('skip_invalid', 'false').lower() == 'true'
+        today = datetime.datetime.now().date()
+
+        lots = []
+        errors = []
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                lot = normalize_lot(row, today)
+                if is_listed(lot['ticker']) is False:
+                    raise ValueError(unknown_ticker_message(lot['ticker']))
+                lot['row'] = row_number
+                lots.append(lot)
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append({'row': row_number, 'error': str(e)})
+
+        calendar = get_calendar()
+        dates_by_ticker = {}
+        for lot in lots:
+            if lot['buy_price'] is None:
+                lot['price_date'] = calendar.previous_session(lot['purchase_date']).isoformat()
+                dates_by_ticker.setdefault(lot['ticker'], set()).add(lot['price_date'])
+        resolved = stock_service.get_historical_prices_bulk(
+            {ticker: sorted(dates) for ticker, dates in dates_by_ticker.items()})
+
+        priced_lots = []
+        fetched = []
+        for lot in lots:
+            if lot['buy_price'] is None:
+                history = resolved.get(lot['ticker'])
+                if history is None:
+                    errors.append({'row': lot['row'], 'error': f"{lot['ticker']}: no price data found. Check the symbol or include buy_price"})
+                    continue
+                lot['buy_price'] = history['prices'][lot['price_date']]
+                fetched.append(lot)
+            priced_lots.append(lot)
+        for lot, price in zip(fetched, as_traded_prices([lot['ticker'] for lot in fetched], [lot['price_date'] for lot in fetched],
+                                                        [lot['buy_price'] for lot in fetched])):
+            lot['buy_price'] = price
+
+        errors.sort(key=lambda e: e['row'])
+        if errors and not skip_invalid:
+            return jsonify({
+                'error': f'{len(errors)} of {len(rows)} rows could not be imported; nothing was saved',
+                'errors': errors[:100]
+            }), 400
+        if not priced_lots:
+            return jsonify({'error': 'No valid rows to import', 'errors': errors[:100]}), 400
+
+        tickers = {lot['ticker'] for lot in priced_lots}
+        held = {h['ticker'].upper() for h in g.portfolio.snapshot().holdings}
+        # Oldest lots first, so sells later consume them in FIFO order
+        priced_lots.sort(key=lambda lot: (lot['purchase_date'], lot['row']))
+        g.portfolio.record(
+            restate_for_splits([{'type': 'buy', 'ticker': lot['ticker'], 'shares': lot['shares'], 'price': lot['buy_price'],
+                                 'date': lot['purchase_date']} for lot in priced_lots]),
+            sectors={ticker: metadata.sector(ticker) for ticker in tickers - held},
+            current_prices={ticker: history['latest'] for ticker, history in resolved.items()},
+            currencies={lot['ticker']: lot['currency'] for lot in priced_lots})
+        merged = len(tickers & held)
+        created = len(tickers) - merged
 
         return jsonify({
-            'message': f'Successfully added {ticker} to portfolio (bought at ${buy_price} on {purchase_date})',
-            'holding': new_holding
+            'message': f'Imported {len(priced_lots)} lots into {created} new and {merged} existing positions',
+            'lots_imported': len(priced_lots),
+            'positions_created': created,
+            'positions_merged': merged,
+            'rows_skipped': len(errors),
+            'price_lookups': len(dates_by_ticker),
+            'errors': errors[:100]
         }), 201
 
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 409
     except ValueError as e:
-        return jsonify({'error': 'Invalid number format for shares'}), 400
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/transactions', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/transactions', methods=['POST'])
+def record_transactions():
+    """Append buys, sells or splits to the ledger
+
+    Body: one transaction or {"transactions": [...]}, each with type
+    (buy|sell|split), ticker, date (YYYY-MM-DD, not in the future), and
+    shares + price (buy, sell) or ratio (split). Sells consume the
+    earliest-bought lots first and realize P&L; a batch with an invalid
+    date or a sell larger than the shares bought by its date is rejected
+    as a whole.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        transactions = data.get('transactions', [data]) if isinstance(data, dict) else data
+        if not transactions:
+            return jsonify({'error': 'No transactions given'}), 400
+        for transaction in transactions:
+            if str(transaction.get('type', '')).lower() == 'remove':
+                return jsonify({'error': 'Use DELETE /holdings/<id> to remove a holding'}), 400
+
+        tickers = {str(t.get('ticker') or '').upper().strip() for t in transactions}
+        currencies = {str(t.get('ticker') or '').upper().strip(): normalize_currency(t['currency']) for t in transactions
+                      if t.get('currency')}
+        snapshot, positions = g.portfolio.record(
+            restate_for_splits(transactions), sectors={ticker: metadata.sector(ticker) for ticker in tickers},
+            currencies={ticker: currencies.get(ticker) or currency_for_ticker(ticker) for ticker in tickers})
+        rows = {h['ticker'].upper(): h for h in snapshot.holdings}
+        return jsonify({
+            'message': f'Recorded {len(transactions)} transactions',
+            'positions': [position.to_dict() for position in positions.values()],
+            'holdings': adjust_splits([rows[ticker] for ticker in positions if ticker in rows])
+        }), 201
+
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
+@portfolio_bp.route('/positions', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/positions', methods=['GET'])
+def get_positions():
+    """Ledger positions: quantity, cost basis and realized P&L per ticker (?lots=true adds open lots)"""
+    try:
+        include_lots = request.args.get('lots', 'false').lower() == 'true'
+        ticker = request.args.get('ticker', '').upper().strip()
+        positions = g.portfolio.ledger.positions()
+        if ticker:
+            positions = {ticker: positions[ticker]} if ticker in positions else {}
+        rows = [position.to_dict(include_lots) for _, position in sorted(positions.items())]
+        return jsonify({
+            'positions': rows,
+            'realized_pnl': round(sum(position.realized_pnl for position in positions.values()), 2)
+        })
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/alerts', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/alerts', methods=['GET'])
+def list_alerts():
+    """Price alerts of the portfolio (?status=active|triggered, ?ticker=)"""
+    if alert_engine is None:
+        return jsonify({'error': 'Price alerts are not configured'}), 503
+    ticker = request.args.get('ticker', '').upper().strip() or None
+    return jsonify({'alerts': alert_engine.rules(g.portfolio_id, ticker, request.args.get('status'))})
+
+
+@portfolio_bp.route('/alerts', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/alerts', methods=['POST'])
+def create_alerts():
+    """Create price alerts: one rule or {"alerts": [...]}
+
+    Each rule has kind above|below (threshold is a price) or move (threshold
+    is a percent move from the holding's buy price, negative for drops), and
+    a ticker or holding_id; move alerts need a holding. Alerts fire once,
+    on the first quote update that reaches them.
+    """
+    if alert_engine is None:
+        return jsonify({'error': 'Price alerts are not configured'}), 503
+    try:
+        data = request.get_json(silent=True) or {}
+        rules = data.get('alerts', [data]) if isinstance(data, dict) else data
+        if not rules:
+            return jsonify({'error': 'No alerts given'}), 400
+
+        holdings = adjust_splits(list(g.portfolio.snapshot().holdings))
+        by_id = {h['id']: h for h in holdings}
+        rows = {h['ticker'].upper(): h for h in holdings}
+        prepared = []
+        for rule in rules:
+            rule = dict(rule, portfolio_id=g.portfolio_id)
+            if rule.get('holding_id') is not None:
+                holding = by_id.get(int(rule['holding_id']))
+                if holding is None:
+                    return jsonify({'error': f"Holding {rule['holding_id']} not found"}), 404
+                rule['ticker'] = holding['ticker']
+            else:
+                ticker = str(rule.get('ticker') or '').upper().strip()
+                holding = rows.get(ticker)
+                if holding is not None:
+                    rule['holding_id'] = holding['id']
+            if str(rule.get('kind', '')).lower() == 'move':
+                rule['base_price'] = holding['buy_price'] if holding is not None else None
+            prepared.append(rule)
+
+        created = alert_engine.create(prepared)
+        return jsonify({'message': f'Created {len(created)} alerts', 'alerts': created[:100]}), 201
+
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/alerts/<int:alert_id>', methods=['DELETE'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/alerts/<int:alert_id>', methods=['DELETE'])
+def delete_alert(alert_id):
+    """Delete a price alert"""
+    if alert_engine is None:
+        return jsonify({'error': 'Price alerts are not configured'}), 503
+    if not alert_engine.delete(alert_id, g.portfolio_id):
+        return jsonify({'error': 'Alert not found'}), 404
+    return jsonify({'message': 'Alert deleted successfully'}), 200
+
+
 @portfolio_bp.route('/holdings/<int:holding_id>', methods=['DELETE'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/holdings/<int:holding_id>', methods=['DELETE'])
 def delete_holding(holding_id):
     """Delete a stock holding"""
     try:
-        holdings = portfolio_model.load_holdings()
-        original_length = len(holdings)
-        holdings = [h for h in holdings if h['id'] != holding_id]
+        def remove(holdings: List[Dict]) -> bool:
+            original_length = len(holdings)
+            holdings[:] = [h for h in holdings if h['id'] != holding_id]
+            return len(holdings) < original_length
 
-        if len(holdings) == original_length:
+        if not any(h['id'] == holding_id for h in g.portfolio.snapshot().holdings):
+            return jsonify({'error': 'Holding not found'}), 404
+        _, removed = g.portfolio.update(remove)
+        if not removed:
             return jsonify({'error': 'Holding not found'}), 404
 
-        portfolio_model.save_holdings(holdings)
         return jsonify({'message': 'Holding deleted successfully'}), 200
 
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
 @portfolio_bp.route('/refresh-prices', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/refresh-prices', methods=['POST'])
 def refresh_prices():
-    """Fetch real-time prices from Yahoo Finance and update holdings"""
-    try:
-        holdings = portfolio_model.load_holdings()
-        updated_count = 0
-
-        for i, holding in enumerate(holdings):
-            ticker = holding['ticker']
-            real_price = stock_service.get_real_time_price(ticker)
-
-            if real_price:
-                holding['current_price'] = real_price
-                updated_count += 1
-            else:
-                variation = 0.95 + random.random() * 0.1
-                holding['current_price'] = round(holding['current_price'] * variation, 2)
+    """Fetch real-time prices from Yahoo Finance and update holdings
 
-            if i < len(holdings) - 1:
-                import time
-                time.sleep(0.5)
+    Quotes are fetched first and applied to the latest snapshot at commit
+    time, so adds and deletes made during the fetch are not overwritten.
+    """
+    try:
+        prices = stock_service.get_real_time_prices([h['ticker'] for h in g.portfolio.snapshot().holdings])
+        triggered = observe_quotes(prices)
+        variations = {}
+        snapshot, updated_count = g.portfolio.update(lambda holdings: apply_prices(holdings, prices, variations))
 
-        portfolio_model.save_holdings(holdings)
-        metrics = portfolio_model.calculate_metrics(holdings)
+        holdings = fill_sectors(adjust_splits(snapshot.copy()))
+        metrics = portfolio_metrics(holdings)
 
         return jsonify({
             'message': f'Prices refreshed successfully ({updated_count}/{len(holdings)} from live data)',
             'holdings': holdings,
-            'metrics': metrics
+            'metrics': metrics,
+            'alerts_triggered': len(triggered)
         }), 200
 
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
 @portfolio_bp.route('/stock-history/<ticker>', methods=['GET'])
 def get_stock_history_endpoint(ticker):
-    """Get historical price data for a specific stock"""
+    """Get historical price data for a specific stock
+
+    Query: period (default 1mo), points (LTTB-downsample to this many rows,
+    shape-preserving on the close), format ('rows' of dicts, 'columns' of
+    parallel arrays, or 'msgpack' for columns packed with MessagePack).
+    """
     try:
         period = request.args.get('period', '1mo')
         ticker = ticker.upper()
+        points, output_format = history_options()
 
         history = stock_service.get_stock_history(ticker, period)
 
         if not history:
             return jsonify({'error': f'Unable to fetch history for {ticker}'}), 404
 
-        return jsonify({
+        total_points = len(history)
+        if points:
+            history = downsample(history, 'price', points)
+        if output_format == 'rows':
+            return jsonify({
+                'ticker': ticker,
+                'period': period,
+                'history': history
+            }), 200
+
+        return history_response({
             'ticker': ticker,
             'period': period,
-            'history': history
-        }), 200
+            'total_points': total_points,
+            'history': to_columns(history, ['date', 'price', 'open', 'high', 'low', 'volume'])
+        }, output_format)
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
 @portfolio_bp.route('/real-time-prices', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/real-time-prices', methods=['GET'])
 def get_all_real_time_prices():
     """Get real-time prices for all holdings"""
     try:
-        holdings = portfolio_model.load_holdings()
+        holdings = load_holdings()
+        quotes = stock_service.get_real_time_prices([h['ticker'] for h in holdings])
+        observe_quotes(quotes)
         prices = {}
 
         for holding in holdings:
             ticker = holding['ticker']
-            price = stock_service.get_real_time_price(ticker)
+            price = quotes.get(ticker.upper())
             if price:
                 prices[ticker] = {
                     'price': price,
@@ -240,51 +1003,208 @@ def get_all_real_time_prices():
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
+@portfolio_bp.route('/intraday/<ticker>', methods=['GET'])
+def get_intraday(ticker):
+    """Sparkline of the recent quotes recorded for a ticker (every quote fetch records them)
+
+    Query: minutes (only the last N minutes, default all kept ticks),
+    points and format as for /stock-history. The current quote is fetched
+    and recorded first, so a ticker has at least one tick.
+    """
+    if tick_store is None:
+        return jsonify({'error': 'Intraday quotes are not configured'}), 503
+    try:
+        ticker = ticker.upper()
+        points, output_format = history_options()
+        minutes = request.args.get('minutes')
+        since = None
+        if minutes is not None:
+            minutes = int(minutes)
+            if minutes <= 0:
+                raise ValueError('minutes must be positive')
+            since = time.time() - minutes * 60
+
+        observe_quotes(stock_service.get_real_time_prices([ticker]))
+        series = tick_store.series(ticker, since)
+        if series is None:
+            return jsonify({'error': f'No intraday quotes for {ticker}'}), 404
+        times, prices = series
+
+        total_points = len(times)
+        if points and total_points > points:
+            keep = lttb_indices(times.astype('float64'), prices.astype('float64'), points)
+            times, prices = times[keep], prices[keep]
+        timestamps = times.tolist()
+        closes = [round(price, 4) for price in prices.tolist()]
+        change = (closes[-1] - closes[0]) / closes[0] * 100 if closes and closes[0] else 0.0
+        body = {'ticker': ticker, 'total_points': total_points, 'change_percent': round(change, 2)}
+        if output_format == 'rows':
+            return jsonify({**body, 'ticks': [
+                {'timestamp': timestamp, 'time': datetime.datetime.fromtimestamp(timestamp).isoformat(timespec='seconds'),
+                 'price': price} for timestamp, price in zip(timestamps, closes)]}), 200
+        return history_response({**body, 'ticks': {'timestamp': timestamps, 'price': closes}}, output_format)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
 @portfolio_bp.route('/portfolio-history', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/portfolio-history', methods=['GET'])
 def get_portfolio_history():
-    """Generate simulated portfolio history for the last 30 days"""
+    """Daily portfolio value over the last `days` days (default 30) from historical closes
+
+    Query: points and format as for /stock-history; the default row format
+    is a bare list of {date, value, formatted_date}.
+    """
     try:
         days = int(request.args.get('days', 30))
-        holdings = portfolio_model.load_holdings()
-        history = []
+        points, output_format = history_options()
+        holdings = load_holdings()
+        history = risk_engine.value_history(holdings, days, value_conversion(holdings)) if holdings else []
+
+        if not history:
+            # No price history available: hold the current value flat
+            current_value = portfolio_metrics(holdings)['total_value'] if holdings else 0
+            logger.warning(f"No price history for portfolio {g.portfolio_id}, returning a flat series")
+            for i in range(days, -1, -1):
+                date = datetime.datetime.now() - datetime.timedelta(days=i)
+                history.append({
+                    'date': date.strftime('%Y-%m-%d'),
+                    'value': round(current_value, 2),
+                    'formatted_date': date.strftime('%b %d')
+                })
+
+        total_points = len(history)
+        if points:
+            history = downsample(history, 'value', points)
+        if output_format == 'rows':
+            return jsonify(history), 200
+
+        return history_response({
+            'days': days,
+            'currency': base_currency(),
+            'total_points': total_points,
+            'history': to_columns(history, ['date', 'value'])
+        }, output_format)
 
-        # Calculate current portfolio value
-        current_value = sum(h['shares'] * h['current_price'] for h in holdings)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
 
-        # Generate historical data with realistic volatility
-        for i in range(days, -1, -1):
-            date = datetime.datetime.now() - datetime.timedelta(days=i)
 
-            # Simulate daily returns with mean reversion
-            daily_return = random.gauss(0.001, 0.02)
-            base_value = current_value * (1 + daily_return * i * 0.1)
+@portfolio_bp.route('/projection', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/projection', methods=['GET'])
+def get_projection():
+    """Monte Carlo percentile bands of future portfolio value
 
-            # Add some randomness
-            random_factor = 0.95 + random.random() * 0.1
-            value = base_value * random_factor
+    Query: horizon (trading days, default 252), paths (default 10000, up to
+    1000000), method ('normal' from mean/covariance, or 'bootstrap' of
+    historical days), seed, points (bands to return, default 60), window.
+    """
+    try:
+        horizon = int(request.args.get('horizon', 252))
+        paths = int(request.args.get('paths', 10_000))
+        points = int(request.args.get('points', 60))
+        method = request.args.get('method', 'normal')
+        seed = request.args.get('seed')
+        window = request.args.get('window')
+        if not 1 <= horizon <= 2520:
+            return jsonify({'error': 'horizon must be between 1 and 2520 trading days'}), 400
+        if not 100 <= paths <= 1_000_000:
+            return jsonify({'error': 'paths must be between 100 and 1000000'}), 400
+        if method not in ('normal', 'bootstrap'):
+            return jsonify({'error': "method must be 'normal' or 'bootstrap'"}), 400
+
+        holdings = load_holdings()
+        if not holdings:
+            return jsonify({'error': 'Portfolio has no holdings'}), 400
+        result = projection_engine.project(holdings, horizon, paths, method,
+                                           int(seed) if seed is not None else None,
+                                           max(2, min(points, 500)), int(window) if window else None)
+        return jsonify(result), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/export/holdings', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/export/holdings', methods=['GET'])
+def export_holdings():
+    """Holdings of one snapshot as ?format=arrow (IPC stream, default) or parquet
+
+    X-Holdings-Version names the snapshot, so a job can tell whether the
+    holdings changed since its last export.
+    """
+    try:
+        output_format, _ = export_options()
+        snapshot = g.portfolio.snapshot()
+        table = holdings_table(fill_sectors(adjust_splits(snapshot.copy())))
+        return export_response(table, 'holdings', output_format, {'X-Holdings-Version': str(snapshot.version)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
 
-            history.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'value': round(value, 2),
-                'formatted_date': date.strftime('%b %d')
-            })
 
-        return jsonify(history), 200
+@portfolio_bp.route('/export/values', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/export/values', methods=['GET'])
+def export_values():
+    """Daily portfolio value over the last `days` days (default 365), as for /portfolio-history"""
+    try:
+        output_format, days = export_options()
+        holdings = adjust_splits(g.portfolio.load_holdings())
+        dates, values = risk_engine.value_series(holdings, days, value_conversion(holdings)) if holdings else ([], None)
+        if values is None or not len(dates):
+            return jsonify({'error': 'No price history available for this portfolio'}), 404
+        return export_response(values_table(dates, values), 'values', output_format)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/export/prices', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/export/prices', methods=['GET'])
+def export_prices():
+    """Daily closes of the portfolio's tickers (or ?tickers=A,B) over `days` days, one row per ticker and date
 
+    Served from the cached close histories, so every ticker is fetched at
+    most once per session close in one batched download.
+    """
+    try:
+        output_format, days = export_options()
+        tickers = [t.strip().upper() for t in request.args.get('tickers', '').split(',') if t.strip()]
+        if not tickers:
+            tickers = [h['ticker'].upper() for h in g.portfolio.snapshot().holdings]
+        tickers = sorted(set(tickers))
+        if len(tickers) > 5000:
+            return jsonify({'error': 'At most 5000 tickers per export'}), 400
+        start = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+        histories = stock_service.get_close_histories(tickers, start) if tickers else {}
+        return export_response(prices_table(histories), 'prices', output_format)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
 @portfolio_bp.route('/sector-breakdown', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/sector-breakdown', methods=['GET'])
 def get_sector_breakdown():
     """Calculate sector allocation breakdown"""
     try:
-        holdings = portfolio_model.load_holdings()
+        holdings = load_holdings()
+        value_rates, _ = valuation_rates(holdings) or ([1.0] * len(holdings), None)
         sector_totals = {}
         total_value = 0
 
-        for holding in holdings:
-            value = holding['shares'] * holding['current_price']
+        for holding, rate in zip(holdings, value_rates):
+            value = holding['shares'] * holding['current_price'] * rate
             sector = holding['sector']
             sector_totals[sector] = sector_totals.get(sector, 0) + value
             total_value += value
@@ -306,20 +1226,118 @@ def get_sector_breakdown():
 
         return jsonify(breakdown), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/risk', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/risk', methods=['GET'])
+def get_risk():
+    """Volatility, beta, value at risk and max drawdown from daily returns
+
+    Query: window (trading days, default 252), confidence (default 0.95),
+    benchmark (ticker for beta, default RISK_BENCHMARK).
+    """
+    try:
+        window = int(request.args.get('window', risk_engine.window))
+        confidence = float(request.args.get('confidence', 0.95))
+        if not 20 <= window <= 2520:
+            return jsonify({'error': 'window must be between 20 and 2520 trading days'}), 400
+        if not 0.5 < confidence < 1:
+            return jsonify({'error': 'confidence must be between 0.5 and 1'}), 400
+
+        holdings = load_holdings()
+        if not holdings:
+            return jsonify({'error': 'Portfolio has no holdings'}), 400
+        return jsonify(risk_engine.analyze(holdings, window, confidence, request.args.get('benchmark'))), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/correlation', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/correlation', methods=['GET'])
+def get_correlation():
+    """Rolling correlation matrix, most correlated pairs and diversification stats
+
+    Query: window (trading days, default 63), top (pairs to list, default 10),
+    format ('upper' for the row-major upper triangle, or 'full').
+    """
+    try:
+        window = int(request.args.get('window', correlation_tracker.window))
+        top = int(request.args.get('top', 10))
+        output_format = request.args.get('format', 'upper')
+        if not 20 <= window <= 2520:
+            return jsonify({'error': 'window must be between 20 and 2520 trading days'}), 400
+        if output_format not in ('upper', 'full'):
+            return jsonify({'error': "format must be 'upper' or 'full'"}), 400
+
+        holdings = load_holdings()
+        result = correlation_tracker.analyze(holdings, window, max(0, min(top, 100)), output_format == 'full')
+        return jsonify(result), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@portfolio_bp.route('/optimize', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/optimize', methods=['POST'])
+def optimize_portfolio():
+    """Target weights and rebalancing trades from mean-variance optimization
+
+    Body (all optional): objective ('min_variance' or 'max_sharpe'),
+    max_weight (per position), sector_caps ({sector: max weight}),
+    risk_free_rate (annual), window (trading days), min_trade_value.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        objective = data.get('objective', 'min_variance')
+        max_weight = float(data.get('max_weight', 1.0))
+        sector_caps = data.get('sector_caps') or {}
+        window = int(data.get('window', risk_engine.window))
+        risk_free_rate = data.get('risk_free_rate')
+        if not 0 < max_weight <= 1:
+            return jsonify({'error': 'max_weight must be between 0 and 1'}), 400
+        if not isinstance(sector_caps, dict):
+            return jsonify({'error': 'sector_caps must map sector names to weights'}), 400
+        sector_caps = {str(sector): float(cap) for sector, cap in sector_caps.items()}
+        if any(not 0 <= cap <= 1 for cap in sector_caps.values()):
+            return jsonify({'error': 'sector caps must be between 0 and 1'}), 400
+        if not 20 <= window <= 2520:
+            return jsonify({'error': 'window must be between 20 and 2520 trading days'}), 400
+
+        holdings = load_holdings()
+        if not holdings:
+            return jsonify({'error': 'Portfolio has no holdings'}), 400
+        result = portfolio_optimizer.optimize(holdings, objective, max_weight, sector_caps, window,
+                                              float(risk_free_rate) if risk_free_rate is not None else None,
+                                              max(0.0, float(data.get('min_trade_value', 1.0))))
+        return jsonify(result), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
 @portfolio_bp.route('/portfolio-metrics', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/portfolio-metrics', methods=['GET'])
 def get_portfolio_metrics():
     """Get detailed portfolio metrics"""
     try:
-        holdings = portfolio_model.load_holdings()
-        metrics = portfolio_model.calculate_metrics(holdings)
+        holdings = load_holdings()
+        rates = valuation_rates(holdings)
+        metrics = portfolio_metrics(holdings, rates)
 
         # Add additional metrics
         if holdings:
-            performers = portfolio_model.get_best_worst_performers(holdings)
+            performers = g.portfolio.get_best_worst_performers(holdings, rates)
             metrics.update({
                 'total_holdings': len(holdings),
                 **performers
@@ -333,45 +1351,22 @@ def get_portfolio_metrics():
 
         return jsonify(metrics), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
 @portfolio_bp.route('/ai-insights', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/ai-insights', methods=['POST'])
 def get_ai_insights():
     """Get AI-powered insights about the portfolio using Gemini"""
     try:
         if not ai_service.is_configured():
             return jsonify({'error': 'Gemini API key not configured. Please set GEMINI_API_KEY in your .env file'}), 500
 
-        holdings = portfolio_model.load_holdings()
-        metrics = portfolio_model.calculate_metrics(holdings)
-
-        # Prepare context for AI
-        portfolio_context = {
-            'total_holdings': len(holdings),
-            'total_value': metrics['total_value'],
-            'total_gain_loss': metrics['total_gain_loss'],
-            'gain_loss_percentage': metrics['gain_loss_percentage'],
-            'holdings': []
-        }
-
-        for holding in holdings:
-            market_value = holding['shares'] * holding['current_price']
-            cost = holding['shares'] * holding['buy_price']
-            gain_loss = market_value - cost
-            return_pct = (gain_loss / cost * 100) if cost > 0 else 0
-
-            portfolio_context['holdings'].append({
-                'ticker': holding['ticker'],
-                'sector': holding['sector'],
-                'shares': holding['shares'],
-                'buy_price': holding['buy_price'],
-                'current_price': holding['current_price'],
-                'market_value': market_value,
-                'return_percentage': return_pct,
-                'purchase_date': holding['purchase_date']
-            })
+        holdings = load_holdings()
+        portfolio_context = ai_context(holdings)
 
         ai_response = ai_service.generate_portfolio_insights(portfolio_context)
 
@@ -385,56 +1380,31 @@ def get_ai_insights():
 
 
 @portfolio_bp.route('/ai-chat', methods=['POST'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/ai-chat', methods=['POST'])
 def ai_chat():
     """Chat with AI about the portfolio"""
     try:
-        print("AI Chat endpoint called")
+        logger.debug("AI Chat endpoint called")
 
         if not ai_service.is_configured():
             error_msg = 'Gemini API key not configured. Please set GEMINI_API_KEY in your .env file'
-            print(f"AI service not configured: {error_msg}")
+            logger.info(f"AI service not configured: {error_msg}")
             return jsonify({'error': error_msg}), 500
 
         data = request.get_json()
         question = data.get('question', '').strip()
-        print(f"Received question: {question}")
+        logger.debug(f"Received question: {question}")
 
         if not question:
             return jsonify({'error': 'Question is required'}), 400
 
-        holdings = portfolio_model.load_holdings()
-        metrics = portfolio_model.calculate_metrics(holdings)
-        print(f"Portfolio loaded: {len(holdings)} holdings")
+        holdings = load_holdings()
+        portfolio_context = ai_context(holdings)
+        logger.debug(f"Portfolio loaded: {len(holdings)} holdings")
 
-        # Prepare context for AI
-        portfolio_context = {
-            'total_holdings': len(holdings),
-            'total_value': metrics['total_value'],
-            'total_gain_loss': metrics['total_gain_loss'],
-            'gain_loss_percentage': metrics['gain_loss_percentage'],
-            'holdings': []
-        }
-
-        for holding in holdings:
-            market_value = holding['shares'] * holding['current_price']
-            cost = holding['shares'] * holding['buy_price']
-            gain_loss = market_value - cost
-            return_pct = (gain_loss / cost * 100) if cost > 0 else 0
-
-            portfolio_context['holdings'].append({
-                'ticker': holding['ticker'],
-                'sector': holding['sector'],
-                'shares': holding['shares'],
-                'buy_price': holding['buy_price'],
-                'current_price': holding['current_price'],
-                'market_value': market_value,
-                'return_percentage': return_pct,
-                'purchase_date': holding['purchase_date']
-            })
-
-        print("Calling AI service...")
+        logger.debug("Calling AI service...")
         ai_response = ai_service.answer_question(portfolio_context, question)
-        print("AI response received successfully")
+        logger.debug("AI response received successfully")
 
         return jsonify({
             'answer': ai_response,
@@ -443,63 +1413,36 @@ def ai_chat():
 
     except ValueError as e:
         error_msg = str(e)
-        print(f"ValueError in ai_chat: {error_msg}")
+        logger.error(f"ValueError in ai_chat: {error_msg}")
         return jsonify({'error': error_msg}), 500
     except Exception as e:
         error_msg = f'Failed to get answer: {str(e)}'
-        print(f"Exception in ai_chat: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Exception in ai_chat: {error_msg}")
         return jsonify({'error': error_msg}), 500
 
 
 @portfolio_bp.route('/ai-suggestions', methods=['GET'])
+@portfolio_bp.route('/portfolios/<portfolio_id>/ai-suggestions', methods=['GET'])
 def get_ai_suggestions():
     """Get AI-generated portfolio suggestions"""
     try:
-        print("AI Suggestions endpoint called")
+        logger.debug("AI Suggestions endpoint called")
 
         if not ai_service.is_configured():
             error_msg = 'Gemini API key not configured. Using fallback suggestions.'
-            print(f"AI service not configured: {error_msg}")
+            logger.info(f"AI service not configured: {error_msg}")
             # Return fallback suggestions instead of error
             return jsonify({
                 'suggestions': ai_service._get_fallback_suggestions()
             }), 200
 
-        holdings = portfolio_model.load_holdings()
-        metrics = portfolio_model.calculate_metrics(holdings)
-        print(f"Portfolio loaded: {len(holdings)} holdings")
-
-        # Prepare context for AI
-        portfolio_context = {
-            'total_holdings': len(holdings),
-            'total_value': metrics['total_value'],
-            'total_gain_loss': metrics['total_gain_loss'],
-            'gain_loss_percentage': metrics['gain_loss_percentage'],
-            'holdings': []
-        }
-
-        for holding in holdings:
-            market_value = holding['shares'] * holding['current_price']
-            cost = holding['shares'] * holding['buy_price']
-            gain_loss = market_value - cost
-            return_pct = (gain_loss / cost * 100) if cost > 0 else 0
-
-            portfolio_context['holdings'].append({
-                'ticker': holding['ticker'],
-                'sector': holding['sector'],
-                'shares': holding['shares'],
-                'buy_price': holding['buy_price'],
-                'current_price': holding['current_price'],
-                'market_value': market_value,
-                'return_percentage': return_pct,
-                'purchase_date': holding['purchase_date']
-            })
+        holdings = load_holdings()
+        portfolio_context = ai_context(holdings)
+        logger.debug(f"Portfolio loaded: {len(holdings)} holdings")
 
-        print("Generating AI suggestions...")
+        logger.debug("Generating AI suggestions...")
         suggestions = ai_service.generate_suggestions(portfolio_context)
-        print(f"Generated {len(suggestions)} suggestions")
+        logger.debug(f"Generated {len(suggestions)} suggestions")
 
         return jsonify({
             'suggestions': suggestions
@@ -507,9 +1450,7 @@ def get_ai_suggestions():
 
     except Exception as e:
         error_msg = f'Failed to generate suggestions: {str(e)}'
-        print(f"Exception in ai_suggestions: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Exception in ai_suggestions: {error_msg}")
         # Return fallback suggestions on error
         return jsonify({
             'suggestions': ai_service._get_fallback_suggestions()
@@ -1,7 +1,19 @@
 """Services package"""
+from .alert_service import AlertEngine
 from .stock_service import StockService
 from .ai_service import AIService
 from .alphavantage_service import AlphaVantageService
+from .corporate_actions import CorporateActions
+from .correlation_service import CorrelationTracker
+from .fx_service import FXService
+from .intraday_service import TickStore
+from .metadata_service import MetadataResolver
+from .optimizer_service import PortfolioOptimizer
+from .profiling_service import RequestProfiler
+from .projection_service import ProjectionEngine
+from .replay_service import ReplayStockService
+from .risk_service import RiskEngine
+from .symbol_index import SymbolIndex
 from .unified_stock_service import UnifiedStockService
 
-__all__ = ['StockService', 'AIService', 'AlphaVantageService', 'UnifiedStockService']
\ No newline at end of file
+__all__ = ['AlertEngine', 'StockService', 'AIService', 'AlphaVantageService', 'CorporateActions', 'CorrelationTracker', 'FXService', 'MetadataResolver', 'PortfolioOptimizer', 'ProjectionEngine', 'RequestProfiler', 'ReplayStockService', 'RiskEngine', 'SymbolIndex', 'TickStore', 'UnifiedStockService']
\ No newline at end of file
@@ -1,52 +1,114 @@
 """
 AI service for portfolio insights using Google Gemini
 """
-import google.generativeai as genai
+import json
+import logging
+import os
+import threading
+import time
 from typing import Optional, Dict, List
 
+from .metrics_service import track_upstream
+
+logger = logging.getLogger(__name__)
+
+
+def _genai():
+    """Import google.generativeai on first use (grpc/protobuf are slow to load)"""
+    import google.generativeai as genai
+    return genai
+
 
 class AIService:
     """Service for AI-powered portfolio insights"""
 
-    def __init__(self, api_key: Optional[str]):
-        self.client = None
+    # Models to try in order of preference
+    MODEL_PRIORITY = [
+        'gemini-1.5-flash',
+        'gemini-1.5-pro',
+        'gemini-pro'
+    ]
+    FALLBACK_MODEL = 'gemini-pro'
+    MODEL_CACHE_TTL = 7 * 24 * 3600
+
+    def __init__(self, api_key: Optional[str], model_cache_file: Optional[str] = None,
+                 model_name: Optional[str] = None):
         self.api_key = api_key
-        if api_key:
-            genai.configure(api_key=api_key)
-            # List available models for debugging
-            try:
-                print("Checking available Gemini models...")
+        self.model_cache_file = model_cache_file
+        self.model_name = model_name
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._discovery_thread = None
+
+        if api_key and not self.model_name:
+            self.model_name = self._read_cached_model_name()
+            if not self.model_name:
+                # Model discovery is a network call; keep it off the startup path
+                self._discovery_thread = threading.Thread(target=self._discover_model, daemon=True)
+                self._discovery_thread.start()
+
+    @property
+    def client(self):
+        """Gemini model handle, created on first use"""
+        if self._client is None and self.api_key:
+            with self._client_lock:
+                if self._client is None:
+                    if self._discovery_thread is not None:
+                        self._discovery_thread.join()
+                    genai = _genai()
+                    genai.configure(api_key=self.api_key)
+                    self._client = genai.GenerativeModel(self.model_name or self.FALLBACK_MODEL)
+                    logger.info(f"Successfully loaded: {self.model_name or self.FALLBACK_MODEL}")
+        return self._client
+
+    def _discover_model(self) -> None:
+        """Pick the preferred available Gemini model and remember it on disk"""
+        try:
+            genai = _genai()
+            genai.configure(api_key=self.api_key)
+            logger.info("Checking available Gemini models...")
+            with track_upstream('gemini', 'list_models'):
                 available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-                print(f"Available models: {available_models[:5]}")  # Show first 5
-
-                # Try models in order of preference
-                model_priority = [
-                    'gemini-1.5-flash',
-                    'gemini-1.5-pro',
-                    'gemini-pro'
-                ]
-
-                for model_name in model_priority:
-                    # Check if model exists in available models (with or without 'models/' prefix)
-                    if any(model_name in m for m in available_models):
-                        # Extract the full model name from available models
-                        full_model_name = next((m for m in available_models if model_name in m), None)
-                        if full_model_name:
-                            self.client = genai.GenerativeModel(full_model_name)
-                            print(f"Successfully loaded: {full_model_name}")
-                            break
-
-                if not self.client:
-                    print("Warning: No suitable model found, attempting gemini-pro as fallback")
-                    self.client = genai.GenerativeModel('gemini-pro')
-
-            except Exception as e:
-                print(f"Error initializing Gemini model: {e}")
-                self.client = None
+            logger.debug(f"Available models: {available_models[:5]}")  # Show first 5
+
+            for model_name in self.MODEL_PRIORITY:
+                # Check if model exists in available models (with or without 'models/' prefix)
+                full_model_name = next((m for m in available_models if model_name in m), None)
+                if full_model_name:
+                    self.model_name = full_model_name
+                    self._write_cached_model_name(full_model_name)
+                    return
+
+            logger.warning(f"No suitable model found, attempting {self.FALLBACK_MODEL} as fallback")
+        except Exception as e:
+            logger.error(f"Error discovering Gemini models, using {self.FALLBACK_MODEL}: {e}")
+
+    def _read_cached_model_name(self) -> Optional[str]:
+        """Read the model chosen by a previous run, if still fresh"""
+        if not self.model_cache_file or not os.path.exists(self.model_cache_file):
+            return None
+        try:
+            with open(self.model_cache_file, 'r') as file:
+                cached = json.load(file)
+            if time.time() - cached['timestamp'] < self.MODEL_CACHE_TTL:
+                return cached['model']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable Gemini model cache: {e}")
+        return None
+
+    def _write_cached_model_name(self, model_name: str) -> None:
+        """Persist the discovered model so the next start can skip discovery"""
+        if not self.model_cache_file:
+            return
+        try:
+            with open(self.model_cache_file, 'w') as file:
+                json.dump({'model': model_name, 'timestamp': time.time()}, file)
+        except OSError as e:
+            logger.warning(f"Could not write Gemini model cache: {e}")
 
     def is_configured(self) -> bool:
         """Check if AI service is properly configured"""
-        return self.client is not None
+        return bool(self.api_key)
 
     def generate_portfolio_insights(self, portfolio_context: Dict) -> str:
         """Generate AI insights for the portfolio"""
@@ -57,7 +119,8 @@ class AIService:
         prompt = self._build_prompt(portfolio_context)
 
         # Call Gemini API
-        response = self.client.generate_content(prompt)
+        with track_upstream('gemini', 'insights'):
+            response = self.client.generate_content(prompt)
         return response.text
 
     def answer_question(self, portfolio_context: Dict, question: str) -> str:
@@ -70,28 +133,31 @@ class AIService:
             prompt = self._build_chat_prompt(portfolio_context, question)
 
             # Call Gemini API
-            print(f"Sending question to Gemini AI: {question[:50]}...")
-            response = self.client.generate_content(prompt)
-            print(f"Received response from Gemini AI")
+            logger.debug(f"Sending question to Gemini AI: {question[:50]}...")
+            with track_upstream('gemini', 'chat'):
+                response = self.client.generate_content(prompt)
+            logger.debug("Received response from Gemini AI")
             return response.text
         except Exception as e:
-            print(f"Error in answer_question: {str(e)}")
+            logger.error(f"Error in answer_question: {str(e)}")
             raise Exception(f"AI service error: {str(e)}")
 
     def _build_prompt(self, context: Dict) -> str:
         """Build the prompt for the AI model"""
+        currency = context.get('currency', 'USD')
         prompt = f"""You are a financial advisor analyzing a stock portfolio. Here is the current portfolio:
 
 Portfolio Summary:
 - Total Holdings: {context['total_holdings']}
-- Total Portfolio Value: ${context['total_value']:,.2f}
-- Total Gain/Loss: ${context['total_gain_loss']:,.2f} ({context['gain_loss_percentage']:.2f}%)
+- Total Portfolio Value: {context['total_value']:,.2f} {currency}
+- Total Gain/Loss: {context['total_gain_loss']:,.2f} {currency} ({context['gain_loss_percentage']:.2f}%)
 
 Individual Holdings:
 """
 
         for h in context['holdings']:
-            prompt += f"\n- {h['ticker']} ({h['sector']}): {h['shares']} shares @ ${h['current_price']:.2f}, Return: {h['return_percentage']:.2f}%"
+            prompt += (f"\n- {h['ticker']} ({h['sector']}): {h['shares']} shares @ {h['current_price']:.2f} "
+                       f"{h.get('currency', 'USD')}, Return: {h['return_percentage']:.2f}%")
 
         prompt += """
 
@@ -171,8 +237,9 @@ CRITICAL: Return ONLY valid JSON in this exact format with no additional text:
 
 Remember: Return ONLY the JSON object, no markdown formatting, no extra text."""
 
-            print("Generating portfolio suggestions...")
-            response = self.client.generate_content(prompt)
+            logger.debug("Generating portfolio suggestions...")
+            with track_upstream('gemini', 'suggestions'):
+                response = self.client.generate_content(prompt)
             response_text = response.text.strip()
 
             # Remove markdown code blocks if present
@@ -181,19 +248,18 @@ Remember: Return ONLY the JSON object, no markdown formatting, no extra text."""
                 if response_text.startswith('json'):
                     response_text = response_text[4:].strip()
 
-            print(f"AI response: {response_text[:100]}...")
+            logger.debug(f"AI response: {response_text[:100]}...")
 
-            import json
             suggestions_data = json.loads(response_text)
             return suggestions_data.get('suggestions', [])
 
         except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(f"Response text: {response_text}")
+            logger.warning(f"JSON decode error: {e}")
+            logger.debug(f"Response text: {response_text}")
             # Return fallback suggestions
             return self._get_fallback_suggestions()
         except Exception as e:
-            print(f"Error generating suggestions: {e}")
+            logger.error(f"Error generating suggestions: {e}")
             return self._get_fallback_suggestions()
 
     def _get_fallback_suggestions(self) -> List[Dict]:
@@ -218,5 +284,4 @@ Remember: Return ONLY the JSON object, no markdown formatting, no extra text."""
 
     def _format_portfolio_json(self, context: Dict) -> str:
         """Format portfolio context as readable JSON"""
-        import json
         return json.dumps(context, indent=2)
\ No newline at end of file
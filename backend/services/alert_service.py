@@ -0,0 +1,317 @@
+"""
+Price alerts evaluated against each quote batch
+
+Every rule reduces to a price level on one ticker: `above` and `below`
+rules use their threshold, `move` rules (percent move since the holding's
+buy price) use buy_price * (1 + threshold / 100). Each ticker keeps its
+active levels in two sorted arrays, one per direction, so a quote finds
+every rule it crosses with one bisect per direction instead of a scan of
+all rules. Rules fire once; triggered rules leave the arrays and are
+delivered to a notifier in one batch per quote update.
+
+Rules are persisted as a JSON snapshot plus an append-only change log
+(creates, triggers, deletes), so a quote update writes one log line rather
+than every rule; the log is folded into the snapshot once it grows past
+`compact_every` changes and on startup.
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .metrics_service import record_alerts
+
+logger = logging.getLogger(__name__)
+
+ALERT_KINDS = ('above', 'below', 'move')
+
+
+class FileNotifier:
+    """Appends triggered alerts as JSON lines to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def notify(self, events: List[Dict]) -> None:
+        lines = ''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in events)
+        with self._lock, open(self.path, 'a') as file:
+            file.write(lines)
+
+
+class WebhookNotifier:
+    """POSTs each batch of triggered alerts as JSON, off the request thread"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alert-webhook')
+
+    def notify(self, events: List[Dict]) -> None:
+        self._executor.submit(self._post, events)
+
+    def _post(self, events: List[Dict]) -> None:
+        import requests
+        try:
+            response = requests.post(self.url, json={'alerts': events}, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Alert webhook delivery of {len(events)} alerts failed: {e}")
+
+
+class _Levels:
+    """Active price levels of one ticker, sorted ascending, with the rule id at each level"""
+
+    __slots__ = ('above_prices', 'above_ids', 'below_prices', 'below_ids')
+
+    def __init__(self):
+        self.above_prices: List[float] = []
+        self.above_ids: List[int] = []
+        self.below_prices: List[float] = []
+        self.below_ids: List[int] = []
+
+    def add(self, direction: str, level: float, rule_id: int) -> None:
+        prices, ids = self._arrays(direction)
+        i = bisect_right(prices, level)
+        prices.insert(i, level)
+        ids.insert(i, rule_id)
+
+    def remove(self, direction: str, level: float, rule_id: int) -> None:
+        prices, ids = self._arrays(direction)
+        i = bisect_left(prices, level)
+        while i < len(prices) and prices[i] == level:
+            if ids[i] == rule_id:
+                del prices[i], ids[i]
+                return
+            i += 1
+
+    def rebuild(self, entries: List) -> None:
+        """Replace both arrays from (direction, level, rule id) entries in one sort"""
+        for direction in ('above', 'below'):
+            pairs = sorted((level, rule_id) for d, level, rule_id in entries if d == direction)
+            prices, ids = self._arrays(direction)
+            prices[:] = [level for level, _ in pairs]
+            ids[:] = [rule_id for _, rule_id in pairs]
+
+    def cross(self, price: float) -> List[int]:
+        """Pop the ids of rules this price reaches: levels <= price above, >= price below"""
+        k = bisect_right(self.above_prices, price)
+        fired = self.above_ids[:k]
+        del self.above_prices[:k], self.above_ids[:k]
+        k = bisect_left(self.below_prices, price)
+        fired += self.below_ids[k:]
+        del self.below_prices[k:], self.below_ids[k:]
+        return fired
+
+    def __len__(self) -> int:
+        return len(self.above_ids) + len(self.below_ids)
+
+    def _arrays(self, direction: str):
+        return (self.above_prices, self.above_ids) if direction == 'above' else (self.below_prices, self.below_ids)
+
+
+class AlertEngine:
+    """Alert rules persisted as a snapshot plus change log and indexed by ticker for quote evaluation"""
+
+    def __init__(self, store_file: str, notifier=None, compact_every: int = 50_000):
+        """
+        store_file: JSON snapshot of every rule, active and triggered; changes since go to store_file + '.log'
+        notifier: receives each batch of triggered alerts (FileNotifier, WebhookNotifier); None only records them
+        compact_every: logged rule changes before the snapshot is rewritten
+        """
+        self.store_file = store_file
+        self.log_file = f'{store_file}.log'
+        self.notifier = notifier
+        self.compact_every = compact_every
+        self._rules: Dict[int, Dict] = {}
+        self._levels: Dict[str, _Levels] = {}
+        self._next_id = 1
+        self._logged = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def create(self, rules: List[Dict]) -> List[Dict]:
+        """Validate and store rules; each needs ticker, kind, threshold and for `move` a base_price
+
+        Optional fields: portfolio_id, holding_id, note. Any invalid rule
+        rejects the batch with a ValueError.
+        """
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        prepared = [self._prepare(rule) for rule in rules]
+        with self._lock:
+            for rule in prepared:
+                rule.update(id=self._next_id, status='active', created_at=now, triggered_at=None, price=None)
+                self._rules[rule['id']] = rule
+                self._next_id += 1
+            self._index(prepared)
+            self._log({'op': 'create', 'rules': prepared}, len(prepared))
+        return prepared
+
+    def delete(self, rule_id: int, portfolio_id: Optional[str] = None) -> bool:
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            if rule is None or (portfolio_id is not None and rule.get('portfolio_id') != portfolio_id):
+                return False
+            del self._rules[rule_id]
+            if rule['status'] == 'active':
+                self._levels[rule['ticker']].remove(rule['direction'], rule['level'], rule_id)
+            self._log({'op': 'delete', 'id': rule_id}, 1)
+        return True
+
+    def rules(self, portfolio_id: Optional[str] = None, ticker: Optional[str] = None,
+              status: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            rules = list(self._rules.values())
+        return [rule for rule in rules
+                if (portfolio_id is None or rule.get('portfolio_id') == portfolio_id)
+                and (ticker is None or rule['ticker'] == ticker)
+                and (status is None or rule['status'] == status)]
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(len(levels) for levels in self._levels.values())
+
+    def evaluate(self, prices: Dict[str, Optional[float]]) -> List[Dict]:
+        """Fire every active rule the quotes reach; returns the triggered alerts (also sent to the notifier)"""
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        events = []
+        with self._lock:
+            for ticker, price in prices.items():
+                levels = self._levels.get(ticker.upper()) if price else None
+                if not levels:
+                    continue
+                for rule_id in levels.cross(price):
+                    rule = self._rules[rule_id]
+                    rule.update(status='triggered', triggered_at=now, price=price)
+                    events.append(dict(rule))
+            if events:
+                self._log({'op': 'trigger', 'at': now, 'fired': [[event['id'], event['price']] for event in events]},
+                          len(events))
+
+        if events:
+            kinds: Dict[str, int] = {}
+            for event in events:
+                kinds[event['kind']] = kinds.get(event['kind'], 0) + 1
+            for kind, count in kinds.items():
+                record_alerts(kind, count)
+            if self.notifier is not None:
+                try:
+                    self.notifier.notify(events)
+                except Exception as e:
+                    logger.warning(f"Alert notifier failed for {len(events)} alerts: {e}")
+        return events
+
+    @staticmethod
+    def _prepare(rule: Dict) -> Dict:
+        """Normalized rule with its price level and direction; raises ValueError"""
+        ticker = str(rule.get('ticker') or '').upper().strip()
+        kind = str(rule.get('kind', '')).lower()
+        if not ticker:
+            raise ValueError('Missing ticker')
+        if kind not in ALERT_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(ALERT_KINDS)}")
+        threshold = float(rule.get('threshold') or 0)
+
+        if kind == 'move':
+            base_price = float(rule.get('base_price') or 0)
+            if base_price <= 0 or threshold == 0:
+                raise ValueError(f'{ticker}: move alerts need a holding with a buy price and a non-zero percent')
+            level = base_price * (1 + threshold / 100)
+            direction = 'above' if threshold > 0 else 'below'
+        else:
+            if threshold <= 0:
+                raise ValueError(f'{ticker}: threshold must be a positive price')
+            base_price = None
+            level = threshold
+            direction = kind
+        if level <= 0:
+            raise ValueError(f'{ticker}: a move of {threshold:g}% never triggers')
+
+        return {
+            'ticker': ticker,
+            'kind': kind,
+            'threshold': threshold,
+            'base_price': base_price,
+            'level': round(level, 4),
+            'direction': direction,
+            'portfolio_id': rule.get('portfolio_id'),
+            'holding_id': rule.get('holding_id'),
+            'note': rule.get('note')
+        }
+
+    def _index(self, rules: List[Dict]) -> None:
+        """Add active rules to the level arrays, re-sorting each touched ticker once (caller holds the lock)"""
+        by_ticker: Dict[str, List] = {}
+        for rule in rules:
+            if rule['status'] == 'active':
+                by_ticker.setdefault(rule['ticker'], []).append((rule['direction'], rule['level'], rule['id']))
+        for ticker, entries in by_ticker.items():
+            levels = self._levels.setdefault(ticker, _Levels())
+            if len(entries) == 1:
+                levels.add(*entries[0])
+            else:
+                existing = [('above', level, rule_id) for level, rule_id in zip(levels.above_prices, levels.above_ids)]
+                existing += [('below', level, rule_id) for level, rule_id in zip(levels.below_prices, levels.below_ids)]
+                levels.rebuild(existing + entries)
+
+    def _load(self) -> None:
+        """Rules from the snapshot plus the change log, which is then folded into a new snapshot"""
+        if os.path.exists(self.store_file):
+            with open(self.store_file, 'r') as file:
+                stored = json.load(file)
+            self._next_id = stored['next_id']
+            self._rules = {rule['id']: rule for rule in stored['rules']}
+
+        replayed = 0
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'r') as file:
+                for line in file:
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append
+                        continue
+                    replayed += 1
+                    if change['op'] == 'create':
+                        for rule in change['rules']:
+                            self._rules[rule['id']] = rule
+                            self._next_id = max(self._next_id, rule['id'] + 1)
+                    elif change['op'] == 'delete':
+                        self._rules.pop(change['id'], None)
+                    elif change['op'] == 'trigger':
+                        for rule_id, price in change['fired']:
+                            if rule_id in self._rules:
+                                self._rules[rule_id].update(status='triggered', triggered_at=change['at'], price=price)
+        self._index(list(self._rules.values()))
+        if replayed:
+            self._compact()
+
+    def _log(self, change: Dict, weight: int) -> None:
+        """Append one change to the log, compacting once enough have accumulated (caller holds the lock)"""
+        with open(self.log_file, 'a') as file:
+            file.write(json.dumps(change, separators=(',', ':')) + '\n')
+        self._logged += weight
+        if self._logged >= self.compact_every:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Write every rule to a new snapshot and empty the log (caller holds the lock)"""
+        tmp_file = f'{self.store_file}.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump({'next_id': self._next_id, 'rules': list(self._rules.values())}, file, separators=(',', ':'))
+        os.replace(tmp_file, self.store_file)
+        open(self.log_file, 'w').close()
+        self._logged = 0
+
+
+def build_notifier(webhook_url: Optional[str], log_file: Optional[str]):
+    """Webhook delivery when a URL is configured, else a local JSON-lines file, else none"""
+    if webhook_url:
+        return WebhookNotifier(webhook_url)
+    if log_file:
+        return FileNotifier(log_file)
+    return None
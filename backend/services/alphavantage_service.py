@@ -5,30 +5,48 @@ Get your free API key at: https://www.alphavantage.co/support/#api-key
 """
 import requests
 import datetime
+import logging
 from datetime import timedelta
 from typing import Optional, List, Dict
 import time
 
+from .metrics_service import track_upstream, record_cache, record_upstream_error
+from .trading_calendar import cache_expiry, get_calendar
+
+logger = logging.getLogger(__name__)
+
 
 class AlphaVantageService:
     """Service for fetching stock data from Alpha Vantage"""
 
     BASE_URL = "https://www.alphavantage.co/query"
     _price_cache = {}
-    _cache_duration = 3600
 
     def __init__(self, api_key: str):
         self.api_key = api_key
 
+    def _query(self, operation: str, params: Dict) -> Dict:
+        """Call the API, recording latency and any error reported in the body"""
+        with track_upstream('alphavantage', operation):
+            response = requests.get(self.BASE_URL, params=params, timeout=10)
+            data = response.json()
+        if 'Note' in data or 'Information' in data:
+            record_upstream_error('alphavantage', operation, 'rate_limited')
+        elif 'Error Message' in data:
+            record_upstream_error('alphavantage', operation, 'api_error')
+        return data
+
     def get_real_time_price(self, ticker: str) -> Optional[float]:
         """Fetch real-time price from Alpha Vantage"""
         try:
             cache_key = f"current_{ticker}"
             if cache_key in AlphaVantageService._price_cache:
                 cached_data = AlphaVantageService._price_cache[cache_key]
-                if time.time() - cached_data['timestamp'] < 60:
-                    print(f"Using cached current price for {ticker}: ${cached_data['price']}")
+                if time.time() < cached_data['expires']:
+                    record_cache('alphavantage_quote', True)
+                    logger.debug(f"Using cached current price for {ticker}: ${cached_data['price']}")
                     return cached_data['price']
+            record_cache('alphavantage_quote', False)
 
             params = {
                 'function': 'GLOBAL_QUOTE',
@@ -36,41 +54,43 @@ class AlphaVantageService:
                 'apikey': self.api_key
             }
 
-            print(f"Fetching current price for {ticker} from Alpha Vantage...")
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            data = response.json()
+            logger.debug(f"Fetching current price for {ticker} from Alpha Vantage...")
+            data = self._query('quote', params)
 
             if 'Global Quote' in data and data['Global Quote']:
                 price = float(data['Global Quote']['05. price'])
                 AlphaVantageService._price_cache[cache_key] = {
                     'price': round(price, 2),
-                    'timestamp': time.time()
+                    'expires': cache_expiry(get_calendar().quote_ttl())
                 }
-                print(f"Got current price for {ticker}: ${round(price, 2)}")
+                logger.debug(f"Got current price for {ticker}: ${round(price, 2)}")
                 return round(price, 2)
 
             if 'Note' in data:
-                print(f"Alpha Vantage API limit reached: {data['Note']}")
+                logger.warning(f"Alpha Vantage API limit reached: {data['Note']}")
                 return None
 
-            print(f"No price data found for {ticker}")
+            logger.info(f"No price data found for {ticker}")
             return None
 
         except Exception as e:
-            print(f"Error fetching current price for {ticker}: {e}")
+            logger.error(f"Error fetching current price for {ticker}: {e}")
             return None
 
     def get_historical_price(self, ticker: str, date_str: str) -> Optional[float]:
-        """Fetch historical price for a specific date from Alpha Vantage"""
+        """Fetch the close for a date (weekends and holidays use the prior session's close) from Alpha Vantage"""
         try:
-            target_date = datetime.datetime.strptime(date_str, '%Y-%m-%d')
+            calendar = get_calendar()
+            session = calendar.previous_session(date_str)
 
-            cache_key = f"{ticker}_{date_str}"
+            cache_key = f"{ticker}_{session.isoformat()}"
             if cache_key in AlphaVantageService._price_cache:
                 cached_data = AlphaVantageService._price_cache[cache_key]
-                if time.time() - cached_data['timestamp'] < AlphaVantageService._cache_duration:
-                    print(f"Using cached price for {ticker} on {date_str}: ${cached_data['price']}")
+                if time.time() < cached_data['expires']:
+                    record_cache('alphavantage_historical', True)
+                    logger.debug(f"Using cached price for {ticker} on {date_str}: ${cached_data['price']}")
                     return cached_data['price']
+            record_cache('alphavantage_historical', False)
 
             params = {
                 'function': 'TIME_SERIES_DAILY',
@@ -79,21 +99,20 @@ class AlphaVantageService:
                 'outputsize': 'compact'
             }
 
-            print(f"Fetching historical data for {ticker} from Alpha Vantage...")
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            data = response.json()
+            logger.debug(f"Fetching historical data for {ticker} from Alpha Vantage...")
+            data = self._query('historical', params)
 
             if 'Time Series (Daily)' in data:
                 time_series = data['Time Series (Daily)']
 
-                target_date_str = target_date.strftime('%Y-%m-%d')
+                target_date_str = session.isoformat()
                 if target_date_str in time_series:
                     price = float(time_series[target_date_str]['4. close'])
                     AlphaVantageService._price_cache[cache_key] = {
                         'price': round(price, 2),
-                        'timestamp': time.time()
+                        'expires': cache_expiry(calendar.close_ttl(session))
                     }
-                    print(f"Found exact price for {ticker} on {date_str}: ${round(price, 2)}")
+                    logger.debug(f"Found exact price for {ticker} on {date_str}: ${round(price, 2)}")
                     return round(price, 2)
 
                 available_dates = sorted(time_series.keys(), reverse=True)
@@ -102,24 +121,24 @@ class AlphaVantageService:
                         price = float(time_series[date]['4. close'])
                         AlphaVantageService._price_cache[cache_key] = {
                             'price': round(price, 2),
-                            'timestamp': time.time()
+                            'expires': cache_expiry(calendar.quote_ttl())
                         }
-                        print(f"Using closest date {date} for {ticker}: ${round(price, 2)}")
+                        logger.debug(f"Using closest date {date} for {ticker}: ${round(price, 2)}")
                         return round(price, 2)
 
             if 'Note' in data:
-                print(f"Alpha Vantage API limit reached: {data['Note']}")
+                logger.warning(f"Alpha Vantage API limit reached: {data['Note']}")
                 return None
 
             if 'Error Message' in data:
-                print(f"Alpha Vantage error for {ticker}: {data['Error Message']}")
+                logger.warning(f"Alpha Vantage error for {ticker}: {data['Error Message']}")
                 return None
 
-            print(f"No historical data found for {ticker}")
+            logger.info(f"No historical data found for {ticker}")
             return None
 
         except Exception as e:
-            print(f"Error fetching historical price for {ticker} on {date_str}: {e}")
+            logger.error(f"Error fetching historical price for {ticker} on {date_str}: {e}")
             return None
 
     def get_stock_history(self, ticker: str, period: str = '1mo') -> List[Dict]:
@@ -132,12 +151,11 @@ class AlphaVantageService:
                 'outputsize': 'compact'
             }
 
-            print(f"Fetching stock history for {ticker}...")
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            data = response.json()
+            logger.debug(f"Fetching stock history for {ticker}...")
+            data = self._query('history', params)
 
             if 'Time Series (Daily)' not in data:
-                print(f"No history data for {ticker}")
+                logger.info(f"No history data for {ticker}")
                 return []
 
             time_series = data['Time Series (Daily)']
@@ -170,5 +188,5 @@ class AlphaVantageService:
             return history_data
 
         except Exception as e:
-            print(f"Error fetching history for {ticker}: {e}")
+            logger.error(f"Error fetching history for {ticker}: {e}")
             return []
@@ -0,0 +1,144 @@
+"""
+Per-ticker SQLite cache filled by a background batch worker
+
+Shared by the metadata resolver and the corporate-actions index. Entries
+are read from SQLite into memory on first use; tickers that need fetching
+are queued, and one daemon thread drains the queue in batches of up to
+`batch_size`, waiting up to `batch_wait` for a batch to fill unless a
+caller asked for the result urgently. Subclasses supply the table schema,
+how rows are read, and how a batch is fetched and stored.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchFetchCache:
+    """In-memory view of a SQLite table of per-ticker entries, refreshed by a background thread"""
+
+    # Set by subclasses: CREATE TABLE statement, and a label for the thread and log lines
+    schema = ''
+    label = 'batch-cache'
+
+    def __init__(self, store_file: str, batch_size: int = 50, batch_wait: float = 0.5):
+        """
+        store_file: SQLite file the entries persist in
+        batch_size, batch_wait: largest batch, and how long to wait for one to fill
+        """
+        self.store_file = store_file
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+
+        self._entries: Optional[Dict[str, Dict]] = None
+        # Bumped whenever fetched entries change, so derived views know to rebuild
+        self.version = 0
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._flush = threading.Event()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def wait_idle(self, timeout: float = 10) -> bool:
+        """Block until queued tickers are fetched (for scripts and benchmarks)"""
+        return self.wait_for(None, timeout)
+
+    def wait_for(self, tickers: Optional[Iterable[str]], timeout: float) -> bool:
+        """Block until these tickers (None: every queued ticker) are no longer queued or being fetched"""
+        tickers = set(tickers) if tickers is not None else None
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not (self._pending if tickers is None else self._pending & tickers):
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+
+    def _read_rows(self, conn: sqlite3.Connection) -> Dict[str, Dict]:
+        """All stored entries by ticker"""
+        raise NotImplementedError
+
+    def _resolve(self, tickers: List[str]) -> None:
+        """Fetch one batch, update self._entries and persist it"""
+        raise NotImplementedError
+
+    def _load(self) -> Dict[str, Dict]:
+        """Read the persistent store into memory on first use"""
+        if self._entries is not None:
+            return self._entries
+        with self._lock:
+            if self._entries is None:
+                entries = {}
+                try:
+                    with closing(self._connect()) as conn:
+                        entries = self._read_rows(conn)
+                    logger.info(f"Loaded {self.label} entries for {len(entries)} tickers")
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not read {self.label} store {self.store_file}: {e}")
+                self._entries = entries
+        return self._entries
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.store_file) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.store_file, timeout=10)
+        conn.execute(self.schema)
+        return conn
+
+    def _persist(self, statement: str, rows: List[tuple]) -> None:
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(statement, rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist {self.label} entries for {len(rows)} tickers: {e}")
+
+    def _enqueue(self, ticker: str, urgent: bool = False) -> None:
+        """Queue a ticker for the worker; urgent requests skip the wait for a fuller batch"""
+        with self._lock:
+            if urgent:
+                self._flush.set()
+            if ticker in self._pending:
+                return
+            self._pending.add(ticker)
+            self._queue.put(ticker)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.label, daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        """Drain the queue in batches; the thread exits after a minute without work"""
+        while True:
+            try:
+                batch = [self._queue.get(timeout=60)]
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._worker = None
+                        return
+                continue
+
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    if self._flush.is_set():
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=max(min(deadline - time.monotonic(), 0.01), 0)))
+                except queue.Empty:
+                    if self._flush.is_set() or time.monotonic() >= deadline:
+                        break
+            self._flush.clear()
+
+            try:
+                self._resolve(batch)
+            except Exception as e:
+                logger.error(f"{self.label} fetch failed for {len(batch)} tickers: {e}")
+            finally:
+                with self._lock:
+                    self._pending.difference_update(batch)
@@ -0,0 +1,253 @@
+"""
+Split and dividend adjustments from a cached corporate-actions index
+
+Holdings store shares and buy price as traded, while provider closes are
+split-adjusted, so after a split a holding's value and return are off by
+the split ratio. Each ticker's splits and dividends are fetched once,
+persisted in SQLite and refreshed daily in the background; reads never
+wait on the network (tickers not fetched yet are left unadjusted until
+they are). Failed fetches are stored too and retried after
+`missing_ttl_hours`, so a ticker the provider cannot answer costs one
+attempt, not one per request.
+
+All events sit in one array sorted by (ticker, date) with running sums of
+log split ratios and of dividends, so the split factor and the dividends
+per share since any (ticker, date) are two binary searches. Adjusting a
+whole portfolio is a handful of vectorized NumPy operations.
+"""
+import json
+import logging
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .batch_cache import BatchFetchCache
+from .metrics_service import record_cache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS corporate_actions (
+    ticker TEXT PRIMARY KEY,
+    splits TEXT NOT NULL,
+    dividends TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    found INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Key spacing per ticker in the event array; day numbers since 1970 stay far below it
+_SPAN = 1 << 20
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+class _EventIndex:
+    """Splits and dividends of every cached ticker as sorted keys with running sums"""
+
+    def __init__(self, entries: Dict[str, Dict]):
+        np = _np()
+        self.tickers = {ticker: i for i, ticker in enumerate(sorted(entries))}
+        self.split_keys, self.split_sums, self.split_ends = self._build(entries, 'splits', np.log)
+        self.dividend_keys, self.dividend_sums, self.dividend_ends = self._build(entries, 'dividends', None)
+
+    def _build(self, entries: Dict[str, Dict], kind: str, transform):
+        np = _np()
+        keys, values = [], []
+        for ticker, i in self.tickers.items():
+            for date, value in entries[ticker][kind]:
+                keys.append(i * _SPAN + int(np.datetime64(date, 'D').astype(np.int64)))
+                values.append(value)
+        keys = np.array(keys, dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[order]
+        sums = np.cumsum(transform(values) if transform is not None and len(values) else values)
+        ends = self._sum_through(keys, sums, np.arange(len(self.tickers), dtype=np.int64) * _SPAN + _SPAN - 1)
+        return keys, sums, ends
+
+    @staticmethod
+    def _sum_through(keys, sums, query):
+        """Running sum of every event with a key <= each query key"""
+        np = _np()
+        if not len(sums):
+            return np.zeros(len(query))
+        position = np.searchsorted(keys, query, side='right')
+        return np.where(position > 0, sums[np.maximum(position - 1, 0)], 0.0)
+
+    def since(self, tickers: List[str], dates: List[str], kind: str):
+        """Per (ticker, date): split factor (product of ratios) or dividends per share of events after the date"""
+        np = _np()
+        if not self.tickers:
+            return np.ones(len(tickers)) if kind == 'splits' else np.zeros(len(tickers))
+        index = np.array([self.tickers.get(ticker, -1) for ticker in tickers], dtype=np.int64)
+        known = index >= 0
+        index = np.maximum(index, 0)
+        keys = index * _SPAN + np.array(dates, dtype='datetime64[D]').astype(np.int64)
+        if kind == 'splits':
+            total = self.split_ends[index] - self._sum_through(self.split_keys, self.split_sums, keys)
+            return np.where(known, np.exp(total), 1.0)
+        total = self.dividend_ends[index] - self._sum_through(self.dividend_keys, self.dividend_sums, keys)
+        return np.where(known, total, 0.0)
+
+
+class CorporateActions(BatchFetchCache):
+    """Non-blocking split and dividend lookups with background fetching"""
+
+    schema = SCHEMA
+    label = 'corporate-actions'
+
+    def __init__(self, store_file: str, fetch_actions: Callable[[List[str]], Dict[str, Dict]],
+                 refresh_hours: float = 24, missing_ttl_hours: float = 1, write_wait: float = 2,
+                 batch_size: int = 50, batch_wait: float = 0.5):
+        """
+        fetch_actions: provider call returning {ticker: {'splits': [(date, ratio)], 'dividends': [(date, amount)]}}
+        refresh_hours: how long fetched actions are used before they are refreshed
+        missing_ttl_hours: how long to wait before retrying a ticker whose fetch failed
+        write_wait: longest a write path waits for a ticker that was never fetched
+        batch_size, batch_wait: largest batch, and how long to wait for one to fill
+        """
+        super().__init__(store_file, batch_size, batch_wait)
+        self.fetch_actions = fetch_actions
+        self.refresh = refresh_hours * 3600
+        self.missing_ttl = missing_ttl_hours * 3600
+        self.write_wait = write_wait
+        self._index: Optional[_EventIndex] = None
+
+    def split_factors(self, tickers: List[str], dates: List[str]):
+        """Shares held today per share held on each date (1.0 without splits since, or before actions are known)"""
+        return self._event_index().since([t.upper() for t in tickers], dates, 'splits')
+
+    def adjust_holdings(self, holdings: List[Dict]) -> List[Dict]:
+        """Holdings with shares and buy price restated for splits since purchase, plus dividend income
+
+        Rows whose ticker had no split or dividend since its purchase (or
+        since the last split recorded for it in the ledger, `split_date`)
+        are returned as they are; adjusted rows are new dicts with
+        `split_factor` and `dividend_income`. Provider dividends are
+        split-adjusted like closes, so they are paid on the adjusted shares.
+        Unknown and stale tickers are queued for fetching.
+        """
+        if not holdings:
+            return holdings
+        tickers = [holding['ticker'].upper() for holding in holdings]
+        self.prefetch(set(tickers))
+        index = self._event_index()
+        purchased = [holding['purchase_date'] for holding in holdings]
+        factors = index.since(tickers, [max(date, holding.get('split_date') or '') for date, holding in zip(purchased, holdings)],
+                              'splits').tolist()
+        dividends = index.since(tickers, purchased, 'dividends').tolist()
+
+        adjusted = []
+        for holding, factor, per_share in zip(holdings, factors, dividends):
+            if abs(factor - 1) < 1e-9 and per_share == 0:
+                adjusted.append(holding)
+                continue
+            shares = holding['shares'] * factor
+            adjusted.append({
+                **holding,
+                'shares': round(shares, 6),
+                'buy_price': round(holding['buy_price'] / factor, 4),
+                'split_factor': round(factor, 6),
+                'dividend_income': round(shares * per_share, 2)
+            })
+        return adjusted
+
+    def as_traded(self, ticker: str, date: str, price: float) -> float:
+        """Turn a split-adjusted close (provider history) into the price actually traded on that date"""
+        return round(price * float(self.split_factors([ticker], [date])[0]), 4)
+
+    def ensure(self, tickers: Iterable[str], timeout: Optional[float] = None) -> bool:
+        """Fetch tickers that were never fetched and wait for just those, at most `timeout` (default write_wait)
+
+        Cached tickers, including ones whose fetch failed, return at once.
+        False when the wait timed out; the caller then goes ahead with
+        factors of 1.
+        """
+        timeout = self.write_wait if timeout is None else timeout
+        entries = self._load()
+        missing = {ticker.upper() for ticker in tickers} - entries.keys()
+        if not missing:
+            return True
+        for ticker in missing:
+            self._enqueue(ticker, urgent=True)
+        if self.wait_for(missing, timeout):
+            return True
+        logger.warning(f"Corporate actions for {', '.join(sorted(missing))} not available within {timeout}s")
+        return False
+
+    def prefetch(self, tickers: Iterable[str]) -> None:
+        """Queue tickers that are not cached yet or are past their refresh (or retry) interval"""
+        entries = self._load()
+        now = time.time()
+        for ticker in tickers:
+            entry = entries.get(ticker)
+            record_cache('corporate_actions', entry is not None)
+            if entry is None or now - entry['fetched_at'] > (self.refresh if entry['found'] else self.missing_ttl):
+                self._enqueue(ticker)
+
+    def actions(self, ticker: str) -> Optional[Dict]:
+        """Cached splits and dividends of a ticker, None until fetched"""
+        entry = self._load().get(ticker.upper())
+        return {'splits': entry['splits'], 'dividends': entry['dividends']} if entry and entry['found'] else None
+
+    def _event_index(self) -> _EventIndex:
+        index = self._index
+        if index is None:
+            entries = self._load()
+            with self._lock:
+                if self._index is None:
+                    self._index = _EventIndex(dict(entries))
+                index = self._index
+        return index
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = super()._connect()
+        # Stores written before failed fetches were cached lack the `found` column
+        if 'found' not in {row[1] for row in conn.execute('PRAGMA table_info(corporate_actions)')}:
+            conn.execute('ALTER TABLE corporate_actions ADD COLUMN found INTEGER NOT NULL DEFAULT 1')
+        return conn
+
+    def _read_rows(self, conn: sqlite3.Connection) -> Dict[str, Dict]:
+        return {ticker: {'splits': [tuple(e) for e in json.loads(splits)],
+                         'dividends': [tuple(e) for e in json.loads(dividends)],
+                         'fetched_at': fetched_at, 'found': bool(found)}
+                for ticker, splits, dividends, fetched_at, found in conn.execute(
+                    'SELECT ticker, splits, dividends, fetched_at, found FROM corporate_actions')}
+
+    def _resolve(self, tickers: List[str]) -> None:
+        """Fetch one batch and persist it; failed tickers are stored as misses, keeping any earlier actions"""
+        entries = self._load()
+        try:
+            fetched = self.fetch_actions(tickers)
+        except Exception as e:
+            logger.warning(f"Corporate actions fetch failed for {len(tickers)} tickers: {e}")
+            fetched = {}
+        now = time.time()
+        rows = []
+        changed = False
+        for ticker in tickers:
+            actions = fetched.get(ticker)
+            previous = entries.get(ticker)
+            if actions is None:
+                entry = {'splits': previous['splits'] if previous else [],
+                         'dividends': previous['dividends'] if previous else [],
+                         'fetched_at': now, 'found': False}
+            else:
+                entry = {'splits': [tuple(e) for e in actions.get('splits', [])],
+                         'dividends': [tuple(e) for e in actions.get('dividends', [])],
+                         'fetched_at': now, 'found': True}
+            changed = changed or previous is None or (previous['splits'], previous['dividends']) != (entry['splits'], entry['dividends'])
+            entries[ticker] = entry
+            rows.append((ticker, json.dumps(entry['splits']), json.dumps(entry['dividends']), now, int(entry['found'])))
+
+        if changed:
+            with self._lock:
+                self._index = None
+            self.version += 1
+        self._persist('INSERT OR REPLACE INTO corporate_actions VALUES (?, ?, ?, ?, ?)', rows)
+        logger.debug(f"Fetched corporate actions for {sum(row[4] for row in rows)} of {len(tickers)} tickers")
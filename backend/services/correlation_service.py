@@ -0,0 +1,237 @@
+"""
+Rolling correlation matrix with incremental daily updates
+
+RollingCorrelation keeps the last `window` daily return rows in a ring
+buffer together with running column sums and the N x N cross-product
+matrix. Appending a trading day subtracts the outgoing row's outer
+product and adds the new one, so the covariance and correlation update
+in O(N^2) instead of O(window * N^2). CorrelationTracker keeps one such
+state per (ticker set, window) and feeds it the closes that arrived since
+it was last used.
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .metrics_service import record_cache
+from .risk_service import align_closes, position_values, start_date_for
+
+logger = logging.getLogger(__name__)
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+class RollingCorrelation:
+    """Running sums and cross-products over a fixed window of return rows"""
+
+    def __init__(self, tickers: List[str], window: int, returns, last_date: str, last_closes):
+        """
+        returns: initial T x N return rows, oldest first (only the last `window` are kept)
+        last_date, last_closes: the close the next appended return is measured from
+        """
+        np = _np()
+        self.tickers = tickers
+        self.window = window
+        self.last_date = last_date
+        self.last_closes = last_closes
+        self._buffer = np.zeros((window, len(tickers)))
+        returns = returns[-window:]
+        self._count = len(returns)
+        self._buffer[:self._count] = returns
+        self._next = self._count % window
+        self._since_rebase = 0
+        self._rebase()
+
+    @property
+    def observations(self) -> int:
+        return self._count
+
+    def append(self, date: str, closes) -> None:
+        """Add one trading day's closes in O(N^2)"""
+        np = _np()
+        row = closes / self.last_closes - 1
+        if self._count == self.window:
+            outgoing = self._buffer[self._next]
+            self._sums -= outgoing
+            self._cross -= np.outer(outgoing, outgoing)
+        else:
+            self._count += 1
+        self._buffer[self._next] = row
+        self._next = (self._next + 1) % self.window
+        self._sums += row
+        self._cross += np.outer(row, row)
+        self.last_date = date
+        self.last_closes = closes
+
+        # Re-derive the sums from the buffer once per window to stop float drift
+        self._since_rebase += 1
+        if self._since_rebase >= self.window:
+            self._rebase()
+
+    def covariance(self):
+        """Sample covariance of the current window"""
+        np = _np()
+        n = self._count
+        if n < 2:
+            return np.zeros((len(self.tickers),) * 2)
+        mean = self._sums / n
+        return (self._cross - n * np.outer(mean, mean)) / (n - 1)
+
+    def correlation(self):
+        """Correlation matrix of the current window; constant series correlate 0 with everything"""
+        np = _np()
+        cov = self.covariance()
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        corr = np.clip(np.nan_to_num(corr, nan=0.0, posinf=0.0, neginf=0.0), -1, 1)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def _rebase(self) -> None:
+        rows = self._buffer[:self._count] if self._count < self.window else self._buffer
+        self._sums = rows.sum(axis=0)
+        self._cross = rows.T @ rows
+        self._since_rebase = 0
+
+
+class CorrelationTracker:
+    """Keeps rolling correlation states per ticker set and advances them day by day"""
+
+    def __init__(self, stock_service, window: int = 63, max_tickers: int = 500, max_states: int = 16):
+        """
+        stock_service: provider with get_close_histories(tickers, start_date)
+        window: default rolling window in trading days
+        max_tickers: matrix size limit; only the largest positions are included
+        max_states: how many (ticker set, window) states to keep (LRU)
+        """
+        self.stock_service = stock_service
+        self.window = window
+        self.max_tickers = max_tickers
+        self.max_states = max_states
+        self._states: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def state(self, tickers: List[str], window: Optional[int] = None) -> Tuple[RollingCorrelation, List[str], int]:
+        """Up-to-date rolling state, the tickers left out for lack of history, and days appended now"""
+        window = window or self.window
+        today = datetime.date.today().isoformat()
+        key = (frozenset(tickers), window)
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is None:
+                entry = self._states[key] = {'rolling': None, 'excluded': [], 'checked_on': None,
+                                             'lock': threading.Lock()}
+                while len(self._states) > self.max_states:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(key)
+
+        with entry['lock']:
+            record_cache('correlation_state', entry['rolling'] is not None)
+            appended = 0
+            if entry['rolling'] is not None and entry['checked_on'] != today:
+                appended = self._advance(entry['rolling'], today)
+            if entry['rolling'] is None or appended is None:
+                entry['rolling'], entry['excluded'] = self._build(sorted(set(tickers)), window, today)
+                appended = 0
+            entry['checked_on'] = today
+            return entry['rolling'], entry['excluded'], appended
+
+    def analyze(self, holdings: List[Dict], window: Optional[int] = None, top: int = 10,
+                full: bool = False) -> Dict:
+        """Correlation matrix (upper triangle or full), most correlated pairs and diversification stats"""
+        np = _np()
+        start = time.perf_counter()
+        values = position_values(holdings, self.max_tickers)
+        truncated = len(values) < len({h['ticker'].upper() for h in holdings})
+
+        rolling, excluded, appended = self.state(list(values), window)
+        tickers = rolling.tickers
+        if len(tickers) < 2 or rolling.observations < 2:
+            raise ValueError('At least two holdings with price history are needed for correlations')
+
+        corr = rolling.correlation()
+        cov = rolling.covariance()
+        upper_i, upper_j = np.triu_indices(len(tickers), k=1)
+        upper = corr[upper_i, upper_j]
+
+        weights = np.array([values[t] for t in tickers], dtype=float)
+        weights = weights / weights.sum() if weights.sum() > 0 else np.full(len(tickers), 1 / len(tickers))
+        pair_weights = weights[upper_i] * weights[upper_j]
+        portfolio_vol = float(np.sqrt(max(weights @ cov @ weights, 0)))
+        weighted_vol = float(weights @ np.sqrt(np.clip(np.diag(cov), 0, None)))
+
+        top = min(top, len(upper))
+        best = np.argpartition(-upper, top - 1)[:top] if top else np.array([], dtype=int)
+        best = best[np.argsort(-upper[best])]
+
+        result = {
+            'as_of': rolling.last_date,
+            'window': rolling.window,
+            'observations': rolling.observations,
+            'tickers': tickers,
+            'format': 'full' if full else 'upper',
+            'diversification': {
+                'average_correlation': round(float(upper.mean()), 4),
+                'weighted_average_correlation': round(float(pair_weights @ upper / pair_weights.sum()), 4)
+                if pair_weights.sum() > 0 else None,
+                'diversification_ratio': round(weighted_vol / portfolio_vol, 4) if portfolio_vol > 0 else None
+            },
+            'top_pairs': [{'pair': [tickers[upper_i[k]], tickers[upper_j[k]]], 'correlation': round(float(upper[k]), 4)}
+                          for k in best],
+            'excluded': excluded,
+            'truncated': truncated,
+            'incremental_days': appended
+        }
+        if full:
+            result['matrix'] = np.round(corr, 3).tolist()
+        else:
+            # Row-major upper triangle without the diagonal: (0,1), (0,2) ... (N-2,N-1)
+            result['values'] = np.round(upper, 3).tolist()
+        result['compute_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    def _build(self, tickers: List[str], window: int, as_of: str) -> Tuple[RollingCorrelation, List[str]]:
+        """Full O(window * N^2) initialization from close history"""
+        np = _np()
+        histories = self.stock_service.get_close_histories(tickers, start_date_for(window, as_of))
+        dates, prices = align_closes(histories, tickers, as_of)
+        prices = prices[-(window + 1):]
+        if len(prices) < 2:
+            usable = np.zeros(len(tickers), bool)
+        else:
+            usable = ~np.isnan(prices).any(axis=0) & (prices > 0).all(axis=0)
+        keep = np.flatnonzero(usable)
+        excluded = [ticker for j, ticker in enumerate(tickers) if not usable[j]]
+
+        prices = prices[:, keep] if len(prices) else np.empty((0, len(keep)))
+        returns = prices[1:] / prices[:-1] - 1 if len(prices) > 1 else np.empty((0, len(keep)))
+        last_date = dates[-1] if dates else as_of
+        last_closes = prices[-1] if len(prices) else np.ones(len(keep))
+        logger.debug(f"Built correlation state for {len(keep)} tickers over {len(returns)} days")
+        return RollingCorrelation([tickers[j] for j in keep], window, returns, last_date, last_closes), excluded
+
+    def _advance(self, rolling: RollingCorrelation, as_of: str) -> Optional[int]:
+        """Append closes newer than the state's last date; None means rebuild instead"""
+        np = _np()
+        if not rolling.tickers:
+            return None
+        histories = self.stock_service.get_close_histories(rolling.tickers, rolling.last_date)
+        dates, prices = align_closes(histories, rolling.tickers, as_of)
+        new_rows = [i for i, date in enumerate(dates) if date > rolling.last_date]
+        if len(new_rows) > rolling.window:
+            return None
+        for i in new_rows:
+            closes = prices[i]
+            # A ticker with no close yet on this date keeps its previous close (zero return)
+            closes = np.where(np.isnan(closes) | (closes <= 0), rolling.last_closes, closes)
+            rolling.append(dates[i], closes)
+        return len(new_rows)
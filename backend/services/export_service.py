@@ -0,0 +1,135 @@
+"""
+Columnar bulk exports as Arrow IPC streams or Parquet
+
+Tables are assembled column by column from the holdings snapshot, the
+NumPy value series and the cached close histories (NumPy arrays are
+wrapped without copying), then written in record batches (Arrow) or row
+groups (Parquet). Each batch's bytes are handed to the response as soon as
+they are written, so the serialized export is never held in memory whole.
+Requires the optional `pyarrow` package.
+"""
+from itertools import chain
+from typing import Dict, Iterator, List, Tuple
+
+EXPORT_FORMATS = ('arrow', 'parquet')
+MIMETYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+EXTENSIONS = {'arrow': 'arrows', 'parquet': 'parquet'}
+# Rows per Arrow record batch / Parquet row group
+BATCH_ROWS = 65_536
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+def _pa():
+    """The optional pyarrow module, or None when it is not installed"""
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def arrow_available() -> bool:
+    return _pa() is not None
+
+
+def _dates(values: List[str]):
+    """ISO date strings as an Arrow date32 array, parsed in one NumPy conversion"""
+    return _pa().array(_np().array(values, dtype='datetime64[D]'))
+
+
+def holdings_table(holdings: List[Dict]):
+    """One row per holding, with its market value in the listing currency"""
+    pa = _pa()
+    np = _np()
+    shares = np.array([h['shares'] for h in holdings], dtype=np.float64)
+    current = np.array([h['current_price'] for h in holdings], dtype=np.float64)
+    return pa.table({
+        'id': pa.array([h['id'] for h in holdings], pa.int64()),
+        'ticker': pa.array([h['ticker'] for h in holdings], pa.string()),
+        'shares': shares,
+        'buy_price': np.array([h['buy_price'] for h in holdings], dtype=np.float64),
+        'current_price': current,
+        'market_value': shares * current,
+        'purchase_date': _dates([h['purchase_date'] for h in holdings]),
+        'sector': pa.array([h['sector'] for h in holdings], pa.string()).dictionary_encode(),
+        'currency': pa.array([h.get('currency') or 'USD' for h in holdings], pa.string()).dictionary_encode()
+    })
+
+
+def values_table(dates: List[str], values):
+    """Daily portfolio value; `values` is a float64 NumPy array and is not copied"""
+    return _pa().table({'date': _dates(dates), 'value': values})
+
+
+def prices_table(histories: Dict[str, List[Tuple[str, float]]]):
+    """Long table of (ticker, date, close) from cached close histories, tickers in sorted order
+
+    The ticker column is dictionary-encoded: one string per ticker and an
+    index per row, built with a single repeat.
+    """
+    pa = _pa()
+    np = _np()
+    tickers = sorted(ticker for ticker, series in histories.items() if series)
+    lengths = np.array([len(histories[ticker]) for ticker in tickers], dtype=np.int64)
+    rows = list(chain.from_iterable(histories[ticker] for ticker in tickers))
+    indices = np.repeat(np.arange(len(tickers), dtype=np.int32), lengths)
+    return pa.table({
+        'ticker': pa.DictionaryArray.from_arrays(indices, pa.array(tickers, pa.string())),
+        'date': _dates([date for date, _ in rows]),
+        'close': np.fromiter((close for _, close in rows), np.float64, len(rows))
+    })
+
+
+class _ChunkSink:
+    """Write-only file object that collects written bytes until they are taken"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream(table, output_format: str, batch_rows: int = BATCH_ROWS) -> Iterator[bytes]:
+    """Serialize a table as an Arrow IPC stream or Parquet file, yielding bytes batch by batch"""
+    pa = _pa()
+    sink = _ChunkSink()
+    target = pa.PythonFile(sink, mode='w')
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(target, table.schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(target, table.schema)
+
+    for batch in table.to_batches(max_chunksize=batch_rows):
+        if output_format == 'parquet':
+            writer.write_table(pa.Table.from_batches([batch], table.schema), row_group_size=batch_rows)
+        else:
+            writer.write_batch(batch)
+        data = sink.take()
+        if data:
+            yield data
+    writer.close()
+    yield sink.take()
@@ -0,0 +1,203 @@
+"""
+Foreign exchange rates for multi-currency valuation
+
+Daily rates come from Yahoo Finance currency pairs (EURUSD=X: USD per
+EUR) through the stock service's cached close histories, so they share the
+cache that daily closes use and are fetched at most once per session close.
+All currencies seen so far are kept in one dense matrix of USD per unit
+(date x currency, forward-filled). Valuing holdings is then one gather:
+currency codes map to columns, dates to rows by binary search, and rates
+into any base currency are a division by the base's column.
+"""
+import datetime
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .risk_service import align_closes
+from .trading_calendar import get_calendar
+
+logger = logging.getLogger(__name__)
+
+# Quoted in a fraction of a currency: (currency, units per quote unit)
+SUBUNITS = {'GBX': ('GBP', 0.01), 'ILA': ('ILS', 0.01), 'ZAC': ('ZAR', 0.01)}
+
+# Listing currency by Yahoo Finance exchange suffix, for tickers added without one
+SUFFIX_CURRENCIES = {
+    'L': 'GBX', 'TO': 'CAD', 'V': 'CAD', 'NE': 'CAD', 'DE': 'EUR', 'F': 'EUR', 'PA': 'EUR', 'AS': 'EUR',
+    'BR': 'EUR', 'MI': 'EUR', 'MC': 'EUR', 'LS': 'EUR', 'HE': 'EUR', 'VI': 'EUR', 'IR': 'EUR', 'SW': 'CHF',
+    'ST': 'SEK', 'OL': 'NOK', 'CO': 'DKK', 'T': 'JPY', 'HK': 'HKD', 'SS': 'CNY', 'SZ': 'CNY', 'KS': 'KRW',
+    'AX': 'AUD', 'NZ': 'NZD', 'SI': 'SGD', 'NS': 'INR', 'BO': 'INR', 'SA': 'BRL', 'MX': 'MXN', 'JO': 'ZAC',
+    'TA': 'ILA'
+}
+
+# Active ISO 4217 codes; anything else is rejected before it can trigger a rate fetch
+ISO_CURRENCIES = frozenset('''
+AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BRL BSD BTN BWP BYN BZD CAD
+CDF CHF CLP CNY COP CRC CUP CVE CZK DJF DKK DOP DZD EGP ERN ETB EUR FJD FKP GBP GEL GHS GIP GMD GNF GTQ
+GYD HKD HNL HTG HUF IDR ILS INR IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD KYD KZT LAK LBP LKR
+LRD LSL LYD MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO NOK NPR NZD OMR PAB PEN
+PGK PHP PKR PLN PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD SHP SLE SOS SRD SSP STN SVC SYP SZL THB
+TJS TMT TND TOP TRY TTD TWD TZS UAH UGX USD UYU UZS VES VND VUV WST XAF XCD XOF XPF YER ZAR ZMW ZWL
+'''.split()) | SUBUNITS.keys()
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+def normalize_currency(code: Optional[str]) -> str:
+    """Upper-case ISO 4217 code (or a quoted subunit such as GBX); raises ValueError for anything else"""
+    code = str(code or '').upper().strip()
+    if code not in ISO_CURRENCIES:
+        raise ValueError(f'Unknown currency code "{code}" (use an ISO 4217 code such as USD, EUR, GBP)')
+    return code
+
+
+def currency_for_ticker(ticker: str) -> str:
+    """Listing currency implied by the ticker's exchange suffix; USD without one"""
+    _, _, suffix = ticker.upper().rpartition('.')
+    return SUFFIX_CURRENCIES.get(suffix, 'USD') if '.' in ticker else 'USD'
+
+
+def holding_currency(holding: Dict) -> str:
+    return holding.get('currency') or 'USD'
+
+
+class _RateMatrix:
+    """USD per unit of each currency on each date; never modified after it is built"""
+
+    __slots__ = ('day', 'start', 'dates', 'columns', 'usd', 'missing')
+
+    def __init__(self, day: str, start: str, dates, columns: Dict[str, int], usd, missing: frozenset):
+        self.day = day
+        self.start = start
+        self.dates = dates
+        self.columns = columns
+        self.usd = usd
+        self.missing = missing
+
+    def covers(self, currencies: set, start: str, day: str) -> bool:
+        return self.day == day and self.start <= start and currencies <= (self.columns.keys() | self.missing)
+
+
+class FXService:
+    """Cached daily FX rate matrix with vectorized conversion into a base currency"""
+
+    def __init__(self, stock_service, base_currency: str = 'USD', history_days: int = 366):
+        """
+        stock_service: provider with get_close_histories(tickers, start_date)
+        base_currency: default currency values are reported in
+        history_days: minimum history kept, so purchase-date lookups rarely extend the matrix
+        """
+        self.stock_service = stock_service
+        self.base_currency = normalize_currency(base_currency)
+        self.history_days = history_days
+        self._matrix: Optional[_RateMatrix] = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Changes whenever the rates are rebuilt (new session close, new currency, older dates)"""
+        return self._version
+
+    def rates(self, currencies: List[str], base: Optional[str] = None, dates: Optional[List[str]] = None):
+        """Units of `base` per unit of each currency, on each date (None: latest close) as a NumPy array
+
+        Raises ValueError for currencies without exchange rate data.
+        """
+        np = _np()
+        base = normalize_currency(base or self.base_currency)
+        codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        needed = set(codes.tolist()) | {base}
+        start = min(dates) if dates else None
+        matrix = self._matrix_for(needed, start)
+
+        unavailable = sorted(needed & matrix.missing)
+        if unavailable:
+            raise ValueError(f"No exchange rates available for {', '.join(unavailable)}")
+        columns = np.array([matrix.columns[code] for code in codes], dtype=np.int64)[inverse]
+        if dates is None:
+            rows = np.full(len(columns), len(matrix.dates) - 1)
+        else:
+            # The rate on or before each date, else the earliest one
+            rows = np.searchsorted(matrix.dates, np.array(dates, dtype='datetime64[D]'), side='right') - 1
+            rows = np.maximum(rows, 0)
+        return matrix.usd[rows, columns] / matrix.usd[rows, matrix.columns[base]]
+
+    def rate_table(self, currencies: List[str], dates: List[str], base: Optional[str] = None):
+        """Units of `base` per unit of each currency (columns) on each date (rows), as a NumPy array"""
+        np = _np()
+        base = normalize_currency(base or self.base_currency)
+        needed = set(currencies) | {base}
+        matrix = self._matrix_for(needed, min(dates) if dates else None)
+        unavailable = sorted(needed & matrix.missing)
+        if unavailable:
+            raise ValueError(f"No exchange rates available for {', '.join(unavailable)}")
+        rows = np.maximum(np.searchsorted(matrix.dates, np.array(dates, dtype='datetime64[D]'), side='right') - 1, 0)
+        columns = np.array([matrix.columns[code] for code in currencies], dtype=np.int64)
+        return matrix.usd[np.ix_(rows, columns)] / matrix.usd[rows, matrix.columns[base]][:, None]
+
+    def valuation(self, holdings: List[Dict], base: Optional[str] = None) -> Optional[Tuple[List[float], List[float]]]:
+        """(rates for current prices, rates at each purchase date) into `base`, one pair per holding
+
+        None when every holding is already in the base currency, so
+        single-currency portfolios never touch the rate data.
+        """
+        base = normalize_currency(base or self.base_currency)
+        currencies = [holding_currency(holding) for holding in holdings]
+        if all(currency == base for currency in currencies):
+            return None
+        value_rates = self.rates(currencies, base)
+        cost_rates = self.rates(currencies, base, [holding['purchase_date'] for holding in holdings])
+        return value_rates.tolist(), cost_rates.tolist()
+
+    def _matrix_for(self, currencies: set, start: Optional[str]) -> _RateMatrix:
+        """The cached matrix, rebuilt once per session close or when it lacks a currency or date"""
+        day = get_calendar().last_close().isoformat()
+        floor = (datetime.date.today() - datetime.timedelta(days=self.history_days)).isoformat()
+        start = min(start, floor) if start else floor
+        matrix = self._matrix
+        if matrix is not None and matrix.covers(currencies, start, day):
+            return matrix
+        with self._lock:
+            matrix = self._matrix
+            if matrix is not None and matrix.covers(currencies, start, day):
+                return matrix
+            if matrix is not None:
+                # Keep every currency and date range already asked for
+                currencies = currencies | matrix.columns.keys()
+                start = min(start, matrix.start)
+            self._matrix = self._build(currencies, start, day)
+            self._version += 1
+            return self._matrix
+
+    def _build(self, currencies: set, start: str, day: str) -> _RateMatrix:
+        np = _np()
+        quoted = {code: SUBUNITS.get(code, (code, 1.0)) for code in currencies if code != 'USD'}
+        pairs = sorted({f'{parent}USD=X' for parent, _ in quoted.values()})
+        histories = self.stock_service.get_close_histories(pairs, start) if pairs else {}
+
+        axis, closes = align_closes(histories, pairs, datetime.date.today().isoformat())
+        if not axis:
+            axis, closes = [day], np.full((1, len(pairs)), np.nan)
+        # Before a pair's first close, carry that first close backwards
+        first = np.argmax(~np.isnan(closes), axis=0)
+        closes = np.where(np.isnan(closes), closes[first, np.arange(len(pairs))], closes)
+
+        codes = ['USD'] + sorted(code for code, (parent, _) in quoted.items()
+                                 if not np.isnan(closes[:, pairs.index(f'{parent}USD=X')]).all())
+        missing = frozenset(currencies - set(codes))
+        if missing:
+            logger.warning(f"No exchange rates for {', '.join(sorted(missing))}")
+        usd = np.ones((len(axis), len(codes)))
+        for j, code in enumerate(codes[1:], start=1):
+            parent, scale = quoted[code]
+            usd[:, j] = closes[:, pairs.index(f'{parent}USD=X')] * scale
+
+        logger.info(f"Built FX rates for {len(codes)} currencies over {len(axis)} days from {start}")
+        return _RateMatrix(day, start, np.array(axis, dtype='datetime64[D]'),
+                           {code: j for j, code in enumerate(codes)}, usd, missing)
@@ -0,0 +1,120 @@
+"""
+Intraday quote history in fixed-size ring buffers
+
+Every quote batch the app fetches (price refreshes, the real-time prices
+endpoint) is appended to a per-ticker ring of `capacity` ticks: float32
+prices and uint32 Unix-second timestamps, 8 bytes a tick, preallocated
+when the ticker is first seen. Once full, each tick overwrites the oldest,
+so memory per ticker never grows however long the server runs; the number
+of tickers is capped too, dropping the least recently quoted.
+
+Repeated quotes (cached or unchanged) are not stored, and a new price
+within `min_interval` seconds of the last tick replaces it, so bursts of
+requests cannot flush the buffer.
+"""
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Relative spacing of float32 values; quotes closer than this to the last tick repeat it
+FLOAT32_EPSILON = 2 ** -23
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+class _Ring:
+    """Preallocated circular buffer of (timestamp, price) ticks, oldest overwritten first
+
+    Backed by `array` buffers: scalar writes are cheaper than on NumPy
+    arrays, and reads view them as NumPy arrays without copying.
+    """
+
+    __slots__ = ('times', 'prices', 'head', 'count')
+
+    def __init__(self, capacity: int):
+        self.times = array('I', bytes(4 * capacity))
+        self.prices = array('f', bytes(4 * capacity))
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def append(self, timestamp: int, price: float, min_interval: float) -> bool:
+        """Store a tick; returns False when it repeats the last price (to float32 precision)"""
+        if self.count:
+            last = self.head - 1
+            if abs(self.prices[last] - price) <= abs(price) * FLOAT32_EPSILON:
+                return False
+            if timestamp - self.times[last] < min_interval:
+                self.prices[last] = price
+                return True
+            # Never step back in time, so reads can binary-search the timestamps
+            timestamp = max(timestamp, self.times[last])
+        self.times[self.head] = timestamp
+        self.prices[self.head] = price
+        self.head = (self.head + 1) % len(self.times)
+        self.count = min(self.count + 1, len(self.times))
+        return True
+
+    def series(self):
+        """(timestamps, prices) NumPy arrays oldest first, as copies"""
+        np = _np()
+        times = np.frombuffer(self.times, dtype=np.uint32)
+        prices = np.frombuffer(self.prices, dtype=np.float32)
+        if self.count < len(self.times):
+            return times[:self.count].copy(), prices[:self.count].copy()
+        return (np.concatenate((times[self.head:], times[:self.head])),
+                np.concatenate((prices[self.head:], prices[:self.head])))
+
+
+class TickStore:
+    """Per-ticker ring buffers of recent quotes for intraday sparklines"""
+
+    def __init__(self, capacity: int = 2048, min_interval: float = 5, max_tickers: int = 10_000):
+        """
+        capacity: ticks kept per ticker (8 bytes each)
+        min_interval: seconds within which a new price replaces the last tick instead of adding one
+        max_tickers: tickers kept; the least recently quoted is dropped beyond this
+        """
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self.max_tickers = max_tickers
+        self._rings: 'OrderedDict[str, _Ring]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, prices: Dict[str, Optional[float]], timestamp: Optional[float] = None) -> int:
+        """Append one quote batch (missing quotes are skipped); returns how many ticks were stored"""
+        now = int(timestamp if timestamp is not None else time.time())
+        stored = 0
+        with self._lock:
+            for ticker, price in prices.items():
+                if not price:
+                    continue
+                ticker = ticker.upper()
+                ring = self._rings.get(ticker)
+                if ring is None:
+                    ring = self._rings[ticker] = _Ring(self.capacity)
+                    if len(self._rings) > self.max_tickers:
+                        self._rings.popitem(last=False)
+                else:
+                    self._rings.move_to_end(ticker)
+                stored += ring.append(now, price, self.min_interval)
+        return stored
+
+    def series(self, ticker: str, since: Optional[float] = None) -> Optional[Tuple]:
+        """(timestamps, prices) NumPy arrays of a ticker's ticks, oldest first, from `since` on; None if never quoted"""
+        np = _np()
+        with self._lock:
+            ring = self._rings.get(ticker.upper())
+            if ring is None:
+                return None
+            times, prices = ring.series()
+        if since is not None:
+            start = np.searchsorted(times, since, side='left')
+            times, prices = times[start:], prices[start:]
+        return times, prices
+
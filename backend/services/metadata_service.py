@@ -0,0 +1,110 @@
+"""
+Company metadata (sector, industry, name) resolver
+
+Lookups are answered from memory and never wait on the network. Tickers
+that are unknown or past their TTL are queued and fetched in batches by a
+background thread; results are persisted in a SQLite table keyed by ticker
+so they survive restarts. Config.SECTOR_MAP entries act as fixed overrides.
+"""
+import logging
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .batch_cache import BatchFetchCache
+from .metrics_service import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Provider sector names mapped onto the labels the app already uses
+SECTOR_ALIASES = {
+    'Financial Services': 'Financial',
+    'Basic Materials': 'Materials'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS company_metadata (
+    ticker TEXT PRIMARY KEY,
+    sector TEXT,
+    industry TEXT,
+    name TEXT,
+    fetched_at REAL NOT NULL,
+    found INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class MetadataResolver(BatchFetchCache):
+    """Non-blocking ticker metadata with background batch fetching"""
+
+    schema = SCHEMA
+    label = 'metadata-resolver'
+
+    def __init__(self, store_file: str, fetch_profiles: Callable[[List[str]], Dict[str, Dict]],
+                 overrides: Optional[Dict[str, str]] = None, ttl_days: float = 30,
+                 missing_ttl_hours: float = 6, batch_size: int = 50, batch_wait: float = 0.5):
+        """
+        fetch_profiles: provider call returning {ticker: {'sector', 'industry', 'name'}}
+        overrides: ticker -> sector, used as-is without fetching
+        ttl_days: how long a fetched profile is served before it is refreshed
+        missing_ttl_hours: how long to wait before retrying a ticker the provider did not know
+        batch_size, batch_wait: largest batch, and how long to wait for one to fill
+        """
+        super().__init__(store_file, batch_size, batch_wait)
+        self.fetch_profiles = fetch_profiles
+        self.overrides = overrides or {}
+        self.ttl = ttl_days * 86400
+        self.missing_ttl = missing_ttl_hours * 3600
+
+    def sector(self, ticker: str) -> str:
+        """Best known sector for a ticker, 'Other' until it has been resolved"""
+        ticker = ticker.upper()
+        if ticker in self.overrides:
+            return self.overrides[ticker]
+        entry = self.lookup(ticker)
+        return (entry and entry['sector']) or 'Other'
+
+    def lookup(self, ticker: str) -> Optional[Dict]:
+        """Cached metadata for a ticker; unknown or expired tickers are queued for fetching"""
+        ticker = ticker.upper()
+        entry = self._load().get(ticker)
+        record_cache('metadata', entry is not None)
+        if entry is None or time.time() - entry['fetched_at'] > (self.ttl if entry['found'] else self.missing_ttl):
+            self._enqueue(ticker)
+        return entry if entry and entry['found'] else None
+
+    def prefetch(self, tickers: Iterable[str]) -> None:
+        """Queue any of these tickers that are not cached yet"""
+        entries = self._load()
+        for ticker in tickers:
+            ticker = ticker.upper()
+            if ticker not in self.overrides and ticker not in entries:
+                self._enqueue(ticker)
+
+    def _read_rows(self, conn: sqlite3.Connection) -> Dict[str, Dict]:
+        return {ticker: {'sector': sector, 'industry': industry, 'name': name,
+                         'fetched_at': fetched_at, 'found': bool(found)}
+                for ticker, sector, industry, name, fetched_at, found in conn.execute(
+                    'SELECT ticker, sector, industry, name, fetched_at, found FROM company_metadata')}
+
+    def _resolve(self, tickers: List[str]) -> None:
+        """Fetch one batch and persist every result, including misses"""
+        entries = self._load()
+        profiles = self.fetch_profiles(tickers)
+        now = time.time()
+        rows = []
+        for ticker in tickers:
+            profile = profiles.get(ticker)
+            sector = profile.get('sector') if profile else None
+            entry = {
+                'sector': SECTOR_ALIASES.get(sector, sector),
+                'industry': profile.get('industry') if profile else None,
+                'name': profile.get('name') if profile else None,
+                'fetched_at': now,
+                'found': profile is not None
+            }
+            rows.append((ticker, entry['sector'], entry['industry'], entry['name'], now, int(entry['found'])))
+            entries[ticker] = entry
+        self.version += 1
+        self._persist('INSERT OR REPLACE INTO company_metadata VALUES (?, ?, ?, ?, ?, ?)', rows)
+        logger.debug(f"Resolved metadata for {len(profiles)} of {len(tickers)} tickers")
@@ -0,0 +1,170 @@
+"""
+In-process metrics with Prometheus text exposition
+
+Counters and histograms live in memory and are rendered by /api/metrics in
+the Prometheus text format, so any Prometheus-compatible scraper can collect
+them without an extra dependency.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, ([*s[0]], s[1], s[2])) for key, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all metrics and renders them for scraping"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+REQUEST_LATENCY = metrics.histogram(
+    'portfolio_http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status'))
+UPSTREAM_LATENCY = metrics.histogram(
+    'portfolio_upstream_request_duration_seconds', 'Latency of calls to market data and AI providers',
+    ('provider', 'operation'))
+UPSTREAM_ERRORS = metrics.counter(
+    'portfolio_upstream_errors_total', 'Failed calls to market data and AI providers',
+    ('provider', 'operation', 'reason'))
+PROVIDER_EVENTS = metrics.counter(
+    'portfolio_provider_events_total', 'Circuit breaker and hedged request events per market data provider',
+    ('provider', 'event'))
+ALERTS_TRIGGERED = metrics.counter(
+    'portfolio_alerts_triggered_total', 'Price alerts triggered by quote updates',
+    ('kind',))
+CACHE_REQUESTS = metrics.counter(
+    'portfolio_cache_requests_total', 'Cache lookups by cache and result (hit/miss)',
+    ('cache', 'result'))
+
+
+@contextmanager
+def track_upstream(provider: str, operation: str):
+    """Time an upstream call; exceptions are counted as errors and re-raised"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(provider=provider, operation=operation, reason='exception')
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, provider=provider, operation=operation)
+
+
+def record_upstream_error(provider: str, operation: str, reason: str) -> None:
+    """Count a failure the provider reported in its response body"""
+    UPSTREAM_ERRORS.inc(provider=provider, operation=operation, reason=reason)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def record_provider_event(provider: str, event: str) -> None:
+    """Count a circuit breaker or hedging event (breaker_opened, skipped, hedged, hedge_won)"""
+    PROVIDER_EVENTS.inc(provider=provider, event=event)
+
+
+def record_alerts(kind: str, count: int = 1) -> None:
+    """Count triggered price alerts of one kind (above, below, move)"""
+    ALERTS_TRIGGERED.inc(count, kind=kind)
@@ -0,0 +1,324 @@
+"""
+Mean-variance portfolio optimizer
+
+Finds long-only target weights for the covered holdings, either minimum
+variance or maximum Sharpe ratio, under a per-position cap and optional
+per-sector caps. Both objectives are solved with projected gradient
+methods on a shrunk covariance derived once from the cached RiskEngine
+return matrix. Projecting onto the constraint set is cheap: a capped
+simplex, found with one sort of breakpoints, and a bisection on the
+shared shift when sector caps bind. The last solution for each ticker set and objective is kept and used as the
+starting point of the next call, so what-if requests with slightly
+different constraints converge in a few iterations.
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .risk_service import TRADING_DAYS_PER_YEAR, position_values
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ('min_variance', 'max_sharpe')
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+def project_capped_simplex(v, upper: float, total: float = 1.0):
+    """Euclidean projection onto {w : sum(w) = total, 0 <= w <= upper}
+
+    The projection is clip(v - shift, 0, upper) for the shift that makes it
+    sum to total. That sum is piecewise linear in the shift with breakpoints at
+    v and v - upper, so one sort of the breakpoints locates it exactly.
+    """
+    np = _np()
+    breakpoints = np.concatenate((v, v - upper))
+    events = np.concatenate((np.ones(len(v)), -np.ones(len(v))))
+    order = np.argsort(-breakpoints, kind='stable')
+    breakpoints, events = breakpoints[order], events[order]
+    # Coordinates strictly between 0 and upper on each interval below a breakpoint
+    free = np.cumsum(events)
+    totals = np.concatenate(([0.0], np.cumsum(free[:-1] * -np.diff(breakpoints))))
+    k = min(int(np.searchsorted(totals, total)) - 1, len(free) - 1)
+    shift = breakpoints[k] - (total - totals[k]) / free[k] if free[k] > 0 else breakpoints[k]
+    return np.clip(v - shift, 0, upper)
+
+
+def shrunk_covariance(returns):
+    """Ledoit-Wolf covariance shrunk toward a scaled identity, and the shrinkage intensity
+
+    Keeps the matrix well conditioned when there are about as many
+    tickers as observations, where the sample covariance is singular.
+    """
+    np = _np()
+    observations, n = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T @ centered / observations
+    target = np.trace(sample) / n
+    dispersion = ((sample - target * np.eye(n)) ** 2).sum() / n
+    if dispersion <= 0:
+        return sample * observations / max(observations - 1, 1), 0.0
+    row_norms = (centered ** 2).sum(axis=1)
+    noise = ((row_norms ** 2).sum() / observations - (sample ** 2).sum()) / (observations * n)
+    shrinkage = min(max(noise, 0.0), dispersion) / dispersion
+    cov = shrinkage * target * np.eye(n) + (1 - shrinkage) * sample
+    return cov * observations / max(observations - 1, 1), shrinkage
+
+
+class ConstraintSet:
+    """Long-only, fully invested weights with position and sector caps"""
+
+    def __init__(self, sectors: List[str], max_weight: float, sector_caps: Dict[str, float]):
+        np = _np()
+        self.max_weight = max_weight
+        names = sorted(set(sectors))
+        self.sector_names = names
+        self.sector_of = np.array([names.index(s) for s in sectors])
+        self.counts = np.bincount(self.sector_of, minlength=len(names))
+        self.caps = np.array([sector_caps.get(s, 1.0) for s in names])
+        self.has_sector_caps = bool((self.caps < 1).any())
+
+        capacity = np.minimum(self.caps, self.counts * max_weight).sum()
+        if capacity < 1 - 1e-9:
+            raise ValueError(f'Constraints are infeasible: caps allow at most {capacity:.1%} of the portfolio')
+
+    def sector_weights(self, w):
+        np = _np()
+        return np.bincount(self.sector_of, weights=w, minlength=len(self.sector_names))
+
+    def project(self, v):
+        """Euclidean projection onto the constraint set
+
+        From the KKT conditions, w = clip(v - shift, 0, max_weight) with one
+        shared shift, except in sectors that would exceed their cap, which
+        are projected onto exactly their cap with a shift of their own.
+        """
+        np = _np()
+        if not self.has_sector_caps:
+            return project_capped_simplex(v, self.max_weight)
+        low, high = float(v.min()) - self.max_weight, float(v.max())
+        for _ in range(60):
+            shift = (low + high) / 2
+            filled = np.minimum(self.sector_weights(np.clip(v - shift, 0, self.max_weight)), self.caps)
+            if filled.sum() > 1:
+                low = shift
+            else:
+                high = shift
+        w = np.clip(v - (low + high) / 2, 0, self.max_weight)
+        for sector in np.flatnonzero(self.sector_weights(w) > self.caps):
+            members = self.sector_of == sector
+            w[members] = project_capped_simplex(v[members], self.max_weight, self.caps[sector])
+        return w
+
+
+class PortfolioOptimizer:
+    """Mean-variance target weights and rebalancing trades"""
+
+    def __init__(self, risk_engine, risk_free_rate: float = 0.0, cache_size: int = 32,
+                 tolerance: float = 1e-8, max_iter: int = 5000):
+        """
+        risk_engine: source of cached return models (RiskEngine)
+        risk_free_rate: annual rate used for the Sharpe ratio
+        cache_size: how many (ticker set, window) warm-start states to keep (LRU)
+        tolerance, max_iter: stop when no weight moves more than tolerance in an iteration
+        """
+        self.risk_engine = risk_engine
+        self.risk_free_rate = risk_free_rate
+        self.cache_size = cache_size
+        self.tolerance = tolerance
+        self.max_iter = max_iter
+        self._states: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def optimize(self, holdings: List[Dict], objective: str = 'min_variance', max_weight: float = 1.0,
+                 sector_caps: Optional[Dict[str, float]] = None, window: Optional[int] = None,
+                 risk_free_rate: Optional[float] = None, min_trade_value: float = 1.0) -> Dict:
+        """Target weights for `objective` and the trades that reach them from current shares"""
+        np = _np()
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+        start = time.perf_counter()
+        window = window or self.risk_engine.window
+        rf = self.risk_free_rate if risk_free_rate is None else risk_free_rate
+
+        values = position_values(holdings, self.risk_engine.max_tickers)
+        model = self.risk_engine.returns_model(list(values), window)
+        covered = [ticker for ticker in model.tickers if values.get(ticker, 0) > 0]
+        if len(covered) < 2 or len(model.returns) < 2:
+            raise ValueError('At least two holdings with price history are needed to optimize')
+
+        positions = self._positions(holdings, covered)
+        columns = np.array([model.column[ticker] for ticker in covered])
+        mean = model.mean[columns]
+        covered_value = sum(values[ticker] for ticker in covered)
+        current = np.array([values[ticker] for ticker in covered]) / covered_value
+
+        constraints = ConstraintSet([positions[t]['sector'] for t in covered], max_weight, sector_caps or {})
+        state = self._state(covered, window, model.as_of, model.returns[:, columns])
+        cov = state['cov']
+        previous = state['solutions'].get(objective)
+        if previous is not None:
+            x0 = np.array([previous.get(ticker, 0.0) for ticker in covered])
+        else:
+            x0 = current
+        x0 = constraints.project(x0)
+
+        if objective == 'min_variance':
+            weights, iterations, converged = self._min_variance(cov, constraints, x0, state['lipschitz'])
+        else:
+            daily_rf = rf / TRADING_DAYS_PER_YEAR
+            if (mean - daily_rf).max() <= 0:
+                raise ValueError('No holding has an expected return above the risk-free rate')
+            weights, iterations, converged = self._max_sharpe(mean, cov, daily_rf, constraints, x0)
+        weights[weights < 1e-10] = 0.0
+        weights /= weights.sum()
+
+        with self._lock:
+            state['solutions'][objective] = dict(zip(covered, weights.tolist()))
+        if not converged:
+            logger.warning(f"Optimizer stopped after {iterations} iterations without converging")
+
+        trades = []
+        for i, ticker in enumerate(covered):
+            position = positions[ticker]
+            target_shares = weights[i] * covered_value / position['price']
+            delta = target_shares - position['shares']
+            if abs(delta * position['price']) < min_trade_value:
+                continue
+            trades.append({
+                'ticker': ticker,
+                'action': 'buy' if delta > 0 else 'sell',
+                'shares': round(abs(float(delta)), 4),
+                'price': round(position['price'], 2),
+                'value': round(abs(float(delta)) * position['price'], 2)
+            })
+        trades.sort(key=lambda trade: trade['value'], reverse=True)
+
+        return {
+            'objective': objective,
+            'as_of': model.as_of,
+            'window': window,
+            'observations': len(model.returns),
+            'constraints': {
+                'max_weight': max_weight,
+                'sector_caps': {name: float(cap) for name, cap in zip(constraints.sector_names, constraints.caps)
+                                if cap < 1}
+            },
+            'solver': {
+                'iterations': iterations,
+                'shrinkage': round(float(state['shrinkage']), 4),
+                'converged': converged,
+                'warm_start': previous is not None
+            },
+            'current': self._stats(current, mean, cov, rf),
+            'target': self._stats(weights, mean, cov, rf),
+            'weights': [{'ticker': ticker,
+                         'sector': positions[ticker]['sector'],
+                         'current': round(float(current[i]), 4),
+                         'target': round(float(weights[i]), 4)}
+                        for i, ticker in enumerate(covered)],
+            'sector_weights': {name: round(float(w), 4)
+                               for name, w in zip(constraints.sector_names, constraints.sector_weights(weights))},
+            'trades': trades,
+            'covered_value': round(covered_value, 2),
+            'untouched': sorted(set(position_values(holdings)) - set(covered)),
+            'compute_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def _min_variance(self, cov, constraints: ConstraintSet, x0, lipschitz: float):
+        """Accelerated projected gradient (FISTA with restarts) on w'Cw"""
+        np = _np()
+        step = 1 / lipschitz
+        x = z = x0
+        t = 1.0
+        for iteration in range(1, self.max_iter + 1):
+            x_next = constraints.project(z - step * 2 * (cov @ z))
+            if np.abs(x_next - x).max() < self.tolerance:
+                return x_next, iteration, True
+            # Restart the momentum when it stops decreasing the objective
+            if x_next @ cov @ x_next > x @ cov @ x:
+                t = 1.0
+                z = x_next
+            else:
+                t_next = (1 + (1 + 4 * t * t) ** 0.5) / 2
+                z = x_next + (t - 1) / t_next * (x_next - x)
+                t = t_next
+            x = x_next
+        return x, self.max_iter, False
+
+    def _max_sharpe(self, mean, cov, daily_rf: float, constraints: ConstraintSet, x0):
+        """Projected gradient ascent on the Sharpe ratio with backtracking line search"""
+        np = _np()
+
+        def negative_sharpe(w):
+            return -(mean @ w - daily_rf) / max(w @ cov @ w, 1e-18) ** 0.5
+
+        x = x0
+        value = negative_sharpe(x)
+        step = 1.0
+        for iteration in range(1, self.max_iter + 1):
+            variance = max(x @ cov @ x, 1e-18)
+            sigma = variance ** 0.5
+            gradient = -(mean / sigma - (mean @ x - daily_rf) * (cov @ x) / (sigma * variance))
+            step *= 2
+            while True:
+                x_next = constraints.project(x - step * gradient)
+                moved = x_next - x
+                next_value = negative_sharpe(x_next)
+                if next_value <= value + gradient @ moved + moved @ moved / (2 * step) or step < 1e-12:
+                    break
+                step /= 2
+            if np.abs(moved).max() < self.tolerance:
+                return x_next, iteration, True
+            x, value = x_next, next_value
+        return x, self.max_iter, False
+
+    def _state(self, tickers: List[str], window: int, as_of: Optional[str], returns) -> Dict:
+        """Shrunk covariance, its gradient Lipschitz constant and warm starts per (ticker set, window, as-of date)"""
+        np = _np()
+        key = (frozenset(tickers), window, as_of or datetime.date.today().isoformat())
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+                return state
+        cov, shrinkage = shrunk_covariance(returns)
+        state = {'cov': cov, 'shrinkage': shrinkage, 'solutions': {},
+                 'lipschitz': max(2 * float(np.linalg.eigvalsh(cov)[-1]), 1e-12)}
+        with self._lock:
+            state = self._states.setdefault(key, state)
+            while len(self._states) > self.cache_size:
+                self._states.popitem(last=False)
+        return state
+
+    @staticmethod
+    def _positions(holdings: List[Dict], tickers: List[str]) -> Dict[str, Dict]:
+        """Total shares, latest price and sector per ticker"""
+        wanted = set(tickers)
+        positions = {}
+        for holding in holdings:
+            ticker = holding['ticker'].upper()
+            if ticker not in wanted:
+                continue
+            position = positions.setdefault(ticker, {'shares': 0.0, 'price': holding['current_price'],
+                                                     'sector': holding.get('sector') or 'Other'})
+            position['shares'] += holding['shares']
+        return positions
+
+    @staticmethod
+    def _stats(weights, mean, cov, rf: float) -> Dict:
+        """Annualized expected return, volatility and Sharpe ratio of a weight vector"""
+        annual_return = float(mean @ weights) * TRADING_DAYS_PER_YEAR
+        volatility = float(max(weights @ cov @ weights, 0) * TRADING_DAYS_PER_YEAR) ** 0.5
+        return {
+            'expected_return': round(annual_return, 4),
+            'volatility': round(volatility, 4),
+            'sharpe': round((annual_return - rf) / volatility, 3) if volatility > 0 else None
+        }
@@ -0,0 +1,166 @@
+"""
+On-demand request profiling
+
+A low-overhead sampling profiler that captures the call stack of the
+request thread at a fixed interval. Output is written in the collapsed
+("folded") stack format understood by flamegraph.pl and speedscope, keyed
+by route, and a summary of the hottest functions is kept in memory for the
+admin endpoints.
+"""
+import functools
+import hmac
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+# Addresses allowed to use profiling and the admin endpoints when no ADMIN_TOKEN is set
+LOOPBACK = ('127.0.0.1', '::1')
+
+
+class RequestProfiler:
+    """Profiles requests flagged by header/query or sampled 1-in-N"""
+
+    HEADER = 'X-Profile'
+    QUERY_PARAM = 'profile'
+
+    def __init__(self, output_dir: str, sample_every: int = 0, interval_ms: float = 1.0,
+                 max_profiles: int = 50, admin_token: Optional[str] = None):
+        """
+        sample_every: profile one in every N requests (0 disables sampling)
+        interval_ms: stack sampling interval
+        max_profiles: how many recent profiles to keep in memory
+        admin_token: when set, on-demand profiling requires the X-Admin-Token header; when unset, only loopback may use it
+        """
+        self.output_dir = output_dir
+        self.sample_every = sample_every
+        self.interval = interval_ms / 1000
+        self.admin_token = admin_token
+        self._recent = deque(maxlen=max_profiles)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def is_authorized(self) -> bool:
+        """Whether the current request may trigger profiling or read profiles
+
+        With a token, the X-Admin-Token header must match it. Without one,
+        only direct requests from this machine are allowed (not ones relayed
+        by a proxy, which would appear to come from loopback).
+        """
+        if self.admin_token:
+            return hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), self.admin_token.encode())
+        return request.remote_addr in LOOPBACK and 'X-Forwarded-For' not in request.headers
+
+    def should_profile(self) -> bool:
+        """Decide whether to profile the current request"""
+        flagged = request.headers.get(self.HEADER) or request.args.get(self.QUERY_PARAM)
+        if flagged and flagged not in ('0', 'false') and self.is_authorized():
+            return True
+        if self.sample_every > 0:
+            with self._lock:
+                return next(self._counter) % self.sample_every == 0
+        return False
+
+    def wrap(self, view: Callable) -> Callable:
+        """Decorate a Flask view so flagged requests run under the profiler"""
+        @functools.wraps(view)
+        def profiled_view(*args, **kwargs):
+            if not self.should_profile():
+                return view(*args, **kwargs)
+            return self._run(view, args, kwargs)
+        return profiled_view
+
+    def recent(self, route: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Most recent profile summaries, newest first"""
+        with self._lock:
+            profiles = list(self._recent)
+        profiles.reverse()
+        if route:
+            profiles = [p for p in profiles if p['route'] == route]
+        return [{k: v for k, v in p.items() if k != 'stacks'} for p in profiles[:limit]]
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        """Full profile including collapsed stacks"""
+        with self._lock:
+            return next((p for p in self._recent if p['id'] == profile_id), None)
+
+    def _run(self, view: Callable, args, kwargs):
+        stacks = Counter()
+        stop = threading.Event()
+        target_thread = threading.get_ident()
+        root_frame = sys._getframe()
+        sampler = threading.Thread(target=self._sample, args=(target_thread, root_frame, stop, stacks), daemon=True)
+
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            stop.set()
+            sampler.join()
+            self._save(request.url_rule.rule if request.url_rule else request.path,
+                       request.method, duration, stacks)
+
+    def _sample(self, thread_id: int, root_frame, stop: threading.Event, stacks: Counter) -> None:
+        """Record the target thread's stack, up to the profiled view, every interval"""
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None and frame is not root_frame:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                stacks[';'.join(reversed(stack))] += 1
+
+    def _save(self, route: str, method: str, duration: float, stacks: Counter) -> None:
+        profile_id = uuid.uuid4().hex[:12]
+        total = sum(stacks.values())
+        self_samples = Counter()
+        inclusive_samples = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            self_samples[frames[-1]] += count
+            for frame in set(frames):
+                inclusive_samples[frame] += count
+
+        profile = {
+            'id': profile_id,
+            'route': route,
+            'method': method,
+            'timestamp': time.time(),
+            'duration_ms': round(duration * 1000, 2),
+            'samples': total,
+            'interval_ms': self.interval * 1000,
+            'top_self': [{'frame': f, 'samples': c, 'percent': round(c / total * 100, 1)}
+                         for f, c in self_samples.most_common(15)] if total else [],
+            'top_inclusive': [{'frame': f, 'samples': c, 'percent': round(c / total * 100, 1)}
+                              for f, c in inclusive_samples.most_common(15)] if total else [],
+            'stacks': dict(stacks)
+        }
+
+        try:
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{int(profile['timestamp'])}_{method}_{slug}_{profile_id}.folded")
+            with open(path, 'w') as file:
+                for stack, count in stacks.items():
+                    file.write(f"{stack} {count}\n")
+            profile['file'] = path
+        except OSError as e:
+            logger.warning(f"Could not write profile for {route}: {e}")
+
+        with self._lock:
+            self._recent.append(profile)
+        logger.info(f"Profiled {method} {route}: {profile['duration_ms']}ms, {total} samples")
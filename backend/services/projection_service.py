@@ -0,0 +1,228 @@
+"""
+Monte Carlo projection of portfolio value
+
+Daily portfolio log-returns are drawn either from a normal distribution
+with the mean and variance implied by the holdings' historical mean
+vector and covariance matrix (current weights, rebalanced daily), or by
+bootstrapping historical days of the weighted portfolio. Normal paths are
+drawn directly at the reported steps, since the sum of normal daily
+increments between two steps is itself normal. Paths are
+simulated in vectorized chunks; each chunk reduces its paths to per-day
+histograms of log growth, advancing its paths a block of days at a time
+so memory stays bounded at long horizons, and large runs fan out across a
+process pool with only small arrays crossing process boundaries. Percentile bands are
+read off the merged histograms.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from .risk_service import position_values
+from .trading_calendar import get_calendar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 4096
+# Histogram range around the expected log growth, in standard deviations
+RANGE_SIGMAS = 10
+# Values (path x day) simulated at once per chunk; bounds a worker's memory for long horizons
+BLOCK_ELEMENTS = 1 << 22
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+def _simulate_chunk(paths: int, horizon: int, steps, drift: float, volatility: float,
+                    history, seed_sequence, lows, widths):
+    """Simulate one chunk of paths and return per-step histogram counts (runs in worker processes)
+
+    Paths are advanced a block of days (or reported steps) at a time,
+    carrying each path's log growth between blocks, so working memory stays
+    near BLOCK_ELEMENTS values whatever the horizon.
+    """
+    np = _np()
+    rng = np.random.default_rng(seed_sequence)
+    counts = np.zeros((len(steps), HISTOGRAM_BINS), dtype=np.int64)
+    growth = np.zeros(paths, dtype=np.float32)
+    block = max(1, BLOCK_ELEMENTS // paths)
+
+    if history is not None:
+        last_day = int(steps[-1])
+        step = 0
+        for start in range(0, last_day + 1, block):
+            days = min(block, last_day + 1 - start)
+            # Day-major, so each day's paths are contiguous for the running sum and the histograms
+            draws = history[rng.integers(0, len(history), size=(days, paths), dtype=np.int32)]
+            draws[0] += growth
+            np.cumsum(draws, axis=0, out=draws)
+            while step < len(steps) and steps[step] < start + days:
+                _count(counts, step, draws[steps[step] - start], lows, widths)
+                step += 1
+            growth = draws[-1]
+    else:
+        # Normal daily log-returns sum to a normal increment between reported
+        # steps, so only one draw per step is needed instead of one per day
+        gaps = np.diff(steps, prepend=-1).astype(np.float32)
+        for start in range(0, len(steps), block):
+            end = min(start + block, len(steps))
+            increments = rng.standard_normal((end - start, paths), dtype=np.float32)
+            increments *= np.float32(volatility) * np.sqrt(gaps[start:end])[:, None]
+            increments += (np.float32(drift) * gaps[start:end])[:, None]
+            increments[0] += growth
+            np.cumsum(increments, axis=0, out=increments)
+            for step in range(start, end):
+                _count(counts, step, increments[step - start], lows, widths)
+            growth = increments[-1]
+    return counts
+
+
+def _count(counts, step: int, growth, lows, widths) -> None:
+    """Add one reported step's log growth of every path to its histogram row"""
+    np = _np()
+    bins = ((growth - lows[step]) / widths[step]).astype(np.int64)
+    np.clip(bins, 0, HISTOGRAM_BINS - 1, out=bins)
+    counts[step] += np.bincount(bins, minlength=HISTOGRAM_BINS)
+
+
+class ProjectionEngine:
+    """Vectorized Monte Carlo simulation of future portfolio value"""
+
+    def __init__(self, risk_engine, max_workers: Optional[int] = None, chunk_paths: int = 50_000,
+                 parallel_threshold: int = 200_000):
+        """
+        risk_engine: source of cached return models (RiskEngine)
+        max_workers: process pool size (default: CPU count); 1 disables the pool
+        chunk_paths: paths simulated per vectorized chunk
+        parallel_threshold: runs with at least this many paths use the process pool
+        """
+        self.risk_engine = risk_engine
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_paths = chunk_paths
+        self.parallel_threshold = parallel_threshold
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def project(self, holdings: List[Dict], horizon: int = 252, paths: int = 10_000,
+                method: str = 'normal', seed: Optional[int] = None, points: int = 60,
+                window: Optional[int] = None, percentiles=DEFAULT_PERCENTILES) -> Dict:
+        """Percentile bands of simulated portfolio value over `horizon` trading days"""
+        np = _np()
+        start = time.perf_counter()
+        total_value = sum(position_values(holdings).values())
+        values = position_values(holdings, self.risk_engine.max_tickers)
+        model = self.risk_engine.returns_model(list(values), window or self.risk_engine.window)
+        covered = [ticker for ticker in model.tickers if values.get(ticker, 0) > 0]
+        if not covered or len(model.returns) < 2:
+            raise ValueError('Not enough price history to project these holdings')
+
+        columns = np.array([model.column[ticker] for ticker in covered])
+        weights = np.array([values[ticker] for ticker in covered])
+        weights = weights / weights.sum()
+        mean = float(model.mean[columns] @ weights)
+        variance = float(weights @ model.cov[np.ix_(columns, columns)] @ weights)
+
+        # Daily log-return moments of the constant-weight portfolio
+        historical = np.log1p(model.returns[:, columns] @ weights)
+        if method == 'bootstrap':
+            drift, volatility = float(historical.mean()), float(historical.std())
+            history = historical.astype(np.float32)
+        else:
+            drift, volatility = mean - variance / 2, variance ** 0.5
+            history = None
+
+        steps = np.unique(np.linspace(0, horizon - 1, min(points, horizon)).round().astype(int))
+        days = steps + 1
+        spread = max(volatility, 1e-6) * np.sqrt(days) * RANGE_SIGMAS
+        lows = drift * days - spread
+        widths = 2 * spread / HISTOGRAM_BINS
+
+        counts, workers = self._run(paths, horizon, steps, drift, volatility, history, seed, lows, widths)
+
+        centers = lows[:, None] + (np.arange(HISTOGRAM_BINS) + 0.5) * widths[:, None]
+        cdf = np.cumsum(counts, axis=1) / paths
+        bands = []
+        dates = self._trading_dates(int(days[-1]))
+        for i, day in enumerate(days):
+            band = {'day': int(day), 'date': dates[day - 1]}
+            for pct in percentiles:
+                # Interpolate within the bin where the CDF crosses the percentile
+                k = int(np.searchsorted(cdf[i], pct / 100))
+                k = min(k, HISTOGRAM_BINS - 1)
+                below = cdf[i][k - 1] if k > 0 else 0.0
+                share = counts[i][k] / paths
+                fraction = (pct / 100 - below) / share if share > 0 else 0.5
+                log_growth = lows[i] + (k + fraction) * widths[i]
+                band[f'p{pct:g}'] = round(total_value * float(np.exp(log_growth)), 2)
+            bands.append(band)
+
+        terminal = counts[-1] / paths
+        terminal_growth = np.exp(centers[-1])
+        loss_bins = centers[-1] < 0
+        return {
+            'start_value': round(total_value, 2),
+            'covered_value': round(sum(values[ticker] for ticker in covered), 2),
+            'horizon_days': horizon,
+            'paths': paths,
+            'method': method,
+            'seed': seed,
+            'workers': workers,
+            'model': {
+                'observations': len(model.returns),
+                'daily_drift': round(drift, 6),
+                'daily_volatility': round(volatility, 6),
+                'annual_return': round(float(np.expm1(drift * 252)), 4),
+                'annual_volatility': round(volatility * 252 ** 0.5, 4)
+            },
+            'bands': bands,
+            'terminal': {
+                'expected_value': round(total_value * float(terminal @ terminal_growth), 2),
+                'probability_of_loss': round(float(terminal[loss_bins].sum()), 4)
+            },
+            'compute_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def _run(self, paths: int, horizon: int, steps, drift: float, volatility: float, history,
+             seed: Optional[int], lows, widths):
+        """Simulate all chunks, in the process pool for large runs; returns merged counts and worker count"""
+        np = _np()
+        chunks = [min(self.chunk_paths, paths - offset) for offset in range(0, paths, self.chunk_paths)]
+        # One independent stream per chunk, so results depend on the seed, not the worker count
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+        args = [(size, horizon, steps, drift, volatility, history, chunk_seed, lows, widths)
+                for size, chunk_seed in zip(chunks, seeds)]
+
+        if paths >= self.parallel_threshold and self.max_workers > 1 and len(chunks) > 1:
+            pool = self._get_pool()
+            results = pool.map(_simulate_chunk, *zip(*args))
+            workers = min(self.max_workers, len(chunks))
+        else:
+            results = (_simulate_chunk(*chunk_args) for chunk_args in args)
+            workers = 1
+
+        counts = np.zeros((len(steps), HISTOGRAM_BINS), dtype=np.int64)
+        for chunk_counts in results:
+            counts += chunk_counts
+        return counts, workers
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Worker processes are started on the first large run and reused"""
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a threaded server process can deadlock the children
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+                logger.info(f"Started projection process pool with {self.max_workers} workers")
+            return self._pool
+
+    @staticmethod
+    def _trading_dates(count: int) -> List[str]:
+        """The next `count` NYSE sessions after today"""
+        calendar = get_calendar()
+        return [day.isoformat() for day in calendar.sessions_after(calendar.today(), count)]
@@ -0,0 +1,218 @@
+"""
+Record/replay market data provider for offline, reproducible load testing
+
+In record mode it wraps a live provider (StockService or AlphaVantageService)
+and saves every successful response to a JSON file. In replay mode it
+answers from that file only, adding simulated latency, random failures and
+injected 429 rate limiting so fallback paths behave as they would against
+the real APIs.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Optional, List, Dict, Any
+
+from .metrics_service import track_upstream, record_upstream_error
+
+logger = logging.getLogger(__name__)
+
+# Metric operation names matching the live providers
+OPERATIONS = {
+    'get_real_time_price': 'quote',
+    'get_historical_price': 'historical',
+    'get_stock_history': 'history',
+    'get_close_histories': 'batch_history',
+    'get_company_profiles': 'profile',
+    'get_corporate_actions': 'actions'
+}
+
+
+class ReplayStockService:
+    """Provider that records live responses to disk or replays them"""
+
+    def __init__(self, name: str, recordings_dir: str, provider=None,
+                 latency_ms: float = 0, latency_sigma: float = 0.5,
+                 error_rate: float = 0, rate_limit_rate: float = 0,
+                 requests_per_minute: Optional[int] = None, seed: Optional[int] = None):
+        """
+        name: recording file stem, e.g. 'yahoo' or 'alphavantage'
+        provider: live service to record from; None means replay only
+        latency_ms, latency_sigma: median and log-space spread of a lognormal delay
+        error_rate: probability that a call fails like an upstream error
+        rate_limit_rate: probability that a call is rejected with a 429
+        requests_per_minute: quota after which every call gets a 429
+        """
+        self.name = name
+        self.provider = provider
+        self.recording_file = os.path.join(recordings_dir, f'{name}.json')
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.stats = {'calls': 0, 'hits': 0, 'misses': 0, 'errors': 0, 'rate_limited': 0}
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._window_calls = 0
+        self._recordings = self._load_recordings()
+
+    @property
+    def is_recording(self) -> bool:
+        return self.provider is not None
+
+    def has_recordings(self) -> bool:
+        """Whether anything has been recorded for this provider"""
+        return any(self._recordings.values())
+
+    def get_real_time_price(self, ticker: str) -> Optional[float]:
+        """Replay (or record) the latest price for a ticker"""
+        return self._call('get_real_time_price', ticker, (ticker,))
+
+    def get_historical_price(self, ticker: str, date_str: str) -> Optional[float]:
+        """Replay (or record) the close for a ticker on a date"""
+        return self._call('get_historical_price', f'{ticker}|{date_str}', (ticker, date_str))
+
+    def get_stock_history(self, ticker: str, period: str = '1mo') -> List[Dict]:
+        """Replay (or record) OHLCV history for a ticker"""
+        return self._call('get_stock_history', f'{ticker}|{period}', (ticker, period)) or []
+
+    def get_close_histories(self, tickers: List[str], start_date: str) -> Dict[str, List]:
+        """Replay (or record) a batched close-history download, stored per ticker"""
+        if self.is_recording:
+            histories = self.provider.get_close_histories(tickers, start_date)
+            self._record('get_close_histories', {f'{t}|{start_date}': series for t, series in histories.items()})
+            return histories
+
+        if not self._simulate('get_close_histories', f'{len(tickers)} tickers'):
+            return {}
+        recorded = self._recordings.get('get_close_histories', {})
+        histories = {}
+        for ticker in tickers:
+            series = recorded.get(f'{ticker}|{start_date}')
+            if series:
+                histories[ticker] = [tuple(point) for point in series]
+        with self._lock:
+            self.stats['hits'] += len(histories)
+            self.stats['misses'] += len(tickers) - len(histories)
+        return histories
+
+    def get_company_profiles(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Replay (or record) company profiles, stored per ticker"""
+        if self.is_recording:
+            profiles = self.provider.get_company_profiles(tickers)
+            self._record('get_company_profiles', profiles)
+            return profiles
+
+        if not self._simulate('get_company_profiles', f'{len(tickers)} tickers'):
+            return {}
+        recorded = self._recordings.get('get_company_profiles', {})
+        profiles = {ticker: recorded[ticker] for ticker in tickers if ticker in recorded}
+        with self._lock:
+            self.stats['hits'] += len(profiles)
+            self.stats['misses'] += len(tickers) - len(profiles)
+        return profiles
+
+    def get_corporate_actions(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Replay (or record) splits and dividends, stored per ticker"""
+        if self.is_recording:
+            actions = self.provider.get_corporate_actions(tickers)
+            self._record('get_corporate_actions', actions)
+            return actions
+
+        if not self._simulate('get_corporate_actions', f'{len(tickers)} tickers'):
+            return {}
+        recorded = self._recordings.get('get_corporate_actions', {})
+        actions = {ticker: recorded[ticker] for ticker in tickers if ticker in recorded}
+        with self._lock:
+            self.stats['hits'] += len(actions)
+            self.stats['misses'] += len(tickers) - len(actions)
+        return actions
+
+    def _call(self, method: str, key: str, args: tuple) -> Any:
+        if self.is_recording:
+            result = getattr(self.provider, method)(*args)
+            if result:
+                self._record(method, {key: result})
+            return result
+
+        if not self._simulate(method, key):
+            return None
+
+        result = self._recordings.get(method, {}).get(key)
+        with self._lock:
+            self.stats['hits' if result else 'misses'] += 1
+        if not result:
+            logger.info(f"[{self.name} replay] No recording for {method} {key}")
+        return result
+
+    def _simulate(self, method: str, key: str) -> bool:
+        """Apply simulated latency and faults; False means the call failed"""
+        with self._lock:
+            self.stats['calls'] += 1
+            delay = self._sample_latency()
+            outcome = self._sample_outcome()
+
+        operation = OPERATIONS[method]
+        with track_upstream(self.name, operation):
+            if delay:
+                time.sleep(delay)
+
+        if outcome == 'rate_limited':
+            record_upstream_error(self.name, operation, 'rate_limited')
+            logger.warning(f"[{self.name} replay] 429 Too Many Requests for {key}")
+            return False
+        if outcome == 'error':
+            record_upstream_error(self.name, operation, 'injected_error')
+            logger.warning(f"[{self.name} replay] Injected upstream error for {key}")
+            return False
+        return True
+
+    def _sample_latency(self) -> float:
+        """Seconds to wait before answering (caller holds the lock)"""
+        if self.latency_ms <= 0:
+            return 0
+        return self.latency_ms / 1000 * self._rng.lognormvariate(0, self.latency_sigma)
+
+    def _sample_outcome(self) -> str:
+        """Decide whether this call succeeds, errors or is rate limited (caller holds the lock)"""
+        now = time.time()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_calls = 0
+        self._window_calls += 1
+
+        if self.requests_per_minute is not None and self._window_calls > self.requests_per_minute:
+            self.stats['rate_limited'] += 1
+            return 'rate_limited'
+
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            return 'rate_limited'
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats['errors'] += 1
+            return 'error'
+        return 'ok'
+
+    def _load_recordings(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.recording_file):
+            return {}
+        with open(self.recording_file, 'r') as file:
+            return json.load(file)
+
+    def _record(self, method: str, results: Dict[str, Any]) -> None:
+        """Store live responses by key and rewrite the recording file atomically"""
+        if not results:
+            return
+        with self._lock:
+            self._recordings.setdefault(method, {}).update(results)
+            os.makedirs(os.path.dirname(self.recording_file), exist_ok=True)
+            tmp_file = f'{self.recording_file}.tmp'
+            with open(tmp_file, 'w') as file:
+                json.dump(self._recordings, file)
+            os.replace(tmp_file, self.recording_file)
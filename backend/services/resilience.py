@@ -0,0 +1,123 @@
+"""
+Circuit breakers and latency tracking for market data providers
+
+A CircuitBreaker stops calls to a provider after a run of failures and
+lets a single trial call through once a cool-down has passed. A
+LatencyTracker keeps recent successful call latencies so a hedged request
+can wait about as long as the provider's p95 before starting a backup. A
+RateLimiter paces calls to a provider's rate limit, so only bursts wait.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures -> half-open after `cooldown` seconds"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial: Optional[object] = None  # Permit of the half-open trial call in flight
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def allow(self) -> Optional[object]:
+        """A permit if a call may go to the provider now, else None; half-open admits one trial call at a time
+
+        Pass the permit back to record(), so the outcome of a call that
+        started while the breaker was closed is not taken for the trial's.
+        """
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return object()
+            if state == self.HALF_OPEN and self._trial is None:
+                self._trial = object()
+                return self._trial
+            return None
+
+    def record(self, success: bool, permit: Optional[object] = None) -> bool:
+        """Record a call's outcome; True if this failure opened the breaker"""
+        with self._lock:
+            was_trial = permit is not None and permit is self._trial
+            if was_trial:
+                self._trial = None
+            if success:
+                self._failures = 0
+                self._opened_at = None
+                return False
+            self._failures += 1
+            if was_trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} failures; "
+                               f"skipping it for {self.cooldown:.0f}s")
+                return True
+            return False
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return self.HALF_OPEN
+        return self.OPEN
+
+
+class LatencyTracker:
+    """Rolling window of call latencies with percentile lookups"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency at `pct` (0-100), or None until min_samples calls have been seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+class RateLimiter:
+    """Token bucket: up to `burst` calls at once, then `rate` calls per second"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a slot, sleeping until it is free; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is a reservation: wait until it has refilled
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
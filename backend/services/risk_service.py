@@ -0,0 +1,303 @@
+"""
+Portfolio risk analytics
+
+Builds an aligned daily-return matrix for a set of tickers from cached
+close histories and derives volatility, beta, value at risk and drawdown
+with vectorized NumPy operations. The return matrix and its covariance
+are cached per (ticker set, window, as-of date), so repeated requests
+only redo the O(N^2) weighting work.
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+from .metrics_service import record_cache
+from .trading_calendar import get_calendar
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+def position_values(holdings: List[Dict], limit: Optional[int] = None) -> Dict[str, float]:
+    """Market value per ticker, keeping only the `limit` largest positions when given"""
+    values = {}
+    for holding in holdings:
+        ticker = holding['ticker'].upper()
+        values[ticker] = values.get(ticker, 0) + holding['shares'] * holding['current_price']
+    if limit is not None and len(values) > limit:
+        values = dict(sorted(values.items(), key=lambda item: item[1], reverse=True)[:limit])
+    return values
+
+
+def start_date_for(window: int, as_of: str) -> str:
+    """First session of the `window` returns ending at as_of
+
+    One spare session covers as_of's own bar not being published yet.
+    """
+    return get_calendar().offset(as_of, -(window + 1)).isoformat()
+
+
+def align_closes(histories: Dict[str, List], tickers: List[str], as_of: str):
+    """Closes of `tickers` on the union of their dates up to as_of, as (dates, T x N array)
+
+    Gaps (halts, listings on other calendars) are forward-filled; cells
+    before a ticker's first close stay NaN.
+    """
+    np = _np()
+    axis = sorted({date for series in histories.values() for date, _ in series if date <= as_of})
+    row_of = {date: i for i, date in enumerate(axis)}
+    prices = np.full((len(axis), len(tickers)), np.nan)
+    for j, ticker in enumerate(tickers):
+        series = [(row_of[date], close) for date, close in histories.get(ticker, ()) if date in row_of]
+        if series:
+            rows, closes = zip(*series)
+            prices[list(rows), j] = closes
+
+    rows = np.where(np.isnan(prices), 0, np.arange(len(axis))[:, None])
+    return axis, prices[np.maximum.accumulate(rows, axis=0), np.arange(len(tickers))]
+
+
+class ReturnsModel:
+    """Aligned daily returns and their covariance for a ticker set"""
+
+    def __init__(self, tickers: List[str], dates: List[str], returns, benchmark_returns, excluded: List[str]):
+        """
+        tickers: column order of `returns`
+        dates: close dates; row i of `returns` runs from dates[i] to dates[i + 1]
+        returns: T x N simple daily returns
+        benchmark_returns: length-T benchmark returns, or None if unavailable
+        excluded: requested tickers without enough history for the window
+        """
+        np = _np()
+        self.tickers = tickers
+        self.column = {ticker: i for i, ticker in enumerate(tickers)}
+        self.dates = dates
+        self.returns = returns
+        self.benchmark_returns = benchmark_returns
+        self.excluded = excluded
+        self.mean = returns.mean(axis=0)
+        self.cov = np.atleast_2d(np.cov(returns, rowvar=False)) if len(returns) > 1 else np.zeros((len(tickers),) * 2)
+        self.betas = self._betas()
+
+    @property
+    def as_of(self) -> Optional[str]:
+        return self.dates[-1] if self.dates else None
+
+    def _betas(self):
+        """Beta of every column against the benchmark in one matrix product"""
+        np = _np()
+        if self.benchmark_returns is None or len(self.returns) < 2:
+            return None
+        bench = self.benchmark_returns - self.benchmark_returns.mean()
+        variance = bench @ bench
+        if variance == 0:
+            return None
+        return (self.returns - self.mean).T @ bench / variance
+
+
+class RiskEngine:
+    """Computes portfolio risk metrics from cached return matrices"""
+
+    def __init__(self, stock_service, benchmark: str = 'SPY', window: int = TRADING_DAYS_PER_YEAR,
+                 max_tickers: int = 500, cache_size: int = 32):
+        """
+        stock_service: provider with get_close_histories(tickers, start_date)
+        benchmark: ticker betas are measured against
+        window: default look-back in trading days
+        max_tickers: only the largest positions enter the N x N model; the rest count as uncovered
+        cache_size: how many return models to keep (LRU)
+        """
+        self.stock_service = stock_service
+        self.benchmark = benchmark
+        self.window = window
+        self.max_tickers = max_tickers
+        self.cache_size = cache_size
+        self._models: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def returns_model(self, tickers: List[str], window: int, benchmark: Optional[str] = None,
+                      as_of: Optional[str] = None) -> ReturnsModel:
+        """Return matrix for `window` trading days, built once per (tickers, window, as-of date)"""
+        benchmark = (benchmark or self.benchmark).upper()
+        as_of = as_of or datetime.date.today().isoformat()
+        key = (frozenset(tickers), window, benchmark, as_of)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+        record_cache('risk_model', model is not None)
+        if model is not None:
+            return model
+
+        model = self._build_model(sorted(set(tickers)), window, benchmark, as_of)
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.cache_size:
+                self._models.popitem(last=False)
+        return model
+
+    def analyze(self, holdings: List[Dict], window: Optional[int] = None, confidence: float = 0.95,
+                benchmark: Optional[str] = None) -> Dict:
+        """Volatility, beta, historical/parametric VaR and max drawdown for a set of holdings"""
+        np = _np()
+        window = window or self.window
+        start = time.perf_counter()
+        total_value = sum(position_values(holdings).values())
+        values = position_values(holdings, self.max_tickers)
+
+        model = self.returns_model(list(values), window, benchmark)
+        covered = [ticker for ticker in model.tickers if values.get(ticker, 0) > 0]
+        covered_value = sum(values[ticker] for ticker in covered)
+        if not covered or covered_value <= 0 or len(model.returns) < 2:
+            raise ValueError('Not enough price history to compute risk for these holdings')
+
+        columns = np.array([model.column[ticker] for ticker in covered])
+        weights = np.array([values[ticker] for ticker in covered]) / covered_value
+        cov = model.cov[np.ix_(columns, columns)]
+        returns = model.returns[:, columns]
+
+        portfolio_returns = returns @ weights
+        marginal = cov @ weights
+        variance = float(weights @ marginal)
+        daily_vol = variance ** 0.5
+        mean_return = float(model.mean[columns] @ weights)
+
+        # One-day VaR as a positive loss, on the covered part of the portfolio
+        tail = 1 - confidence
+        historical_var = max(-float(np.quantile(portfolio_returns, tail)), 0.0)
+        parametric_var = max(-(mean_return + NormalDist().inv_cdf(tail) * daily_vol), 0.0)
+
+        wealth = np.concatenate(([1.0], np.cumprod(1 + portfolio_returns)))
+        drawdowns = wealth / np.maximum.accumulate(wealth) - 1
+        trough = int(np.argmin(drawdowns))
+        peak = int(np.argmax(wealth[:trough + 1]))
+
+        betas = model.betas[columns] if model.betas is not None else None
+        vols = np.sqrt(np.diag(cov)) * TRADING_DAYS_PER_YEAR ** 0.5
+        contributions = weights * marginal / variance if variance > 0 else np.zeros_like(weights)
+
+        holdings_risk = []
+        for i, ticker in enumerate(covered):
+            holdings_risk.append({
+                'ticker': ticker,
+                'weight': round(float(weights[i]), 4),
+                'volatility_annual': round(float(vols[i]), 4),
+                'beta': round(float(betas[i]), 3) if betas is not None else None,
+                'risk_contribution': round(float(contributions[i]), 4)
+            })
+        holdings_risk.sort(key=lambda h: h['risk_contribution'], reverse=True)
+
+        return {
+            'as_of': model.as_of,
+            'window': window,
+            'observations': len(model.returns),
+            'benchmark': (benchmark or self.benchmark).upper(),
+            'confidence': confidence,
+            'portfolio': {
+                'value': round(total_value, 2),
+                'covered_value': round(covered_value, 2),
+                'volatility_daily': round(daily_vol, 5),
+                'volatility_annual': round(daily_vol * TRADING_DAYS_PER_YEAR ** 0.5, 4),
+                'beta': round(float(betas @ weights), 3) if betas is not None else None,
+                'var': {
+                    'historical': {'percent': round(historical_var, 5),
+                                   'amount': round(historical_var * covered_value, 2)},
+                    'parametric': {'percent': round(parametric_var, 5),
+                                   'amount': round(parametric_var * covered_value, 2)}
+                },
+                'max_drawdown': {
+                    'percent': round(float(drawdowns[trough]), 4),
+                    'peak_date': model.dates[peak] if trough else None,
+                    'trough_date': model.dates[trough] if trough else None
+                }
+            },
+            'holdings': holdings_risk,
+            'excluded': sorted(set(model.excluded) & set(values)),
+            'compute_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def value_history(self, holdings: List[Dict], days: int, convert=None) -> List[Dict]:
+        """Daily portfolio value over the last `days` calendar days from cached closes, as rows"""
+        dates, series = self.value_series(holdings, days, convert)
+        return [{'date': date,
+                 'value': round(float(value), 2),
+                 'formatted_date': datetime.date.fromisoformat(date).strftime('%b %d')}
+                for date, value in zip(dates, series)]
+
+    def value_series(self, holdings: List[Dict], days: int, convert=None):
+        """(dates, NumPy array of values) of the daily portfolio value over the last `days` calendar days
+
+        Uses today's share counts. The series is scaled so its last point is
+        the current value, which assumes positions outside the largest
+        max_tickers, or without history, moved with the rest of the portfolio.
+        convert(currencies, dates) gives units of the reporting currency per
+        unit of each listing currency on each date (FXService.rate_table);
+        without it, prices are summed as quoted.
+        """
+        np = _np()
+        all_values = position_values(holdings)
+        currencies = {holding['ticker'].upper(): holding.get('currency') or 'USD' for holding in holdings}
+        if convert is not None:
+            tickers = list(all_values)
+            latest = convert([currencies[t] for t in tickers], [datetime.date.today().isoformat()])[0]
+            total_value = float(np.dot([all_values[t] for t in tickers], latest))
+        else:
+            total_value = sum(all_values.values())
+        values = position_values(holdings, self.max_tickers)
+        shares = {}
+        for holding in holdings:
+            ticker = holding['ticker'].upper()
+            if ticker in values:
+                shares[ticker] = shares.get(ticker, 0) + holding['shares']
+
+        today = datetime.date.today()
+        tickers = sorted(shares)
+        histories = self.stock_service.get_close_histories(tickers, (today - datetime.timedelta(days=days)).isoformat())
+        dates, prices = align_closes(histories, tickers, today.isoformat())
+        has_data = ~np.isnan(prices).all(axis=0) if len(dates) else np.zeros(len(tickers), bool)
+        if not has_data.any():
+            return [], np.empty(0)
+
+        prices = prices[:, has_data]
+        # Before a ticker's first close, carry that first close backwards
+        first = np.argmax(~np.isnan(prices), axis=0)
+        prices = np.where(np.isnan(prices), prices[first, np.arange(prices.shape[1])], prices)
+        covered = [t for t, ok in zip(tickers, has_data) if ok]
+        if convert is not None:
+            prices = prices * convert([currencies[t] for t in covered], dates)
+        series = prices @ np.array([shares[t] for t in covered])
+        series *= total_value / series[-1] if series[-1] > 0 else 1
+        return dates, series
+
+    def _build_model(self, tickers: List[str], window: int, benchmark: str, as_of: str) -> ReturnsModel:
+        """Fetch closes, align them on one date axis and convert to returns"""
+        np = _np()
+        start = start_date_for(window, as_of)
+        fetch = tickers if benchmark in tickers else tickers + [benchmark]
+        histories = self.stock_service.get_close_histories(fetch, start)
+
+        axis, prices = align_closes(histories, fetch, as_of)
+        prices = prices[-(window + 1):]
+
+        usable = ~np.isnan(prices).any(axis=0) & (prices > 0).all(axis=0) if len(prices) > 1 else np.zeros(len(fetch), bool)
+        returns = prices[1:] / prices[:-1] - 1 if len(prices) > 1 else np.empty((0, len(fetch)))
+        dates = axis[-len(prices):] if len(prices) else []
+
+        bench_column = fetch.index(benchmark)
+        benchmark_returns = returns[:, bench_column] if usable[bench_column] else None
+        keep = [j for j, ticker in enumerate(tickers) if usable[j]]
+        excluded = [ticker for j, ticker in enumerate(tickers) if not usable[j]]
+        if excluded:
+            logger.info(f"Risk model excludes {len(excluded)} tickers without {window} days of history")
+        return ReturnsModel([tickers[j] for j in keep], dates, returns[:, keep], benchmark_returns, excluded)
@@ -0,0 +1,77 @@
+"""
+Compact encodings for chart time series
+
+Largest-Triangle-Three-Buckets (LTTB) downsampling keeps the points that
+define a series' visual shape (peaks, troughs, turns) so multi-year charts
+can be drawn from a few hundred points. Columnar output replaces a list of
+per-row dicts with one array per field, and can be packed with MessagePack
+when the optional `msgpack` package is installed.
+"""
+from typing import Dict, List, Optional
+
+
+def _np():
+    """Import NumPy on first use (keeps it out of app startup)"""
+    import numpy
+    return numpy
+
+
+def _msgpack():
+    """The optional msgpack module, or None when it is not installed"""
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+def msgpack_available() -> bool:
+    return _msgpack() is not None
+
+
+def lttb_indices(x, y, threshold: int):
+    """Indices of the `threshold` points LTTB keeps from series (x, y); always keeps both ends"""
+    np = _np()
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Interior points split into threshold - 2 buckets; the last "next bucket" is the final point
+    every = (n - 2) / (threshold - 2)
+    edges = np.append((np.arange(threshold - 1) * every).astype(np.int64) + 1, n)
+    edges[threshold - 2] = n - 1
+    counts = np.diff(edges)
+    next_x = np.add.reduceat(x, edges[:-1]) / counts
+    next_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the area of the triangle (previous pick, candidate, next bucket's average)
+        area = np.abs((x[a] - next_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(rows: List[Dict], value_key: str, points: int) -> List[Dict]:
+    """Keep `points` date-ordered rows chosen by LTTB on `value_key` (rows need a 'date' field)"""
+    if points >= len(rows):
+        return rows
+    np = _np()
+    x = np.array([row['date'] for row in rows], dtype='datetime64[D]').astype(np.float64)
+    y = np.array([row[value_key] for row in rows], dtype=np.float64)
+    return [rows[i] for i in lttb_indices(x, y, points)]
+
+
+def to_columns(rows: List[Dict], fields: List[str]) -> Dict[str, List]:
+    """Parallel arrays, one per field, from a list of row dicts"""
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def pack(payload: Dict) -> Optional[bytes]:
+    """MessagePack encoding of a payload, or None when msgpack is not installed"""
+    msgpack = _msgpack()
+    return msgpack.packb(payload, use_bin_type=True) if msgpack else None
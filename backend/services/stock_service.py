@@ -1,21 +1,32 @@
 """
 Stock data service using Yahoo Finance API
 """
-import yfinance as yf
-import datetime
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 import time
 import logging
 
+from .metrics_service import track_upstream, record_cache, record_upstream_error
+from .resilience import RateLimiter
+from .trading_calendar import cache_expiry, get_calendar
+
 logging.getLogger('yfinance').setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+
+
+def _yf():
+    """Import yfinance on first use (it drags in pandas and slows startup)"""
+    import yfinance
+    return yfinance
 
 
 class StockService:
     """Service for fetching stock data with caching"""
 
     _price_cache = {}
-    _cache_duration = 300
+    # Historical lookups are paced to stay under Yahoo's rate limit; only bursts wait
+    historical_limiter = RateLimiter(rate=0.5, burst=5)
 
     @staticmethod
     def get_real_time_price(ticker: str) -> Optional[float]:
@@ -24,121 +35,186 @@ class StockService:
             cache_key = f"current_{ticker}"
             if cache_key in StockService._price_cache:
                 cached_data = StockService._price_cache[cache_key]
-                if time.time() - cached_data['timestamp'] < 60:
+                if time.time() < cached_data['expires']:
+                    record_cache('yahoo_quote', True)
                     return cached_data['price']
+            record_cache('yahoo_quote', False)
 
-            stock = yf.Ticker(ticker)
+            stock = _yf().Ticker(ticker)
 
             try:
-                hist = stock.history(period='5d')
+                with track_upstream('yahoo', 'quote'):
+                    hist = stock.history(period='5d')
                 if not hist.empty:
                     price = round(float(hist['Close'].iloc[-1]), 2)
-                    StockService._price_cache[cache_key] = {'price': price, 'timestamp': time.time()}
+                    StockService._price_cache[cache_key] = {'price': price, 'expires': cache_expiry(get_calendar().quote_ttl())}
                     return price
             except Exception as e:
-                print(f"History API failed for {ticker}: {e}")
+                logger.warning(f"History API failed for {ticker}: {e}")
 
             try:
-                fast_info = stock.fast_info
+                with track_upstream('yahoo', 'fast_info'):
+                    fast_info = stock.fast_info
                 if hasattr(fast_info, 'last_price') and fast_info.last_price:
                     price = round(float(fast_info.last_price), 2)
-                    StockService._price_cache[cache_key] = {'price': price, 'timestamp': time.time()}
+                    StockService._price_cache[cache_key] = {'price': price, 'expires': cache_expiry(get_calendar().quote_ttl())}
                     return price
             except Exception as e:
-                print(f"Fast info API failed for {ticker}: {e}")
+                logger.warning(f"Fast info API failed for {ticker}: {e}")
 
             return None
         except Exception as e:
-            print(f"Error fetching price for {ticker}: {e}")
+            logger.error(f"Error fetching price for {ticker}: {e}")
             return None
 
     @staticmethod
     def get_historical_price(ticker: str, date_str: str) -> Optional[float]:
-        """Fetch historical price for a specific date with caching"""
+        """Fetch the close for a date (weekends and holidays use the prior session's close) with caching"""
         try:
-            target_date = datetime.datetime.strptime(date_str, '%Y-%m-%d')
+            calendar = get_calendar()
+            session = calendar.previous_session(date_str)
 
-            cache_key = f"{ticker}_{date_str}"
+            cache_key = f"{ticker}_{session.isoformat()}"
             if cache_key in StockService._price_cache:
                 cached_data = StockService._price_cache[cache_key]
-                if time.time() - cached_data['timestamp'] < StockService._cache_duration:
-                    print(f"Using cached price for {ticker} on {date_str}: ${cached_data['price']}")
+                if time.time() < cached_data['expires']:
+                    record_cache('yahoo_historical', True)
+                    logger.debug(f"Using cached price for {ticker} on {date_str}: ${cached_data['price']}")
                     return cached_data['price']
+            record_cache('yahoo_historical', False)
 
-            time.sleep(3)
+            StockService.historical_limiter.acquire()
 
-            start_date = target_date - timedelta(days=7)
-            end_date = target_date + timedelta(days=1)
+            # Exactly the target session plus the one before it, in case the
+            # target's bar is not published yet (yfinance's end is exclusive)
+            start_date = calendar.offset(session, -1)
+            end_date = session + timedelta(days=1)
 
-            print(f"Fetching {ticker} historical data for {date_str}...")
-            stock = yf.Ticker(ticker)
+            logger.debug(f"Fetching {ticker} closes {start_date} to {session} for {date_str}...")
+            stock = _yf().Ticker(ticker)
 
-            hist = stock.history(start=start_date, end=end_date)
-            print(f"Initial query returned {len(hist)} rows")
-
-            if hist.empty:
-                print(f"Trying longer period for {ticker}...")
-                time.sleep(1)
-                hist = stock.history(period='1y')
-                print(f"1-year period returned {len(hist)} rows")
+            with track_upstream('yahoo', 'historical'):
+                hist = stock.history(start=start_date.isoformat(), end=end_date.isoformat())
 
             if not hist.empty:
-                target_date_str = target_date.strftime('%Y-%m-%d')
-
-                for index, row in hist.iterrows():
-                    if index.strftime('%Y-%m-%d') == target_date_str:
-                        price = round(float(row['Close']), 2)
-                        StockService._price_cache[cache_key] = {'price': price, 'timestamp': time.time()}
-                        print(f"Found exact price for {ticker} on {date_str}: ${price}")
-                        return price
-
-                data_before = hist[hist.index <= target_date]
-                if not data_before.empty:
-                    closest_price = data_before.iloc[-1]['Close']
-                    closest_date = data_before.index[-1].strftime('%Y-%m-%d')
-                    price = round(float(closest_price), 2)
-                    StockService._price_cache[cache_key] = {'price': price, 'timestamp': time.time()}
-                    print(f"Using closest date {closest_date} for {ticker}: ${price}")
-                    return price
-
-                if not hist.empty:
-                    price = round(float(hist.iloc[0]['Close']), 2)
-                    first_date = hist.index[0].strftime('%Y-%m-%d')
-                    StockService._price_cache[cache_key] = {'price': price, 'timestamp': time.time()}
-                    print(f"Using earliest available date {first_date} for {ticker}: ${price}")
-                    return price
-
-            print(f"No data found for {ticker}")
+                closest_date = hist.index[-1].strftime('%Y-%m-%d')
+                price = round(float(hist['Close'].iloc[-1]), 2)
+                StockService._price_cache[cache_key] = {
+                    'price': price,
+                    'expires': cache_expiry(calendar.close_ttl(closest_date) if closest_date == session.isoformat()
+                                            else calendar.quote_ttl())
+                }
+                logger.debug(f"Using close of {closest_date} for {ticker} on {date_str}: ${price}")
+                return price
+
+            logger.info(f"No data found for {ticker} around {date_str}")
             return None
 
         except Exception as e:
             error_msg = str(e)
             if '429' in error_msg or 'Too Many Requests' in error_msg:
-                print(f"Rate limited by Yahoo Finance for {ticker}. Please wait and try again.")
+                record_upstream_error('yahoo', 'historical', 'rate_limited')
+                logger.warning(f"Rate limited by Yahoo Finance for {ticker}. Please wait and try again.")
             else:
-                print(f"Error fetching historical price for {ticker} on {date_str}: {e}")
+                logger.error(f"Error fetching historical price for {ticker} on {date_str}: {e}")
             return None
 
     @staticmethod
     def get_stock_history(ticker: str, period: str = '1mo') -> List[Dict]:
         """Fetch historical stock data"""
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period=period)
-
-            history_data = []
-            for index, row in hist.iterrows():
-                history_data.append({
-                    'date': index.strftime('%Y-%m-%d'),
-                    'formatted_date': index.strftime('%b %d'),
-                    'price': round(float(row['Close']), 2),
-                    'open': round(float(row['Open']), 2),
-                    'high': round(float(row['High']), 2),
-                    'low': round(float(row['Low']), 2),
-                    'volume': int(row['Volume'])
-                })
-
-            return history_data
+            stock = _yf().Ticker(ticker)
+            with track_upstream('yahoo', 'history'):
+                hist = stock.history(period=period)
+
+            # Convert whole columns at once, then zip them into rows
+            columns = {
+                'date': hist.index.strftime('%Y-%m-%d').tolist(),
+                'formatted_date': hist.index.strftime('%b %d').tolist(),
+                'price': hist['Close'].round(2).tolist(),
+                'open': hist['Open'].round(2).tolist(),
+                'high': hist['High'].round(2).tolist(),
+                'low': hist['Low'].round(2).tolist(),
+                'volume': hist['Volume'].astype('int64').tolist()
+            }
+            return [dict(zip(columns, values)) for values in zip(*columns.values())]
         except Exception as e:
-            print(f"Error fetching history for {ticker}: {e}")
+            logger.error(f"Error fetching history for {ticker}: {e}")
             return []
+
+    @staticmethod
+    def get_close_histories(tickers: List[str], start_date: str) -> Dict[str, List[Tuple[str, float]]]:
+        """Fetch daily closes since start_date for many tickers in one batched download"""
+        if not tickers:
+            return {}
+        try:
+            with track_upstream('yahoo', 'batch_history'):
+                data = _yf().download(tickers, start=start_date, group_by='ticker',
+                                      progress=False, threads=True, auto_adjust=False)
+
+            histories = {}
+            for ticker in tickers:
+                if len(tickers) == 1:
+                    frame = data
+                elif ticker in data.columns.get_level_values(0):
+                    frame = data[ticker]
+                else:
+                    continue
+                closes = frame['Close'].dropna()
+                if not closes.empty:
+                    histories[ticker] = list(zip(closes.index.strftime('%Y-%m-%d').tolist(),
+                                                 closes.round(2).tolist()))
+            return histories
+        except Exception as e:
+            logger.error(f"Error fetching batch history for {len(tickers)} tickers: {e}")
+            return {}
+
+    @staticmethod
+    def get_corporate_actions(tickers: List[str]) -> Dict[str, Dict[str, List[Tuple[str, float]]]]:
+        """Past splits (ratio, e.g. 4.0 for 4-for-1) and dividends (per split-adjusted share) by ticker
+
+        Tickers are looked up in parallel; ones that fail are left out,
+        tickers without any actions map to empty lists.
+        """
+        def fetch(ticker: str):
+            try:
+                with track_upstream('yahoo', 'actions'):
+                    actions = _yf().Ticker(ticker).actions
+            except Exception as e:
+                logger.error(f"Error fetching corporate actions for {ticker}: {e}")
+                return None
+            if actions is None or actions.empty:
+                return {'splits': [], 'dividends': []}
+            dates = actions.index.strftime('%Y-%m-%d')
+            result = {}
+            for column, key in (('Stock Splits', 'splits'), ('Dividends', 'dividends')):
+                values = actions[column] if column in actions else None
+                result[key] = [] if values is None else [(date, round(float(value), 6))
+                                                         for date, value in zip(dates, values) if value > 0]
+            return result
+
+        if not tickers:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(8, len(tickers)), thread_name_prefix='yahoo-actions') as executor:
+            results = dict(zip(tickers, executor.map(fetch, tickers)))
+        return {ticker: result for ticker, result in results.items() if result is not None}
+
+    @staticmethod
+    def get_company_profiles(tickers: List[str]) -> Dict[str, Dict[str, Optional[str]]]:
+        """Sector, industry and name for each ticker Yahoo Finance knows"""
+        profiles = {}
+        for ticker in tickers:
+            try:
+                with track_upstream('yahoo', 'profile'):
+                    info = _yf().Ticker(ticker).info or {}
+            except Exception as e:
+                logger.error(f"Error fetching profile for {ticker}: {e}")
+                continue
+            name = info.get('longName') or info.get('shortName')
+            if name or info.get('sector'):
+                profiles[ticker] = {
+                    'sector': info.get('sector'),
+                    'industry': info.get('industry'),
+                    'name': name
+                }
+        return profiles
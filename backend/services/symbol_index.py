@@ -0,0 +1,281 @@
+"""
+Local ticker symbol index
+
+Validates tickers and answers autocomplete queries without touching the
+network. Symbols come from a pipe-delimited listing file (the bundled
+data/symbols.txt, or a fresh copy of the NASDAQ Trader symbol directory
+written by `python -m services.symbol_index --refresh`) and are compiled
+into a binary file of fixed-width records sorted by symbol:
+
+    header   8s magic, uint32 record count, uint32 symbol width
+    records  symbol (NUL padded), uint32 name offset, uint16 name length
+    names    UTF-8 security names, concatenated
+
+The file is memory-mapped and searched with a binary search over the
+records, so a lookup touches ~log2(N) records and no Python objects are
+built for symbols that are not returned.
+
+Usage (from the backend directory):
+    python -m services.symbol_index --refresh    # download listings and rebuild
+    python -m services.symbol_index --build      # rebuild from the listing file
+"""
+import argparse
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SYMIDX1\x00'
+SYMBOL_WIDTH = 10
+HEADER = struct.Struct('<8sII')
+RECORD = struct.Struct(f'<{SYMBOL_WIDTH}sIH')
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9][A-Z0-9-]*$')
+
+# NASDAQ Trader symbol directory: NASDAQ listings and NYSE/other exchange listings
+LISTING_URLS = (
+    'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt',
+    'https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt'
+)
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Exchange symbol in the form market data providers expect (BRK.B -> BRK-B)"""
+    return symbol.strip().upper().replace('.', '-').replace('/', '-')
+
+
+def parse_listing(text: str) -> Dict[str, str]:
+    """Symbol -> security name from a pipe-delimited listing with a header row
+
+    Accepts the bundled two-column file and both NASDAQ Trader formats;
+    test issues, the trailing file-creation line and symbols providers
+    cannot quote (e.g. preferred series with '$') are skipped.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return {}
+    columns = lines[0].split('|')
+    symbol_col = next(columns.index(c) for c in ('Symbol', 'ACT Symbol', 'NASDAQ Symbol') if c in columns)
+    name_col = columns.index('Security Name')
+    test_col = columns.index('Test Issue') if 'Test Issue' in columns else None
+
+    symbols = {}
+    for line in lines[1:]:
+        fields = line.split('|')
+        if len(fields) < len(columns) or line.startswith('File Creation Time'):
+            continue
+        if test_col is not None and fields[test_col] == 'Y':
+            continue
+        symbol = normalize_symbol(fields[symbol_col])
+        if len(symbol) <= SYMBOL_WIDTH and SYMBOL_PATTERN.match(symbol):
+            symbols.setdefault(symbol, fields[name_col].strip())
+    return symbols
+
+
+def write_listing(symbols: Dict[str, str], listing_file: str) -> None:
+    """Save symbols in the bundled two-column listing format"""
+    os.makedirs(os.path.dirname(listing_file) or '.', exist_ok=True)
+    tmp_file = f'{listing_file}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as file:
+        file.write('Symbol|Security Name\n')
+        for symbol in sorted(symbols):
+            file.write(f"{symbol}|{symbols[symbol].replace('|', ' ')}\n")
+    os.replace(tmp_file, listing_file)
+
+
+def write_index(symbols: Dict[str, str], index_file: str) -> None:
+    """Compile symbols into the sorted fixed-width index file"""
+    records = bytearray()
+    names = bytearray()
+    count = 0
+    for symbol in sorted(symbols):
+        encoded = symbol.encode('ascii')
+        if len(encoded) > SYMBOL_WIDTH:
+            continue
+        name = symbols[symbol].encode('utf-8')[:0xFFFF]
+        records += RECORD.pack(encoded, len(names), len(name))
+        names += name
+        count += 1
+
+    os.makedirs(os.path.dirname(index_file) or '.', exist_ok=True)
+    tmp_file = f'{index_file}.tmp'
+    with open(tmp_file, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, count, SYMBOL_WIDTH))
+        file.write(records)
+        file.write(names)
+    os.replace(tmp_file, index_file)
+
+
+class SymbolIndex:
+    """Memory-mapped sorted symbol table for validation and prefix search"""
+
+    RELOAD_CHECK_INTERVAL = 60
+
+    def __init__(self, listing_file: Optional[str], index_file: str, strict: bool = False):
+        """
+        listing_file: pipe-delimited source; the index is rebuilt when it is newer
+        index_file: compiled index, created on first use
+        strict: reject tickers missing from the index instead of checking them upstream
+        """
+        self.listing_file = listing_file
+        self.index_file = index_file
+        self.strict = strict
+        self._mm = None
+        self._count = 0
+        self._names_offset = 0
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        """Whether an index could be loaded"""
+        self._ensure_loaded()
+        return self._mm is not None
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return self._count
+
+    def contains(self, ticker: str) -> bool:
+        """Whether a ticker is a listed symbol"""
+        self._ensure_loaded()
+        key = self._key(ticker)
+        if self._mm is None or key is None:
+            return False
+        position = self._lower_bound(key)
+        return position < self._count and self._symbol_at(position) == key
+
+    def prefix_search(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Symbols starting with `prefix`, in alphabetical order"""
+        self._ensure_loaded()
+        key = self._key(prefix)
+        if self._mm is None or key is None or limit <= 0:
+            return []
+        stripped = key.rstrip(b'\x00')
+        matches = []
+        position = self._lower_bound(key)
+        while position < self._count and len(matches) < limit:
+            symbol = self._symbol_at(position).rstrip(b'\x00')
+            if not symbol.startswith(stripped):
+                break
+            matches.append({'symbol': symbol.decode('ascii'), 'name': self._name_at(position)})
+            position += 1
+        return matches
+
+    def suggest(self, ticker: str, limit: int = 5) -> List[str]:
+        """Listed symbols sharing the longest possible prefix with a ticker"""
+        ticker = normalize_symbol(ticker)
+        for length in range(min(len(ticker), SYMBOL_WIDTH), 0, -1):
+            matches = self.prefix_search(ticker[:length], limit)
+            if matches:
+                return [m['symbol'] for m in matches]
+        return []
+
+    def rebuild(self) -> int:
+        """Recompile the index from the listing file; returns the symbol count"""
+        with open(self.listing_file, 'r', encoding='utf-8') as file:
+            symbols = parse_listing(file.read())
+        write_index(symbols, self.index_file)
+        logger.info(f"Built symbol index with {len(symbols)} symbols at {self.index_file}")
+        return len(symbols)
+
+    def _key(self, text: str) -> Optional[bytes]:
+        symbol = normalize_symbol(text)
+        if not symbol or len(symbol) > SYMBOL_WIDTH or not symbol.isascii():
+            return None
+        return symbol.encode('ascii').ljust(SYMBOL_WIDTH, b'\x00')
+
+    def _lower_bound(self, key: bytes) -> int:
+        """Position of the first record whose symbol is >= key"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._symbol_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _symbol_at(self, position: int) -> bytes:
+        start = HEADER.size + position * RECORD.size
+        return self._mm[start:start + SYMBOL_WIDTH]
+
+    def _name_at(self, position: int) -> str:
+        _, offset, length = RECORD.unpack_from(self._mm, HEADER.size + position * RECORD.size)
+        start = self._names_offset + offset
+        return self._mm[start:start + length].decode('utf-8', errors='replace')
+
+    def _ensure_loaded(self) -> None:
+        """Open the index on first use and pick up rebuilt files, at most once a minute"""
+        now = time.monotonic()
+        if self._loaded_mtime is not None and now - self._checked_at < self.RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if self._loaded_mtime is not None and now - self._checked_at < self.RELOAD_CHECK_INTERVAL:
+                return
+            self._checked_at = now
+            try:
+                if self._is_stale():
+                    self.rebuild()
+                mtime = os.path.getmtime(self.index_file)
+                if mtime != self._loaded_mtime:
+                    self._open()
+                    self._loaded_mtime = mtime
+            except (OSError, ValueError, StopIteration, struct.error) as e:
+                logger.warning(f"Symbol index unavailable, tickers will be checked upstream: {e}")
+                self._loaded_mtime = self._loaded_mtime or 0.0
+
+    def _is_stale(self) -> bool:
+        if not self.listing_file or not os.path.exists(self.listing_file):
+            return False
+        return (not os.path.exists(self.index_file)
+                or os.path.getmtime(self.index_file) < os.path.getmtime(self.listing_file))
+
+    def _open(self) -> None:
+        with open(self.index_file, 'rb') as file:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, width = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or width != SYMBOL_WIDTH:
+            mm.close()
+            raise ValueError(f'{self.index_file} is not a symbol index')
+        # Readers never close the old map; it is released once unreferenced
+        self._mm = mm
+        self._count = count
+        self._names_offset = HEADER.size + count * RECORD.size
+        logger.info(f"Loaded symbol index with {count} symbols")
+
+
+def download_listings() -> Dict[str, str]:
+    """Fetch the current NASDAQ Trader symbol directory"""
+    symbols = {}
+    for url in LISTING_URLS:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            symbols.update(parse_listing(response.read().decode('utf-8', errors='replace')))
+    return symbols
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--refresh', action='store_true', help='download current listings, then rebuild')
+    group.add_argument('--build', action='store_true', help='rebuild the index from the listing file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.refresh:
+        symbols = download_listings()
+        write_listing(symbols, Config.SYMBOL_LISTING_FILE)
+        logger.info(f"Wrote {len(symbols)} symbols to {Config.SYMBOL_LISTING_FILE}")
+    SymbolIndex(Config.SYMBOL_LISTING_FILE, Config.SYMBOL_INDEX_FILE).rebuild()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+NYSE trading calendar
+
+Sessions are precomputed once as a sorted list of dates from the
+exchange's holiday rules (with weekend observance), Good Friday and
+unscheduled closures, so lookups are a bisect. Early closes (13:00 ET) are
+kept in a set. The calendar snaps arbitrary dates to the session whose
+close they refer to, sizes history requests to the exact sessions needed
+and tells caches how long a price stays current: quotes until the next
+open while the market is closed, finished sessions' closes for good.
+"""
+import datetime
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+OPEN_TIME = datetime.time(9, 30)
+CLOSE_TIME = datetime.time(16, 0)
+EARLY_CLOSE_TIME = datetime.time(13, 0)
+
+# Unscheduled full-day closures (national days of mourning, 9/11, Hurricane Sandy)
+SPECIAL_CLOSURES = (
+    '1994-04-27', '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14', '2004-06-11',
+    '2007-01-02', '2012-10-29', '2012-10-30', '2018-12-05', '2025-01-09'
+)
+
+DateLike = Union[datetime.date, str]
+
+
+def _eastern():
+    """America/New_York, or fixed EST where the tz database is missing (e.g. Windows without tzdata)"""
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo('America/New_York')
+    except Exception:
+        logger.warning("Time zone America/New_York unavailable; using fixed UTC-5 for market hours")
+        return datetime.timezone(datetime.timedelta(hours=-5), 'EST')
+
+
+def _as_date(day: DateLike) -> datetime.date:
+    if isinstance(day, datetime.datetime):
+        return day.date()
+    if isinstance(day, datetime.date):
+        return day
+    return datetime.date.fromisoformat(str(day).strip())
+
+
+def _easter(year: int) -> datetime.date:
+    """Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> datetime.date:
+    """n-th `weekday` (0=Monday) of a month; n=-1 for the last one"""
+    if n > 0:
+        first = datetime.date(year, month, 1)
+        return first + datetime.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: datetime.date) -> datetime.date:
+    """Saturday holidays move to Friday, Sunday holidays to Monday"""
+    if day.weekday() == 5:
+        return day - datetime.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + datetime.timedelta(days=1)
+    return day
+
+
+def holidays(year: int) -> List[datetime.date]:
+    """Full-day NYSE holidays of a year under the current rules"""
+    days = []
+    new_year = datetime.date(year, 1, 1)
+    # A Saturday New Year's Day is not observed (it would fall in the previous year)
+    if new_year.weekday() != 5:
+        days.append(_observed(new_year))
+    if year >= 1998:
+        days.append(_nth_weekday(year, 1, 0, 3))
+    days.append(_nth_weekday(year, 2, 0, 3))
+    days.append(_easter(year) - datetime.timedelta(days=2))
+    days.append(_nth_weekday(year, 5, 0, -1))
+    if year >= 2022:
+        days.append(_observed(datetime.date(year, 6, 19)))
+    days.append(_observed(datetime.date(year, 7, 4)))
+    days.append(_nth_weekday(year, 9, 0, 1))
+    days.append(_nth_weekday(year, 11, 3, 4))
+    days.append(_observed(datetime.date(year, 12, 25)))
+    return days
+
+
+def early_closes(year: int) -> List[datetime.date]:
+    """13:00 ET closes: the day before Independence Day, Black Friday and Christmas Eve"""
+    days = []
+    july_3 = datetime.date(year, 7, 3)
+    if july_3.weekday() < 4:
+        days.append(july_3)
+    days.append(_nth_weekday(year, 11, 3, 4) + datetime.timedelta(days=1))
+    christmas_eve = datetime.date(year, 12, 24)
+    if christmas_eve.weekday() < 4:
+        days.append(christmas_eve)
+    return days
+
+
+class TradingCalendar:
+    """Sorted NYSE session dates with bisect lookups and market-hours helpers"""
+
+    def __init__(self, start_year: int = 1980, end_year: int = 2050):
+        closed = {day for year in range(start_year, end_year + 1) for day in holidays(year)}
+        closed.update(datetime.date.fromisoformat(day) for day in SPECIAL_CLOSURES)
+        day = datetime.date(start_year, 1, 1)
+        last = datetime.date(end_year, 12, 31)
+        self.sessions: List[datetime.date] = []
+        while day <= last:
+            if day.weekday() < 5 and day not in closed:
+                self.sessions.append(day)
+            day += datetime.timedelta(days=1)
+        self.early_closes = {day for year in range(start_year, end_year + 1) for day in early_closes(year)} - closed
+        self.tz = _eastern()
+
+    def is_session(self, day: DateLike) -> bool:
+        day = _as_date(day)
+        i = bisect_left(self.sessions, day)
+        return i < len(self.sessions) and self.sessions[i] == day
+
+    def previous_session(self, day: DateLike) -> datetime.date:
+        """The session on or before `day` (weekends and holidays snap back to the prior session)"""
+        day = _as_date(day)
+        i = bisect_right(self.sessions, day)
+        if i == 0 or day > self.sessions[-1]:
+            return self._weekday(day, -1, inclusive=True)
+        return self.sessions[i - 1]
+
+    def next_session(self, day: DateLike) -> datetime.date:
+        """The first session strictly after `day`"""
+        day = _as_date(day)
+        i = bisect_right(self.sessions, day)
+        if i == len(self.sessions) or day < self.sessions[0]:
+            return self._weekday(day, 1, inclusive=False)
+        return self.sessions[i]
+
+    def offset(self, day: DateLike, count: int) -> datetime.date:
+        """The session `count` sessions after (negative: before) the session on or before `day`"""
+        anchor = self.previous_session(day)
+        i = bisect_left(self.sessions, anchor) + count
+        if 0 <= i < len(self.sessions) and self.sessions[0] <= anchor <= self.sessions[-1]:
+            return self.sessions[i]
+        step = 1 if count > 0 else -1
+        for _ in range(abs(count)):
+            anchor = self._weekday(anchor, step, inclusive=False)
+        return anchor
+
+    def sessions_between(self, start: DateLike, end: DateLike) -> List[datetime.date]:
+        """Sessions from start to end, both inclusive"""
+        return self.sessions[bisect_left(self.sessions, _as_date(start)):bisect_right(self.sessions, _as_date(end))]
+
+    def sessions_after(self, day: DateLike, count: int) -> List[datetime.date]:
+        """The next `count` sessions strictly after `day`"""
+        i = bisect_right(self.sessions, _as_date(day))
+        sessions = self.sessions[i:i + count]
+        while len(sessions) < count:
+            sessions.append(self.next_session(sessions[-1] if sessions else day))
+        return sessions
+
+    def session_open(self, day: DateLike) -> datetime.datetime:
+        return datetime.datetime.combine(_as_date(day), OPEN_TIME, tzinfo=self.tz)
+
+    def session_close(self, day: DateLike) -> datetime.datetime:
+        day = _as_date(day)
+        return datetime.datetime.combine(day, EARLY_CLOSE_TIME if day in self.early_closes else CLOSE_TIME,
+                                         tzinfo=self.tz)
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now(self.tz)
+
+    def today(self) -> datetime.date:
+        """Today's date in New York"""
+        return self.now().date()
+
+    def is_open(self, now: Optional[datetime.datetime] = None) -> bool:
+        now = now or self.now()
+        today = now.astimezone(self.tz).date()
+        return self.is_session(today) and self.session_open(today) <= now < self.session_close(today)
+
+    def next_open(self, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+        """Opening time of the next session that has not opened yet"""
+        now = now or self.now()
+        today = now.astimezone(self.tz).date()
+        if self.is_session(today) and now < self.session_open(today):
+            return self.session_open(today)
+        return self.session_open(self.next_session(today))
+
+    def last_close(self, now: Optional[datetime.datetime] = None) -> datetime.date:
+        """The most recent session whose close has passed; daily bars change only after the next one"""
+        now = now or self.now()
+        session = self.previous_session(now.astimezone(self.tz).date())
+        if now < self.session_close(session):
+            session = self.offset(session, -1)
+        return session
+
+    def quote_ttl(self, open_ttl: float = 60, now: Optional[datetime.datetime] = None) -> float:
+        """Seconds a quote stays current: open_ttl in market hours, otherwise until the next open"""
+        now = now or self.now()
+        if self.is_open(now):
+            return open_ttl
+        return max((self.next_open(now) - now).total_seconds(), open_ttl)
+
+    def close_ttl(self, day: DateLike, open_ttl: float = 60,
+                  now: Optional[datetime.datetime] = None) -> Optional[float]:
+        """Seconds the close for `day` may be cached; None once its session has closed (it never changes)"""
+        now = now or self.now()
+        if now >= self.session_close(self.previous_session(day)):
+            return None
+        return self.quote_ttl(open_ttl, now)
+
+    @staticmethod
+    def _weekday(day: datetime.date, step: int, inclusive: bool) -> datetime.date:
+        """Weekday stepping for dates outside the precomputed range"""
+        if not inclusive:
+            day += datetime.timedelta(days=step)
+        while day.weekday() >= 5:
+            day += datetime.timedelta(days=step)
+        return day
+
+
+def cache_expiry(ttl: Optional[float]) -> float:
+    """Epoch time a cache entry with this TTL expires; a None TTL never expires"""
+    return float('inf') if ttl is None else time.time() + ttl
+
+
+@lru_cache(maxsize=1)
+def get_calendar() -> TradingCalendar:
+    """Shared NYSE calendar, built on first use"""
+    return TradingCalendar()
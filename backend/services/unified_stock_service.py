@@ -1,45 +1,247 @@
 """
 Unified stock service with Alpha Vantage primary and Yahoo Finance fallback
+
+Lookups that can be served by either provider go to Alpha Vantage first.
+If it has not answered after about its recent p95 latency, the same
+lookup is started on Yahoo Finance and whichever usable answer arrives
+first wins. Each provider has a circuit breaker that skips it for a
+cool-down after repeated failures (outage, exhausted quota, rate limits),
+so lookups stop paying its timeouts: with Alpha Vantage open they go
+straight to Yahoo Finance, and with Yahoo Finance open they get no hedge
+(or, without Alpha Vantage, fail fast).
 """
-from typing import Optional, List, Dict
+import logging
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+from typing import Any, Callable, Optional, List, Dict, Tuple
 from .alphavantage_service import AlphaVantageService
+from .metrics_service import record_cache, record_provider_event
+from .replay_service import ReplayStockService
+from .resilience import CircuitBreaker, LatencyTracker
 from .stock_service import StockService
+from .trading_calendar import get_calendar
+
+logger = logging.getLogger(__name__)
 
 
 class UnifiedStockService:
     """Stock service that uses Alpha Vantage with Yahoo Finance fallback"""
 
-    def __init__(self, alpha_vantage_key: Optional[str] = None):
+    # Pause between tickers during a bulk refresh to stay under provider rate limits
+    refresh_delay = 0.5
+
+    def __init__(self, alpha_vantage_key: Optional[str] = None, data_mode: str = 'live',
+                 recordings_dir: Optional[str] = None, replay_options: Optional[Dict] = None,
+                 breaker_failures: int = 5, breaker_cooldown: float = 60.0,
+                 hedge_percentile: float = 95, hedge_max_delay: float = 2.0):
+        """
+        data_mode: 'live' calls the real providers, 'record' also saves their
+        responses under recordings_dir, 'replay' answers only from those
+        recordings using replay_options (see ReplayStockService)
+        breaker_failures, breaker_cooldown: consecutive failures of a provider
+        that open its circuit, and seconds before it is tried again
+        hedge_percentile, hedge_max_delay: the backup request starts after this
+        percentile of recent Alpha Vantage latency, capped at hedge_max_delay
+        seconds (also the delay until enough latencies have been seen)
+        """
+        self.yahoo = StockService()
         self.alpha_vantage = AlphaVantageService(alpha_vantage_key) if alpha_vantage_key else None
-        self.use_alpha_vantage = alpha_vantage_key is not None
-        print(f"Stock service initialized - Alpha Vantage: {'Enabled' if self.use_alpha_vantage else 'Disabled (using Yahoo Finance)'}")
+
+        if data_mode == 'record':
+            self.yahoo = ReplayStockService('yahoo', recordings_dir, provider=self.yahoo)
+            if self.alpha_vantage:
+                self.alpha_vantage = ReplayStockService('alphavantage', recordings_dir, provider=self.alpha_vantage)
+        elif data_mode == 'replay':
+            options = dict(replay_options or {})
+            self.yahoo = ReplayStockService('yahoo', recordings_dir, **options)
+            if options.get('seed') is not None:
+                # Independent failure rolls per provider
+                options['seed'] += 1
+            alpha_replay = ReplayStockService('alphavantage', recordings_dir, **options)
+            self.alpha_vantage = alpha_replay if alpha_replay.has_recordings() else None
+        elif data_mode != 'live':
+            raise ValueError(f"Unknown market data mode: {data_mode}")
+
+        self.data_mode = data_mode
+        # ticker -> (day fetched, start date, [(date, close), ...])
+        self._close_cache: Dict[str, Tuple[str, str, List[Tuple[str, float]]]] = {}
+        self._close_cache_lock = threading.Lock()
+        self.use_alpha_vantage = self.alpha_vantage is not None
+
+        self.breakers = {name: CircuitBreaker(name, breaker_failures, breaker_cooldown)
+                         for name in ('alphavantage', 'yahoo')}
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_delay = hedge_max_delay
+        self._latency: Dict[str, LatencyTracker] = {}
+        # Separate pools, so hung Alpha Vantage calls never delay the Yahoo backup
+        self._executors = {
+            'alphavantage': ThreadPoolExecutor(max_workers=8, thread_name_prefix='alphavantage'),
+            'yahoo': ThreadPoolExecutor(max_workers=8, thread_name_prefix='yahoo')
+        }
+        logger.info(f"Stock service initialized ({data_mode}) - Alpha Vantage: {'Enabled' if self.use_alpha_vantage else 'Disabled (using Yahoo Finance)'}")
 
     def get_real_time_price(self, ticker: str) -> Optional[float]:
         """Fetch real-time price with fallback"""
-        if self.use_alpha_vantage:
-            price = self.alpha_vantage.get_real_time_price(ticker)
-            if price is not None:
-                return price
-            print(f"Alpha Vantage failed for {ticker}, falling back to Yahoo Finance")
+        return self._with_fallback('quote', ticker, lambda provider: provider.get_real_time_price(ticker))
 
-        return StockService.get_real_time_price(ticker)
+    def get_real_time_prices(self, tickers: List[str]) -> Dict[str, Optional[float]]:
+        """Fetch each distinct ticker once, pausing between lookups for rate limits"""
+        unique_tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        prices = {}
+        for i, ticker in enumerate(unique_tickers):
+            prices[ticker] = self.get_real_time_price(ticker)
+            if i < len(unique_tickers) - 1 and self.refresh_delay:
+                time.sleep(self.refresh_delay)
+        return prices
 
     def get_historical_price(self, ticker: str, date_str: str) -> Optional[float]:
         """Fetch historical price with fallback"""
-        if self.use_alpha_vantage:
-            price = self.alpha_vantage.get_historical_price(ticker, date_str)
-            if price is not None:
-                return price
-            print(f"Alpha Vantage failed for {ticker}, falling back to Yahoo Finance")
+        return self._with_fallback('historical', ticker,
+                                   lambda provider: provider.get_historical_price(ticker, date_str))
+
+    def get_historical_prices_bulk(self, dates_by_ticker: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """Resolve many (ticker, date) closes with one batched history download
+
+        Returns {ticker: {'prices': {date: close}, 'latest': close}}; tickers
+        with no data are left out. Yahoo serves this path because its batch
+        download covers any date range in one call, while Alpha Vantage's
+        compact series only spans about 100 trading days.
+        """
+        if not dates_by_ticker:
+            return {}
+        earliest = min(min(dates) for dates in dates_by_ticker.values())
+        # Start one session before the earliest date's session, so weekend and
+        # holiday dates (and a session whose bar is not out yet) find a prior close
+        start = get_calendar().offset(earliest, -1).isoformat()
+        histories = self.yahoo.get_close_histories(sorted(dates_by_ticker), start)
+
+        resolved = {}
+        for ticker, series in histories.items():
+            dates = [date for date, _ in series]
+            prices = {}
+            for date_str in dates_by_ticker[ticker]:
+                # Close on or before the date, else the earliest available close
+                index = max(bisect_right(dates, date_str) - 1, 0)
+                prices[date_str] = series[index][1]
+            resolved[ticker] = {'prices': prices, 'latest': series[-1][1]}
+        return resolved
+
+    def get_close_histories(self, tickers: List[str], start_date: str) -> Dict[str, List[Tuple[str, float]]]:
+        """Daily closes since start_date, cached per ticker until the next session close
 
-        return StockService.get_historical_price(ticker, date_str)
+        Tickers already fetched since the last close from an earlier start
+        date are served from memory; the rest are fetched in one batched
+        download. Nights, weekends and holidays reuse the same entries.
+        """
+        last_close = get_calendar().last_close().isoformat()
+        histories = {}
+        missing = []
+        with self._close_cache_lock:
+            for ticker in tickers:
+                cached = self._close_cache.get(ticker)
+                if cached and cached[0] == last_close and cached[1] <= start_date:
+                    series = cached[2]
+                    histories[ticker] = series[bisect_right(series, (start_date,)):] if cached[1] < start_date else series
+                else:
+                    missing.append(ticker)
+        for ticker in tickers:
+            record_cache('close_history', ticker in histories)
+
+        if missing:
+            fetched = self.yahoo.get_close_histories(missing, start_date)
+            with self._close_cache_lock:
+                for ticker, series in fetched.items():
+                    self._close_cache[ticker] = (last_close, start_date, series)
+            histories.update(fetched)
+        return histories
 
     def get_stock_history(self, ticker: str, period: str = '1mo') -> List[Dict]:
         """Fetch stock history with fallback"""
-        if self.use_alpha_vantage:
-            history = self.alpha_vantage.get_stock_history(ticker, period)
-            if history:
-                return history
-            print(f"Alpha Vantage failed for {ticker} history, falling back to Yahoo Finance")
+        return self._with_fallback('history', ticker, lambda provider: provider.get_stock_history(ticker, period)) or []
+
+    def get_company_profiles(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Sector, industry and name per ticker (Yahoo Finance only, to spare Alpha Vantage quota)"""
+        return self.yahoo.get_company_profiles(tickers)
+
+    def get_corporate_actions(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Splits and dividends per ticker (Yahoo Finance only; Alpha Vantage has no free actions endpoint)"""
+        return self.yahoo.get_corporate_actions(tickers)
+
+    def _with_fallback(self, operation: str, ticker: str, call: Callable[[Any], Any]):
+        """Run call(provider) on Alpha Vantage with a hedged Yahoo Finance backup
+
+        Empty answers (None, []) count as failures. Returns the first usable
+        answer, or the last empty one if neither provider has data.
+        """
+        if not self.use_alpha_vantage:
+            return self._call_yahoo(operation, call)
+        permit = self.breakers['alphavantage'].allow()
+        if permit is None:
+            record_provider_event('alphavantage', 'skipped')
+            return self._call_yahoo(operation, call)
+
+        primary = self._executors['alphavantage'].submit(self._call_guarded, 'alphavantage', operation, call, permit)
+        try:
+            result = primary.result(timeout=self._hedge_delay(operation))
+            if result:
+                return result
+            logger.info(f"Alpha Vantage failed for {ticker} {operation}, falling back to Yahoo Finance")
+            return self._call_yahoo(operation, call)
+        except TimeoutError:
+            pass
+
+        backup_permit = self.breakers['yahoo'].allow()
+        if backup_permit is None:
+            record_provider_event('yahoo', 'skipped')
+            return primary.result()
+        record_provider_event('yahoo', 'hedged')
+        backup = self._executors['yahoo'].submit(self._call_guarded, 'yahoo', operation, call, backup_permit)
+        pending = {primary, backup}
+        result = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result:
+                    if future is backup:
+                        record_provider_event('yahoo', 'hedge_won')
+                    return result
+        return result
+
+    def _call_yahoo(self, operation: str, call: Callable[[Any], Any]):
+        """Yahoo Finance call on this thread, or None while its circuit is open"""
+        permit = self.breakers['yahoo'].allow()
+        if permit is None:
+            record_provider_event('yahoo', 'skipped')
+            return None
+        return self._call_guarded('yahoo', operation, call, permit)
+
+    def _call_guarded(self, name: str, operation: str, call: Callable[[Any], Any], permit: object):
+        """Provider call that feeds its circuit breaker (and Alpha Vantage's latency window)"""
+        provider = self.alpha_vantage if name == 'alphavantage' else self.yahoo
+        start = time.perf_counter()
+        try:
+            result = call(provider)
+        except Exception as e:
+            logger.error(f"{name} {operation} raised: {e}")
+            result = None
+        if result and name == 'alphavantage':
+            self._latency_tracker(operation).observe(time.perf_counter() - start)
+        if self.breakers[name].record(bool(result), permit):
+            record_provider_event(name, 'breaker_opened')
+        return result
+
+    def _hedge_delay(self, operation: str) -> float:
+        """Seconds to wait on Alpha Vantage before starting the backup"""
+        latency = self._latency_tracker(operation).percentile(self.hedge_percentile)
+        if latency is None:
+            return self.hedge_max_delay
+        return min(max(latency, 0.05), self.hedge_max_delay)
 
-        return StockService.get_stock_history(ticker, period)
+    def _latency_tracker(self, operation: str) -> LatencyTracker:
+        tracker = self._latency.get(operation)
+        if tracker is None:
+            tracker = self._latency.setdefault(operation, LatencyTracker())
+        return tracker
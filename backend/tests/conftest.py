@@ -0,0 +1,56 @@
+"""Shared fixtures: the app over stub providers with its files under tmp_path, and synthetic close histories"""
+import datetime
+
+import numpy as np
+import pytest
+
+from app import create_app
+from benchmarks.fixtures import StubAIService, StubStockService, synthetic_symbol_index
+from config import Config
+from models import Portfolio
+from services import CorporateActions, MetadataResolver
+from services.trading_calendar import get_calendar
+
+
+class HistoryStub:
+    """Provider whose closes compound given daily returns, ending at the last session
+
+    Only the first `visible` closes are published, so tests can release
+    new days one at a time.
+    """
+
+    def __init__(self, returns):
+        last = get_calendar().previous_session(datetime.date.today())
+        count = len(next(iter(returns.values()))) + 1
+        self.dates = [get_calendar().offset(last, i - count + 1).isoformat() for i in range(count)]
+        self.closes = {ticker: 100 * np.cumprod(np.r_[1.0, 1 + np.asarray(series)]) for ticker, series in returns.items()}
+        self.visible = count
+
+    def get_close_histories(self, tickers, start_date):
+        return {ticker: [(d, c) for d, c in zip(self.dates[:self.visible], self.closes[ticker]) if d >= start_date]
+                for ticker in tickers if ticker in self.closes}
+
+
+@pytest.fixture
+def history_stub():
+    """The HistoryStub class: history_stub({'SPY': returns, ...})"""
+    return HistoryStub
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    """Factory for a test client over `holdings` (tickers from synthetic_ticker) and a stub stock service"""
+    for name in ('PORTFOLIOS_DIR', 'PROFILE_DIR', 'ALERTS_FILE', 'ALERT_LOG_FILE'):
+        monkeypatch.setattr(Config, name, str(tmp_path / name.lower()))
+
+    def make(holdings=(), stock_service=None):
+        stock_service = stock_service or StubStockService()
+        portfolio = Portfolio(str(tmp_path / 'holdings.csv'), initial_data=[dict(holding) for holding in holdings])
+        metadata = MetadataResolver(str(tmp_path / 'metadata.db'), stock_service.get_company_profiles, Config.SECTOR_MAP)
+        actions = CorporateActions(str(tmp_path / 'actions.db'), stock_service.get_corporate_actions, batch_wait=0.01)
+        app = create_app(portfolio=portfolio, stock_service=stock_service, ai_service=StubAIService(),
+                         symbol_index=synthetic_symbol_index(100, str(tmp_path / 'symbols.idx')),
+                         metadata=metadata, actions=actions)
+        return app.test_client()
+
+    return make
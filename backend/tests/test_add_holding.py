@@ -0,0 +1,24 @@
+"""Adding a holding: input errors are reported as they are"""
+import pytest
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'shares': 'ten'}, 'Invalid number format for shares'),
+    ({'buy_price': 'cheap'}, 'Invalid number format for buy_price'),
+    # Caught by the ledger, not by the route's own checks
+    ({'buy_price': -5}, 'B: buy needs positive shares and price'),
+])
+def test_invalid_input_is_a_400_with_its_message(make_client, body, error):
+    response = make_client().post('/api/holdings', json={'ticker': 'B', 'shares': 10, 'purchase_date': '2024-03-04', **body})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_manual_buy_price_is_recorded(make_client):
+    client = make_client()
+
+    response = client.post('/api/holdings', json={'ticker': 'B', 'shares': 10, 'purchase_date': '2024-03-04', 'buy_price': '42.5'})
+
+    assert response.status_code == 201
+    assert response.get_json()['holding']['buy_price'] == pytest.approx(42.5)
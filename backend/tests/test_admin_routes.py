@@ -0,0 +1,34 @@
+"""Admin routes: authorization and query validation"""
+import pytest
+from flask import Flask
+
+from routes.admin_routes import admin_bp, init_admin_routes
+from services.profiling_service import RequestProfiler
+
+
+def client(tmp_path, token=None):
+    init_admin_routes(RequestProfiler(str(tmp_path), admin_token=token))
+    app = Flask(__name__)
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def test_without_token_only_direct_loopback_requests_are_allowed(tmp_path):
+    admin = client(tmp_path)
+
+    assert admin.get('/api/admin/profiles').status_code == 200
+    assert admin.get('/api/admin/profiles', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 403
+    assert admin.get('/api/admin/profiles', headers={'X-Forwarded-For': '10.0.0.5'}).status_code == 403
+
+
+def test_token_is_required_when_set(tmp_path):
+    admin = client(tmp_path, token='secret')
+
+    assert admin.get('/api/admin/profiles').status_code == 403
+    assert admin.get('/api/admin/profiles', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert admin.get('/api/admin/profiles', headers={'X-Admin-Token': 'secret'}).status_code == 200
+
+
+@pytest.mark.parametrize('limit, status', [('x', 400), ('5', 200), ('-3', 200), ('100000', 200)])
+def test_limit_must_be_an_integer(tmp_path, limit, status):
+    assert client(tmp_path).get(f'/api/admin/profiles?limit={limit}').status_code == status
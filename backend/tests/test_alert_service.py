@@ -0,0 +1,110 @@
+"""Price alerts: level crossing, fire-once, persistence and the alert routes"""
+import pytest
+
+from benchmarks.fixtures import StubStockService
+from services.alert_service import AlertEngine
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+
+    def notify(self, events):
+        self.batches.append([event['id'] for event in events])
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return AlertEngine(str(tmp_path / 'alerts.json'), Recorder())
+
+
+def test_quotes_fire_exactly_the_levels_they_cross(engine):
+    created = engine.create([{'ticker': 'aaa', 'kind': 'above', 'threshold': level} for level in (10, 11, 12)]
+                            + [{'ticker': 'AAA', 'kind': 'below', 'threshold': level} for level in (8, 9)])
+    ids = {(rule['direction'], rule['level']): rule['id'] for rule in created}
+
+    assert engine.evaluate({'AAA': 11.0, 'BBB': 50.0}) and engine.notifier.batches == [[ids['above', 10], ids['above', 11]]]
+    assert engine.evaluate({'AAA': 11.5}) == []
+    fired = engine.evaluate({'AAA': 8.5})
+
+    assert [event['id'] for event in fired] == [ids['below', 9]]
+    assert fired[0]['price'] == 8.5 and fired[0]['status'] == 'triggered'
+    assert engine.active_count() == 2
+
+
+def test_move_alerts_are_levels_from_the_base_price(engine):
+    up, down = engine.create([{'ticker': 'AAA', 'kind': 'move', 'threshold': 10, 'base_price': 100},
+                              {'ticker': 'AAA', 'kind': 'move', 'threshold': -5, 'base_price': 100}])
+
+    assert (up['direction'], up['level']) == ('above', 110.0)
+    assert (down['direction'], down['level']) == ('below', 95.0)
+    assert [event['id'] for event in engine.evaluate({'AAA': 94.0})] == [down['id']]
+
+
+@pytest.mark.parametrize('rule', [
+    {'kind': 'above', 'threshold': 10},
+    {'ticker': 'AAA', 'kind': 'sideways', 'threshold': 10},
+    {'ticker': 'AAA', 'kind': 'below', 'threshold': -1},
+    {'ticker': 'AAA', 'kind': 'move', 'threshold': 10},
+    {'ticker': 'AAA', 'kind': 'move', 'threshold': -100, 'base_price': 50},
+])
+def test_invalid_rules_reject_the_batch(engine, rule):
+    with pytest.raises(ValueError):
+        engine.create([{'ticker': 'AAA', 'kind': 'above', 'threshold': 1}, rule])
+    assert engine.rules() == []
+
+
+def test_deleted_rules_never_fire(engine):
+    rule = engine.create([{'ticker': 'AAA', 'kind': 'above', 'threshold': 10}])[0]
+
+    assert engine.delete(rule['id'])
+    assert engine.evaluate({'AAA': 20.0}) == []
+    assert not engine.delete(rule['id'])
+
+
+@pytest.mark.parametrize('compact_every', [2, 50_000])
+def test_rules_survive_a_restart(tmp_path, compact_every):
+    store = str(tmp_path / 'alerts.json')
+    engine = AlertEngine(store, compact_every=compact_every)
+    first, second, third = engine.create([{'ticker': 'AAA', 'kind': 'above', 'threshold': level} for level in (10, 20, 30)])
+    engine.evaluate({'AAA': 15.0})
+    engine.delete(third['id'])
+    with open(f'{store}.log', 'a') as file:
+        file.write('{"op": "crea')
+
+    reloaded = AlertEngine(store)
+
+    assert reloaded.rules() == engine.rules()
+    assert reloaded.active_count() == 1
+    assert [event['id'] for event in reloaded.evaluate({'AAA': 25.0})] == [second['id']]
+    assert reloaded.create([{'ticker': 'AAA', 'kind': 'above', 'threshold': 1}])[0]['id'] == third['id'] + 1
+
+
+def test_a_failing_notifier_does_not_lose_the_trigger(tmp_path):
+    class Broken:
+        def notify(self, events):
+            raise RuntimeError('webhook down')
+
+    engine = AlertEngine(str(tmp_path / 'alerts.json'), Broken())
+    engine.create([{'ticker': 'AAA', 'kind': 'above', 'threshold': 10}])
+
+    assert len(engine.evaluate({'AAA': 11.0})) == 1
+    assert engine.rules(status='triggered')
+
+
+def test_quote_refresh_triggers_alerts_through_the_routes(make_client):
+    client = make_client([{'id': 1, 'ticker': 'B', 'shares': 1.0, 'buy_price': 10.0, 'current_price': 10.0,
+                           'purchase_date': '2024-01-02', 'sector': 'Technology', 'currency': 'USD'}])
+    quote = StubStockService().get_real_time_price('B')
+
+    created = client.post('/api/alerts', json={'alerts': [{'ticker': 'B', 'kind': 'above', 'threshold': quote - 1},
+                                                          {'ticker': 'B', 'kind': 'move', 'threshold': 50}]})
+    client.get('/api/real-time-prices')
+
+    assert created.status_code == 201
+    assert created.get_json()['alerts'][1]['level'] == 15.0
+    triggered = client.get('/api/alerts?status=triggered').get_json()['alerts']
+    # The stub quote is also past the +50% move from the buy price
+    assert quote > 15
+    assert sorted(alert['kind'] for alert in triggered) == ['above', 'move']
+    assert client.post('/api/alerts', json={'ticker': 'B', 'kind': 'above'}).status_code == 400
@@ -0,0 +1,40 @@
+"""Corporate actions: bounded waits on write paths and cached fetch failures"""
+import time
+
+import pytest
+
+from services.corporate_actions import CorporateActions
+
+
+def test_failed_fetch_is_cached_and_not_retried(tmp_path):
+    calls = []
+
+    def fetch(tickers):
+        calls.append(list(tickers))
+        raise RuntimeError('provider down')
+
+    actions = CorporateActions(str(tmp_path / 'ca.db'), fetch, write_wait=5)
+    assert actions.ensure(['AAA'])
+    assert actions.ensure(['AAA'])
+    actions.prefetch(['AAA'])
+    actions.wait_idle()
+
+    assert calls == [['AAA']]
+    assert actions.actions('AAA') is None
+    assert actions.split_factors(['AAA'], ['2024-01-02'])[0] == pytest.approx(1.0)
+
+
+def test_ensure_waits_only_for_requested_tickers(tmp_path):
+    def fetch(tickers):
+        if 'SLOW' in tickers:
+            time.sleep(2)
+        return {ticker: {'splits': [('2024-06-10', 4.0)], 'dividends': []} for ticker in tickers}
+
+    actions = CorporateActions(str(tmp_path / 'ca.db'), fetch, write_wait=0.5, batch_size=1)
+    actions.ensure(['AAA'])
+
+    start = time.monotonic()
+    assert not actions.ensure(['SLOW'], timeout=0.1)
+    assert actions.ensure(['AAA'])
+    assert time.monotonic() - start < 0.5
+    assert actions.as_traded('AAA', '2024-01-02', 100.0) == pytest.approx(400.0)
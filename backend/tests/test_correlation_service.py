@@ -0,0 +1,66 @@
+"""Rolling correlations: incremental updates agree with a full recomputation"""
+import datetime
+
+import numpy as np
+import pytest
+
+from services.correlation_service import CorrelationTracker, RollingCorrelation
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(3)
+    market = rng.normal(0, 0.01, 80)
+    return {'SPY': market, 'LEV': 2 * market, 'SHORT': -market, 'IDIO': rng.normal(0, 0.02, 80)}
+
+
+def test_appends_match_the_last_window():
+    rng = np.random.default_rng(11)
+    rows = rng.normal(0, 0.01, (100, 4))
+    closes = 100 * np.cumprod(1 + rows, axis=0)
+    rolling = RollingCorrelation(list('ABCD'), 20, rows[:5], '2024-01-05', closes[4])
+
+    # Past the window several times, so rows are evicted and the sums rebased
+    for i in range(5, 100):
+        rolling.append(f'day-{i}', closes[i])
+
+    assert rolling.observations == 20
+    assert np.allclose(rolling.covariance(), np.cov(rows[-20:], rowvar=False))
+    assert np.allclose(rolling.correlation(), np.corrcoef(rows[-20:], rowvar=False))
+
+
+def test_matrix_pairs_and_exclusions(returns, history_stub):
+    tracker = CorrelationTracker(history_stub(returns), window=60)
+    holdings = [{'ticker': t, 'shares': 1.0, 'current_price': 100.0} for t in ('SPY', 'LEV', 'SHORT', 'GONE')]
+
+    report = tracker.analyze(holdings, full=True)
+    matrix = dict(zip(report['tickers'], report['matrix']))
+    column = report['tickers'].index
+
+    assert report['tickers'] == ['LEV', 'SHORT', 'SPY']
+    assert report['excluded'] == ['GONE']
+    assert matrix['SPY'][column('LEV')] == pytest.approx(1.0)
+    assert matrix['SPY'][column('SHORT')] == pytest.approx(-1.0)
+    assert report['top_pairs'][0] == {'pair': ['LEV', 'SPY'], 'correlation': 1.0}
+
+    upper = tracker.analyze(holdings)
+    assert upper['values'] == [matrix['LEV'][1], matrix['LEV'][2], matrix['SHORT'][2]]
+
+
+def test_new_closes_are_appended_not_rebuilt(returns, history_stub):
+    stub = history_stub(returns)
+    stub.visible -= 3
+    tracker = CorrelationTracker(stub, window=60)
+    rolling, _, _ = tracker.state(['SPY', 'IDIO'])
+
+    stub.visible += 3
+    assert tracker._advance(rolling, datetime.date.today().isoformat()) == 3
+
+    rebuilt, _, _ = CorrelationTracker(stub, window=60).state(['SPY', 'IDIO'])
+    assert rolling.last_date == stub.dates[-1]
+    assert np.allclose(rolling.correlation(), rebuilt.correlation())
+
+
+def test_one_holding_is_rejected(returns, history_stub):
+    with pytest.raises(ValueError):
+        CorrelationTracker(history_stub(returns)).analyze([{'ticker': 'SPY', 'shares': 1.0, 'current_price': 1.0}])
@@ -0,0 +1,79 @@
+"""Columnar exports: Arrow and Parquet round trips, in the service and through the routes"""
+import datetime
+import io
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from benchmarks.fixtures import StubStockService  # noqa: E402
+from services.export_service import holdings_table, prices_table, stream  # noqa: E402
+
+
+def holdings():
+    return [{'id': i, 'ticker': ticker, 'shares': shares, 'buy_price': 10.0, 'current_price': price,
+             'purchase_date': '2024-01-02', 'sector': sector, 'currency': 'USD'}
+            for i, (ticker, shares, price, sector) in enumerate([('B', 2.0, 12.5, 'Technology'), ('C', 3.0, 8.0, 'Energy'),
+                                                                 ('D', 1.5, 40.0, 'Technology')], start=1)]
+
+
+def read(data: bytes, output_format: str):
+    if output_format == 'parquet':
+        return pq.read_table(io.BytesIO(data))
+    return pa.ipc.open_stream(data).read_all()
+
+
+@pytest.mark.parametrize('output_format', ['arrow', 'parquet'])
+def test_stream_round_trips_across_batches(output_format):
+    histories = StubStockService().get_close_histories(['B', 'C', 'D'], '2024-01-01')
+    table = prices_table(histories)
+
+    chunks = list(stream(table, output_format, batch_rows=100))
+
+    assert len(chunks) > 3
+    assert read(b''.join(chunks), output_format).equals(table)
+
+
+def test_holdings_table_columns():
+    table = holdings_table(holdings())
+
+    assert table.column('market_value').to_pylist() == [25.0, 24.0, 60.0]
+    assert table.column('purchase_date').to_pylist() == [datetime.date(2024, 1, 2)] * 3
+    assert table.column('sector').type == pa.dictionary(pa.int32(), pa.string())
+    assert table.column('sector').to_pylist() == ['Technology', 'Energy', 'Technology']
+
+
+@pytest.mark.parametrize('output_format', ['arrow', 'parquet'])
+def test_export_routes_round_trip(make_client, output_format):
+    client = make_client(holdings())
+
+    response = client.get(f'/api/export/holdings?format={output_format}')
+    exported = read(response.data, output_format)
+    prices = read(client.get(f'/api/export/prices?format={output_format}&days=30').data, output_format)
+    values = read(client.get(f'/api/export/values?format={output_format}&days=30').data, output_format)
+
+    assert response.status_code == 200
+    assert exported.column('ticker').to_pylist() == ['B', 'C', 'D']
+    assert exported.column('shares').to_pylist() == [2.0, 3.0, 1.5]
+    expected = StubStockService().get_close_histories(['B', 'C', 'D'], (datetime.date.today() - datetime.timedelta(days=30)).isoformat())
+    assert prices.equals(prices_table(expected))
+    assert values.column('value').to_pylist()[-1] == pytest.approx(25.0 + 24.0 + 60.0)
+
+
+@pytest.mark.parametrize('query, status', [('format=csv', 400), ('days=0', 400)])
+def test_invalid_export_options(make_client, query, status):
+    assert make_client(holdings()).get(f'/api/export/values?{query}').status_code == status
+
+
+def test_holdings_version_changes_with_the_holdings(make_client):
+    client = make_client(holdings())
+    before = client.get('/api/export/holdings').headers['X-Holdings-Version']
+
+    client.post('/api/transactions', json={'type': 'buy', 'ticker': 'B', 'shares': 1, 'price': 11.0, 'date': '2024-03-01'})
+
+    assert client.get('/api/export/holdings').headers['X-Holdings-Version'] == str(int(before) + 1)
+
+
+def test_values_export_without_holdings_is_a_404(make_client):
+    assert make_client().get('/api/export/values').status_code == 404
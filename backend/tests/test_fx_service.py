@@ -0,0 +1,84 @@
+"""FX rates: conversion into a base currency, value series and code validation"""
+import datetime
+
+import pytest
+
+from benchmarks.fixtures import StubStockService
+from services.fx_service import FXService, normalize_currency
+from services.risk_service import RiskEngine
+
+USD_PER_UNIT = {'EURUSD=X': 1.10, 'GBPUSD=X': 1.25}
+
+
+class FXStub(StubStockService):
+    """Synthetic closes for stocks, flat rates for currency pairs"""
+
+    def __init__(self):
+        super().__init__()
+        self.fx_requests = []
+
+    def get_close_histories(self, tickers, start_date):
+        pairs = [ticker for ticker in tickers if ticker.endswith('=X')]
+        self.fx_requests.extend(pairs)
+        histories = super().get_close_histories([t for t in tickers if t not in pairs], start_date)
+        dates = [date for date, _ in super().get_close_histories(['AAA'], start_date)['AAA']]
+        histories.update({pair: [(date, USD_PER_UNIT[pair]) for date in dates] for pair in pairs if pair in USD_PER_UNIT})
+        return histories
+
+
+def holding(ticker, currency, shares=10.0, price=100.0):
+    return {'id': 1, 'ticker': ticker, 'shares': shares, 'buy_price': price, 'current_price': price,
+            'purchase_date': '2024-01-02', 'sector': 'Tech', 'currency': currency}
+
+
+def test_rates_convert_through_usd_including_subunits():
+    fx = FXService(FXStub(), 'EUR')
+    rates = fx.rates(['USD', 'GBP', 'GBX', 'EUR'])
+
+    assert rates.tolist() == pytest.approx([1 / 1.10, 1.25 / 1.10, 0.0125 / 1.10, 1.0])
+
+
+def test_single_currency_portfolio_needs_no_rates():
+    stub = FXStub()
+    assert FXService(stub, 'USD').valuation([holding('AAA', 'USD')]) is None
+    assert stub.fx_requests == []
+
+
+@pytest.mark.parametrize('code', ['ABC', 'XYZ', 'US', 'USDX', '', None])
+def test_unknown_codes_are_rejected_before_fetching(code):
+    stub = FXStub()
+    fx = FXService(stub)
+    with pytest.raises(ValueError):
+        fx.rates(['USD'], base=code or 'QQQ')
+    with pytest.raises(ValueError):
+        normalize_currency(code)
+    assert stub.fx_requests == []
+
+
+def test_value_series_converts_each_day_at_its_rate():
+    stub = FXStub()
+    fx = FXService(stub, 'USD')
+    holdings = [holding('AAA', 'USD'), holding('BBB.L', 'GBX', shares=100.0, price=500.0)]
+    convert = lambda currencies, dates: fx.rate_table(currencies, dates, 'USD')
+
+    dates, values = RiskEngine(stub).value_series(holdings, 30, convert)
+    _, unconverted = RiskEngine(stub).value_series(holdings, 30)
+
+    assert len(dates) > 5
+    assert values[-1] == pytest.approx(10 * 100 + 100 * 500 * 0.0125)
+    assert unconverted[-1] == pytest.approx(10 * 100 + 100 * 500)
+    assert dates[-1] <= datetime.date.today().isoformat()
+
+
+def test_routes_report_in_the_requested_currency(make_client):
+    client = make_client([holding('B', 'USD'), {**holding('C', 'GBP'), 'id': 2}], FXStub())
+    expected = (10 * 100 + 10 * 100 * 1.25) / 1.10
+
+    metrics = client.get('/api/portfolio?currency=EUR').get_json()['metrics']
+    page = client.get('/api/holdings?limit=5&sort=-value&currency=EUR').get_json()
+
+    assert metrics['currency'] == 'EUR'
+    assert metrics['total_value'] == pytest.approx(expected, abs=0.01)
+    assert metrics['total_cost'] == pytest.approx(expected, abs=0.01)
+    assert [row['market_value'] for row in page['holdings']] == pytest.approx([1250 / 1.10, 1000 / 1.10], abs=0.01)
+    assert client.get('/api/portfolio?currency=ABC').status_code == 400
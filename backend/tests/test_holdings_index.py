@@ -0,0 +1,117 @@
+"""Holdings index: keyset cursors, prefix orders and incremental updates"""
+import base64
+import json
+import random
+
+import pytest
+
+from models.holdings_index import HoldingsIndex, decode_cursor, encode_cursor
+
+
+def holding(i, ticker, price, sector='Tech'):
+    return {'id': i, 'ticker': ticker, 'shares': 1.0, 'buy_price': 10.0, 'current_price': price,
+            'purchase_date': f'2024-01-{i % 28 + 1:02d}', 'sector': sector}
+
+
+def pages(index, sort, descending=False, sector=None, prefix=None):
+    """Every page's holdings, following the cursors"""
+    rows, cursor = [], None
+    while True:
+        page = index.page(sort, descending, 7, cursor, sector, prefix)
+        rows += page['holdings']
+        cursor = page['next_cursor']
+        if cursor is None:
+            return rows
+
+
+def raw_cursor(*parts):
+    return base64.urlsafe_b64encode(json.dumps(list(parts)).encode()).decode().rstrip('=')
+
+
+@pytest.fixture
+def index():
+    return HoldingsIndex([holding(i, ticker, price)
+                          for i, (ticker, price) in enumerate([('AAA', 12.0), ('BBB', 8.0), ('CCC', 20.0)], start=1)])
+
+
+def test_cursor_pages_through_every_row(index):
+    first = index.page('value', limit=2)
+    second = index.page('value', limit=2, cursor=first['next_cursor'])
+
+    assert [row['ticker'] for row in first['holdings'] + second['holdings']] == ['BBB', 'AAA', 'CCC']
+    assert second['next_cursor'] is None
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    ('value', raw_cursor('value', {'a': 1}, 1)),
+    ('value', raw_cursor('value', 'AAA', 1)),
+    ('value', raw_cursor('value', True, 1)),
+    ('ticker', raw_cursor('ticker', 12.0, 1)),
+    ('date', raw_cursor('date', None, 1)),
+    ('id', raw_cursor('id', 1.5, 1)),
+    ('value', raw_cursor('value', 12.0, '1')),
+    ('value', raw_cursor('value', 12.0, [1])),
+    ('value', 'not-a-cursor'),
+])
+def test_malformed_cursor_is_rejected(index, sort, cursor):
+    with pytest.raises(ValueError):
+        index.page(sort, cursor=cursor)
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('ticker', 'AAA', 3), 'ticker') == ('AAA', 3)
+    with pytest.raises(ValueError, match='sort=ticker'):
+        decode_cursor(encode_cursor('ticker', 'AAA', 3), 'value')
+
+
+def test_prefix_pages_are_sorted_and_filtered():
+    index = HoldingsIndex([holding(i, ticker, price) for i, (ticker, price) in
+                           enumerate([('ABC', 5.0), ('AB', 9.0), ('ABD', 1.0), ('B', 3.0), ('XAB', 7.0)], start=1)])
+
+    assert [row['ticker'] for row in pages(index, 'value', prefix='ab')] == ['ABD', 'ABC', 'AB']
+    assert [row['ticker'] for row in pages(index, 'ticker', True, prefix='AB')] == ['ABD', 'ABC', 'AB']
+    assert index.page('value', prefix='AB')['total'] == 3
+    assert index.page('value', prefix='Q')['holdings'] == []
+
+
+@pytest.mark.parametrize('changes', [3, 60, 200])
+def test_updated_index_pages_like_a_rebuild(changes):
+    rng = random.Random(changes)
+    sectors = ['Tech', 'Energy', 'Health']
+    holdings = [holding(i, f'T{rng.randrange(500):03d}', rng.uniform(1, 50), rng.choice(sectors)) for i in range(300)]
+    index = HoldingsIndex(holdings)
+    queries = [(sort, descending, sector, prefix) for sort in ('id', 'value', 'weight', 'ticker', 'return')
+               for descending in (False, True) for sector, prefix in ((None, None), ('Energy', None), (None, 'T1'))]
+    for query in queries:
+        pages(index, *query)
+
+    next_id = len(holdings)
+    for _ in range(changes):
+        position = rng.randrange(len(holdings))
+        action = rng.random()
+        if action < 0.5:
+            holdings[position] = {**holdings[position], 'current_price': rng.uniform(1, 50)}
+        elif action < 0.7:
+            holdings[position] = {**holdings[position], 'sector': rng.choice(sectors)}
+        elif action < 0.85:
+            holdings.pop(position)
+        else:
+            holdings.append(holding(next_id, f'T{rng.randrange(500):03d}', rng.uniform(1, 50), rng.choice(sectors)))
+            next_id += 1
+    updated = index.updated(holdings)
+    rebuilt = HoldingsIndex(holdings)
+
+    assert updated.metrics == rebuilt.metrics
+    assert len(updated) == len(rebuilt)
+    for query in queries:
+        assert pages(updated, *query) == pages(rebuilt, *query)
+    # The previous index still pages its own snapshot
+    assert len(pages(index, 'value')) == 300
+
+
+def test_unchanged_holdings_reuse_the_index(index):
+    holdings = [dict(row) for row in pages(index, 'id')]
+    for row in holdings:
+        for field in ('market_value', 'return_pct', 'weight'):
+            del row[field]
+    assert index.updated(holdings) is index
@@ -0,0 +1,83 @@
+"""Bulk import: CSV and JSON bodies, batched price lookups and all-or-nothing validation"""
+import io
+
+import pytest
+
+from benchmarks.fixtures import StubStockService
+
+CSV = 'Symbol,Quantity,Trade_Date,Price\nB,10,2024-01-02,20\nB,30,2024-02-01,40\nC,5,2024-03-04,12.5\n'
+
+
+def positions(client):
+    return {p['ticker']: p for p in client.get('/api/positions').get_json()['positions']}
+
+
+@pytest.mark.parametrize('upload', ['multipart', 'text/csv'])
+def test_csv_with_brokerage_column_names(make_client, upload):
+    client = make_client()
+    if upload == 'multipart':
+        response = client.post('/api/holdings/import', data={'file': (io.BytesIO(CSV.encode()), 'lots.csv')},
+                               content_type='multipart/form-data')
+    else:
+        response = client.post('/api/holdings/import', data=CSV, content_type='text/csv')
+
+    body = response.get_json()
+    assert response.status_code == 201
+    assert (body['lots_imported'], body['positions_created'], body['price_lookups']) == (3, 2, 0)
+    held = positions(client)
+    assert held['B']['quantity'] == 40
+    assert held['B']['average_cost'] == pytest.approx((10 * 20 + 30 * 40) / 40)
+
+
+def test_missing_prices_are_resolved_in_one_lookup_per_ticker(make_client):
+    stub = StubStockService()
+    client = make_client(stock_service=stub)
+
+    body = client.post('/api/holdings/import', json={'holdings': [
+        {'ticker': 'B', 'shares': 1, 'purchase_date': '2024-03-02'},
+        {'ticker': 'B', 'shares': 1, 'purchase_date': '2024-03-01'},
+        {'ticker': 'C', 'shares': 2, 'purchase_date': '2024-03-04', 'buy_price': 9}]}).get_json()
+
+    assert body['price_lookups'] == 1
+    # Saturday's lot is priced at Friday's close
+    friday = stub.get_historical_prices_bulk({'B': ['2024-03-01']})['B']['prices']['2024-03-01']
+    assert positions(client)['B']['average_cost'] == pytest.approx(friday, abs=0.01)
+
+
+def test_merges_into_an_existing_position(make_client):
+    client = make_client([{'id': 1, 'ticker': 'B', 'shares': 10.0, 'buy_price': 10.0, 'current_price': 12.0,
+                           'purchase_date': '2024-01-02', 'sector': 'Technology', 'currency': 'USD'}])
+
+    body = client.post('/api/holdings/import', json=[{'ticker': 'B', 'shares': 10, 'purchase_date': '2024-02-01', 'buy_price': 20}]).get_json()
+
+    assert (body['positions_created'], body['positions_merged']) == (0, 1)
+    assert positions(client)['B']['average_cost'] == pytest.approx(15.0)
+
+
+ROWS = [
+    {'ticker': 'B', 'shares': 1, 'purchase_date': '2024-01-02', 'buy_price': 10},
+    {'ticker': 'B', 'shares': -1, 'purchase_date': '2024-01-02', 'buy_price': 10},
+    {'ticker': 'ZZZZ', 'shares': 1, 'purchase_date': '2024-01-02', 'buy_price': 10},
+    {'ticker': 'C', 'shares': 1, 'purchase_date': '01/02/2024', 'buy_price': 10},
+    {'ticker': 'C', 'shares': 'many', 'purchase_date': '2024-01-02', 'buy_price': 10},
+]
+
+
+def test_any_invalid_row_rejects_the_import(make_client):
+    client = make_client()
+
+    response = client.post('/api/holdings/import', json=ROWS)
+
+    assert response.status_code == 400
+    assert [error['row'] for error in response.get_json()['errors']] == [2, 3, 4, 5]
+    assert 'Unknown ticker symbol "ZZZZ"' in response.get_json()['errors'][1]['error']
+    assert positions(client) == {}
+
+
+def test_skip_invalid_imports_the_valid_rows(make_client):
+    client = make_client()
+
+    body = client.post('/api/holdings/import?skip_invalid=true', json=ROWS).get_json()
+
+    assert (body['lots_imported'], body['rows_skipped']) == (1, 4)
+    assert list(positions(client)) == ['B']
@@ -0,0 +1,75 @@
+"""Intraday ticks: ring buffer wraparound, the since filter and the sparkline route"""
+import pytest
+
+from services.intraday_service import TickStore
+
+
+def record_ticks(store, ticker, ticks):
+    for timestamp, price in ticks:
+        store.record({ticker: price}, timestamp)
+
+
+def test_full_ring_keeps_the_newest_ticks_in_order():
+    store = TickStore(capacity=4, min_interval=0)
+    record_ticks(store, 'aaa', [(1000 + 10 * i, 100.0 + i) for i in range(10)])
+
+    times, prices = store.series('AAA')
+
+    assert times.tolist() == [1060, 1070, 1080, 1090]
+    assert prices.tolist() == [106.0, 107.0, 108.0, 109.0]
+
+
+@pytest.mark.parametrize('count', [3, 4, 9])
+def test_since_filter_across_the_wrap(count):
+    store = TickStore(capacity=4, min_interval=0)
+    record_ticks(store, 'AAA', [(1000 + 10 * i, 100.0 + i) for i in range(count)])
+    kept = [1000 + 10 * i for i in range(max(count - 4, 0), count)]
+
+    for since in (999, kept[1], kept[1] - 5, kept[-1] + 1):
+        times, prices = store.series('AAA', since)
+        assert times.tolist() == [t for t in kept if t >= since]
+        assert prices.tolist() == [100.0 + (t - 1000) / 10 for t in kept if t >= since]
+
+
+def test_repeats_and_bursts_do_not_flush_the_buffer():
+    store = TickStore(capacity=4, min_interval=5)
+
+    stored = [store.record({'AAA': price}, timestamp)
+              for timestamp, price in [(1000, 10.0), (1010, 10.0), (1011, 10.5), (1012, 11.0), (1020, 12.0)]]
+
+    assert stored == [1, 0, 1, 1, 1]
+    times, prices = store.series('AAA')
+    assert times.tolist() == [1000, 1011, 1020]
+    assert prices.tolist() == [10.0, 11.0, 12.0]
+
+
+def test_time_never_steps_back():
+    store = TickStore(capacity=8, min_interval=0)
+    record_ticks(store, 'AAA', [(1000, 1.0), (990, 2.0), (1005, 3.0)])
+
+    # An out-of-order quote updates the last tick rather than adding an earlier one
+    times, prices = store.series('AAA')
+    assert times.tolist() == [1000, 1005]
+    assert prices.tolist() == [2.0, 3.0]
+
+
+def test_least_recently_quoted_ticker_is_dropped():
+    store = TickStore(capacity=4, max_tickers=2)
+
+    store.record({'AAA': 1.0, 'BBB': 2.0, 'CCC': None}, 1000)
+    store.record({'AAA': 1.5}, 1100)
+    store.record({'DDD': 3.0}, 1200)
+
+    assert store.series('BBB') is None and store.series('CCC') is None
+    assert store.series('AAA')[1].tolist() == [1.0, 1.5]
+
+
+def test_intraday_route(make_client):
+    client = make_client()
+
+    rows = client.get('/api/intraday/b').get_json()
+    columns = client.get('/api/intraday/B?format=columns&minutes=5').get_json()
+
+    assert rows['ticker'] == 'B' and rows['total_points'] == 1
+    assert rows['ticks'][0]['price'] == columns['ticks']['price'][0]
+    assert client.get('/api/intraday/B?minutes=0').status_code == 400
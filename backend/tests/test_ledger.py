@@ -0,0 +1,65 @@
+"""Transaction ledger: date validation and FIFO lot order"""
+import datetime
+
+import pytest
+
+from models.ledger import TransactionLedger
+
+
+def buy(shares, price, date, ticker='AAA'):
+    return {'type': 'buy', 'ticker': ticker, 'shares': shares, 'price': price, 'date': date}
+
+
+def sell(shares, price, date, ticker='AAA'):
+    return {'type': 'sell', 'ticker': ticker, 'shares': shares, 'price': price, 'date': date}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return TransactionLedger(str(tmp_path / 'ledger.jsonl'))
+
+
+def test_out_of_order_buys_are_sold_by_purchase_date(ledger):
+    ledger.append([buy(10, 150, '2024-06-15')])
+    ledger.append([buy(10, 100, '2024-01-06'), buy(10, 120, '2024-02-06')])
+    position = ledger.append([sell(10, 130, '2024-05-01')])['AAA']
+
+    assert [lot[2] for lot in position.lots] == ['2024-02-06', '2024-06-15']
+    assert position.realized_pnl == pytest.approx(10 * (130 - 100))
+    assert position.quantity == pytest.approx(20)
+
+
+def test_sell_of_shares_bought_after_its_date_is_rejected(ledger):
+    ledger.append([buy(10, 100, '2024-06-15')])
+    with pytest.raises(ValueError, match='held by then'):
+        ledger.append([sell(5, 110, '2024-05-01')])
+    assert ledger.position('AAA').quantity == pytest.approx(10)
+
+
+def test_lot_order_survives_compaction_and_reload(ledger, tmp_path):
+    ledger.append([buy(1, 30, '2024-03-01'), buy(1, 10, '2024-01-01'), buy(1, 20, '2024-02-01')])
+    ledger.compact()
+    reloaded = TransactionLedger(str(tmp_path / 'ledger.jsonl'))
+    assert [lot[2] for lot in reloaded.position('AAA').lots] == ['2024-01-01', '2024-02-01', '2024-03-01']
+
+
+@pytest.mark.parametrize('date', [None, '', 'garbage', '2024-13-01',
+                                  (datetime.date.today() + datetime.timedelta(days=1)).isoformat()])
+def test_invalid_dates_reject_the_whole_batch(ledger, date):
+    with pytest.raises(ValueError):
+        ledger.append([buy(1, 10, '2024-01-02'), buy(1, 10, date)])
+    assert ledger.position('AAA') is None
+
+
+def test_append_after_a_torn_final_line_survives_reload(tmp_path):
+    path = tmp_path / 'ledger.jsonl'
+    TransactionLedger(str(path)).append([buy(1, 10, '2024-01-02', ticker='AAPL')])
+    with open(path, 'a') as file:
+        file.write('{"type":"buy","ticker":"TSLA","sha')
+
+    ledger = TransactionLedger(str(path))
+    ledger.append([buy(2, 20, '2024-01-03', ticker='MSFT')])
+    reloaded = TransactionLedger(str(path))
+
+    assert sorted(reloaded.positions()) == ['AAPL', 'MSFT']
+    assert path.read_text().endswith('\n')
@@ -0,0 +1,105 @@
+"""Optimizer: projections, closed-form optima, caps and rebalancing trades"""
+import numpy as np
+import pytest
+
+from services.optimizer_service import ConstraintSet, PortfolioOptimizer, project_capped_simplex, shrunk_covariance
+from services.risk_service import RiskEngine
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(5)
+    # Exact sample means, each about four times the variance, so every holding is in the tangency portfolio
+    series = {}
+    for ticker, mean, vol in [('A', 0.0004, 0.010), ('B', 0.0009, 0.015), ('C', 0.0016, 0.020), ('D', 0.0006, 0.012)]:
+        noise = rng.normal(0, vol, 250)
+        series[ticker] = noise - noise.mean() + mean
+    return series
+
+
+@pytest.fixture
+def optimizer(returns, history_stub):
+    return PortfolioOptimizer(RiskEngine(history_stub(returns), window=250), tolerance=1e-12, max_iter=20000)
+
+
+def holdings(sectors=('Tech', 'Tech', 'Energy', 'Energy')):
+    return [{'ticker': ticker, 'shares': 10.0, 'current_price': 100.0, 'sector': sector}
+            for ticker, sector in zip('ABCD', sectors)]
+
+
+def model_cov(returns, tickers='ABCD'):
+    return shrunk_covariance(np.column_stack([returns[t] for t in tickers]))[0]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_capped_simplex_projection_is_the_nearest_feasible_point(seed):
+    rng = np.random.default_rng(seed)
+    v = rng.normal(0, 1, 8)
+
+    w = project_capped_simplex(v, 0.3)
+
+    assert w.sum() == pytest.approx(1.0)
+    assert w.min() >= 0 and w.max() <= 0.3 + 1e-12
+    # No feasible point from random moves within the set is nearer to v
+    for _ in range(200):
+        i, j = rng.choice(8, 2, replace=False)
+        step = min(rng.uniform(0, 0.05), w[i], 0.3 - w[j])
+        other = w.copy()
+        other[i] -= step
+        other[j] += step
+        assert np.sum((other - v) ** 2) >= np.sum((w - v) ** 2) - 1e-12
+
+
+def test_infeasible_caps_are_rejected():
+    with pytest.raises(ValueError, match='infeasible'):
+        ConstraintSet(['Tech', 'Tech'], 0.4, {})
+    with pytest.raises(ValueError, match='infeasible'):
+        ConstraintSet(['Tech', 'Energy'], 1.0, {'Tech': 0.3, 'Energy': 0.3})
+
+
+def test_min_variance_matches_the_closed_form(optimizer, returns):
+    result = optimizer.optimize(holdings())
+
+    cov = model_cov(returns)
+    expected = np.linalg.solve(cov, np.ones(4))
+    expected /= expected.sum()
+    assert expected.min() > 0
+    assert [w['target'] for w in result['weights']] == pytest.approx(expected, abs=1e-3)
+    assert result['solver']['converged']
+    assert result['target']['volatility'] <= result['current']['volatility']
+
+
+def test_max_sharpe_matches_the_tangency_portfolio(optimizer, returns):
+    result = optimizer.optimize(holdings(), objective='max_sharpe')
+
+    mean = np.array([returns[t].mean() for t in 'ABCD'])
+    expected = np.linalg.solve(model_cov(returns), mean)
+    expected /= expected.sum()
+    assert expected.min() > 0
+    assert [w['target'] for w in result['weights']] == pytest.approx(expected, abs=2e-3)
+
+
+def test_position_and_sector_caps_bind(optimizer):
+    result = optimizer.optimize(holdings(), max_weight=0.4, sector_caps={'Tech': 0.5})
+
+    assert max(w['target'] for w in result['weights']) <= 0.4 + 1e-4
+    assert result['sector_weights']['Tech'] == pytest.approx(0.5, abs=1e-4)
+    assert result['constraints'] == {'max_weight': 0.4, 'sector_caps': {'Tech': 0.5}}
+
+
+def test_trades_reach_the_target_weights(optimizer):
+    result = optimizer.optimize(holdings(), min_trade_value=0)
+
+    targets = {w['ticker']: w['target'] for w in result['weights']}
+    for trade in result['trades']:
+        signed = trade['shares'] if trade['action'] == 'buy' else -trade['shares']
+        assert (10.0 + signed) * 100.0 / result['covered_value'] == pytest.approx(targets[trade['ticker']], abs=1e-3)
+
+
+def test_second_call_starts_from_the_previous_solution(optimizer):
+    first = optimizer.optimize(holdings(), max_weight=0.5)
+    second = optimizer.optimize(holdings(), max_weight=0.45)
+
+    assert not first['solver']['warm_start']
+    assert second['solver']['warm_start']
+    assert second['solver']['iterations'] < first['solver']['iterations']
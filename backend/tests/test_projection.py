@@ -0,0 +1,55 @@
+"""Monte Carlo projection: reproducibility, band ordering and long horizons"""
+import pytest
+
+from benchmarks.fixtures import StubStockService, generate_holdings
+from services import projection_service
+from services.projection_service import ProjectionEngine
+from services.risk_service import RiskEngine
+
+PERCENTILES = ('p5', 'p25', 'p50', 'p75', 'p95')
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProjectionEngine(RiskEngine(StubStockService()), max_workers=1, chunk_paths=2_000)
+
+
+@pytest.fixture(scope='module')
+def holdings():
+    return generate_holdings(10)
+
+
+@pytest.mark.parametrize('method', ['normal', 'bootstrap'])
+def test_same_seed_gives_same_bands(engine, holdings, method):
+    first = engine.project(holdings, horizon=126, paths=5_000, method=method, seed=7)
+    second = engine.project(holdings, horizon=126, paths=5_000, method=method, seed=7)
+    other = engine.project(holdings, horizon=126, paths=5_000, method=method, seed=8)
+
+    assert first['bands'] == second['bands']
+    assert first['terminal'] == second['terminal']
+    assert first['bands'] != other['bands']
+
+
+@pytest.mark.parametrize('method', ['normal', 'bootstrap'])
+def test_bands_are_ordered_by_percentile(engine, holdings, method):
+    result = engine.project(holdings, horizon=252, paths=5_000, method=method, seed=1, points=20)
+
+    assert [band['day'] for band in result['bands']][-1] == 252
+    for band in result['bands']:
+        values = [band[pct] for pct in PERCENTILES]
+        assert values == sorted(values)
+    # Uncertainty grows with the horizon
+    spread = [band['p95'] - band['p5'] for band in result['bands']]
+    assert spread[-1] > spread[0]
+
+
+@pytest.mark.parametrize('method', ['normal', 'bootstrap'])
+def test_simulating_in_blocks_keeps_the_distribution(engine, holdings, method, monkeypatch):
+    monkeypatch.setattr(projection_service, 'BLOCK_ELEMENTS', 2_000 * 2520)
+    whole = engine.project(holdings, horizon=2520, paths=4_000, method=method, seed=3, points=40)
+    monkeypatch.setattr(projection_service, 'BLOCK_ELEMENTS', 2_000 * 50)
+    blocked = engine.project(holdings, horizon=2520, paths=4_000, method=method, seed=3, points=40)
+
+    assert blocked['bands'][-1]['day'] == 2520
+    for pct in PERCENTILES:
+        assert blocked['bands'][-1][pct] == pytest.approx(whole['bands'][-1][pct], rel=0.1)
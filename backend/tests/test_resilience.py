@@ -0,0 +1,50 @@
+"""Circuit breaker trial bookkeeping and rate limiter pacing"""
+import time
+
+import pytest
+
+from services.resilience import CircuitBreaker, RateLimiter
+
+
+def open_breaker(cooldown=0.05):
+    breaker = CircuitBreaker('test', failure_threshold=2, cooldown=cooldown)
+    for _ in range(2):
+        breaker.record(False, breaker.allow())
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_half_open_admits_one_trial():
+    breaker = open_breaker()
+    time.sleep(0.06)
+
+    trial = breaker.allow()
+    assert trial is not None
+    assert breaker.allow() is None
+    breaker.record(True, trial)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_call_from_before_opening_does_not_end_the_trial():
+    breaker = CircuitBreaker('test', failure_threshold=2, cooldown=0.05)
+    slow = breaker.allow()
+    for _ in range(2):
+        breaker.record(False, breaker.allow())
+    time.sleep(0.06)
+
+    trial = breaker.allow()
+    breaker.record(False, slow)
+    assert breaker.allow() is None
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    assert breaker.record(False, trial)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_rate_limiter_allows_a_burst_then_paces():
+    limiter = RateLimiter(rate=20, burst=3)
+    waits = [limiter.acquire() for _ in range(5)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.05, abs=0.01)
+    assert waits[4] == pytest.approx(0.05, abs=0.01)
@@ -0,0 +1,76 @@
+"""Risk engine: volatility, beta, VaR and drawdown against hand-computed values"""
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from services.risk_service import TRADING_DAYS_PER_YEAR, RiskEngine
+
+
+def holding(ticker, shares=10.0, price=100.0):
+    return {'ticker': ticker, 'shares': shares, 'current_price': price}
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(7)
+    market = rng.normal(0.0005, 0.01, 60)
+    return {'SPY': market, 'LEV': 2 * market, 'IDIO': rng.normal(0, 0.02, 60)}
+
+
+def test_single_holding_matches_numpy(returns, history_stub):
+    engine = RiskEngine(history_stub(returns), window=60)
+
+    report = engine.analyze([holding('IDIO')])
+    series = returns['IDIO']
+
+    assert report['observations'] == 60
+    assert report['portfolio']['volatility_annual'] == pytest.approx(series.std(ddof=1) * TRADING_DAYS_PER_YEAR ** 0.5, abs=1e-4)
+    assert report['portfolio']['var']['historical']['percent'] == pytest.approx(max(-np.quantile(series, 0.05), 0), abs=1e-5)
+    parametric = -(series.mean() + NormalDist().inv_cdf(0.05) * series.std(ddof=1))
+    assert report['portfolio']['var']['parametric']['percent'] == pytest.approx(parametric, abs=1e-5)
+
+
+def test_beta_and_risk_contributions(returns, history_stub):
+    engine = RiskEngine(history_stub(returns), window=60)
+
+    report = engine.analyze([holding('SPY'), holding('LEV')])
+    betas = {row['ticker']: row['beta'] for row in report['holdings']}
+
+    assert betas == pytest.approx({'SPY': 1.0, 'LEV': 2.0})
+    assert report['portfolio']['beta'] == pytest.approx(1.5)
+    assert sum(row['risk_contribution'] for row in report['holdings']) == pytest.approx(1.0, abs=1e-3)
+    # LEV moves twice as much, so it carries two thirds of the variance
+    assert report['holdings'][0]['ticker'] == 'LEV'
+
+
+def test_max_drawdown_finds_peak_and_trough(history_stub):
+    stub = history_stub({'SPY': np.r_[[0.1] * 5, [-0.1] * 3, [0.01] * 4]})
+    engine = RiskEngine(stub, window=12)
+
+    drawdown = engine.analyze([holding('SPY')])['portfolio']['max_drawdown']
+
+    assert drawdown['percent'] == pytest.approx(0.9 ** 3 - 1, abs=1e-4)
+    assert (drawdown['peak_date'], drawdown['trough_date']) == (stub.dates[5], stub.dates[8])
+
+
+def test_tickers_without_history_are_excluded(returns, history_stub):
+    engine = RiskEngine(history_stub(returns), window=60)
+
+    report = engine.analyze([holding('IDIO'), holding('GONE', price=50.0)])
+
+    assert report['excluded'] == ['GONE']
+    assert report['portfolio']['value'] == 1500.0
+    assert report['portfolio']['covered_value'] == 1000.0
+    with pytest.raises(ValueError):
+        engine.analyze([holding('GONE')])
+
+
+def test_value_series_ends_at_the_current_value(returns, history_stub):
+    engine = RiskEngine(history_stub(returns), window=60)
+
+    dates, series = engine.value_series([holding('IDIO', shares=3, price=250.0)], days=120)
+
+    assert dates[-1] == history_stub(returns).dates[-1]
+    assert series[-1] == pytest.approx(750.0)
+    assert np.allclose(series[1:] / series[:-1] - 1, returns['IDIO'][-len(series) + 1:])
@@ -0,0 +1,66 @@
+"""History series: LTTB downsampling and the columnar and MessagePack formats"""
+import numpy as np
+import pytest
+
+from services.series import lttb_indices
+
+
+def holdings():
+    return [{'id': 1, 'ticker': 'B', 'shares': 4.0, 'buy_price': 50.0, 'current_price': 60.0,
+             'purchase_date': '2024-01-02', 'sector': 'Technology', 'currency': 'USD'}]
+
+
+def test_lttb_keeps_both_ends_and_the_spikes():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[321] = 40.0
+    y[777] = -40.0
+
+    keep = lttb_indices(x, y, 50)
+
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert {321, 777} <= set(keep.tolist())
+    assert len(lttb_indices(x, y, 1000)) == 1000
+
+
+def test_downsampled_history_keeps_the_first_and_last_day(make_client):
+    client = make_client()
+    full = client.get('/api/stock-history/B?period=1y').get_json()['history']
+
+    sampled = client.get('/api/stock-history/B?period=1y&points=40').get_json()['history']
+
+    assert len(sampled) == 40
+    assert (sampled[0], sampled[-1]) == (full[0], full[-1])
+    assert all(row in full for row in sampled)
+
+
+def test_msgpack_carries_the_same_columns_as_json(make_client):
+    msgpack = pytest.importorskip('msgpack')
+    client = make_client()
+    columns = client.get('/api/stock-history/B?period=3mo&points=30&format=columns').get_json()
+
+    response = client.get('/api/stock-history/B?period=3mo&points=30&format=msgpack')
+
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.data) == columns
+    assert columns['total_points'] > 30
+    assert len(columns['history']['date']) == len(columns['history']['price']) == 30
+
+
+def test_portfolio_history_formats(make_client):
+    client = make_client(holdings())
+
+    rows = client.get('/api/portfolio-history?days=120').get_json()
+    columns = client.get('/api/portfolio-history?days=120&points=20&format=columns').get_json()
+
+    assert rows[-1]['value'] == pytest.approx(240.0)
+    assert columns['total_points'] == len(rows)
+    assert columns['history']['date'][0] == rows[0]['date']
+    assert columns['history']['value'][-1] == pytest.approx(240.0)
+
+
+@pytest.mark.parametrize('query', ['format=xml', 'points=2', 'points=many'])
+def test_invalid_options_are_a_400(make_client, query):
+    assert make_client().get(f'/api/stock-history/B?{query}').status_code == 400
@@ -0,0 +1,59 @@
+"""Split restatement: trades recorded around a split, and the demo holdings"""
+import pytest
+
+from benchmarks.fixtures import StubStockService
+from models import Portfolio
+from services import CorporateActions
+
+
+class SplitStockService(StubStockService):
+    """Stub provider where B split 4-for-1 on 2024-06-10"""
+
+    def get_corporate_actions(self, tickers):
+        return {ticker: {'splits': [('2024-06-10', 4.0)] if ticker == 'B' else [], 'dividends': []}
+                for ticker in tickers}
+
+
+def holding(shares, buy_price, purchase_date):
+    return {'id': 1, 'ticker': 'B', 'shares': shares, 'buy_price': buy_price, 'current_price': 120.0,
+            'purchase_date': purchase_date, 'sector': 'Technology', 'currency': 'USD'}
+
+
+def position_after_buy(client):
+    response = client.post('/api/transactions',
+                           json={'type': 'buy', 'ticker': 'B', 'shares': 5, 'price': 120.0, 'date': '2024-10-01'})
+    assert response.status_code == 201
+    return client.get('/api/portfolio').get_json()['holdings'][0]
+
+
+def test_buy_after_a_split_restates_a_holding_bought_before_it(make_client):
+    client = make_client([holding(10, 400.0, '2024-01-02')], SplitStockService())
+
+    row = position_after_buy(client)
+
+    # 10 @ 400 before the split is 40 @ 100 after it
+    assert row['shares'] == pytest.approx(45)
+    assert row['buy_price'] == pytest.approx((4000 + 600) / 45, abs=0.01)
+
+
+def test_buy_after_a_split_leaves_a_holding_bought_after_it(make_client):
+    client = make_client([holding(10, 100.0, '2024-08-01')], SplitStockService())
+
+    row = position_after_buy(client)
+
+    assert row['shares'] == pytest.approx(15)
+    assert row['buy_price'] == pytest.approx((1000 + 600) / 15, abs=0.01)
+
+
+def test_demo_holdings_are_not_restated(tmp_path):
+    def fetch(tickers):
+        # NVDA 10-for-1 and AAPL 4-for-1, GOOGL 20-for-1, TSLA 3-for-1 before the demo purchases
+        splits = {'NVDA': ('2024-06-10', 10.0), 'AAPL': ('2020-08-31', 4.0), 'GOOGL': ('2022-07-18', 20.0),
+                  'TSLA': ('2022-08-25', 3.0)}
+        return {ticker: {'splits': [splits[ticker]] if ticker in splits else [], 'dividends': []} for ticker in tickers}
+
+    holdings = Portfolio(str(tmp_path / 'holdings.csv')).load_holdings()
+    actions = CorporateActions(str(tmp_path / 'actions.db'), fetch)
+    assert actions.ensure([h['ticker'] for h in holdings])
+
+    assert actions.adjust_holdings(holdings) == holdings
@@ -0,0 +1,57 @@
+"""Trading calendar: NYSE sessions, snapping and cache lifetimes against published schedules"""
+import datetime
+
+import pytest
+
+from services.trading_calendar import TradingCalendar, get_calendar
+
+
+def eastern(calendar, text):
+    return datetime.datetime.fromisoformat(text).replace(tzinfo=calendar.tz)
+
+
+@pytest.mark.parametrize('year, count', [(2022, 251), (2023, 250), (2024, 252)])
+def test_session_counts_match_the_exchange(year, count):
+    assert len(get_calendar().sessions_between(f'{year}-01-01', f'{year}-12-31')) == count
+
+
+@pytest.mark.parametrize('day', ['2024-03-29', '2024-06-19', '2022-06-20', '2022-12-26', '2012-10-29', '2025-01-09'])
+def test_holidays_and_closures_are_not_sessions(day):
+    assert not get_calendar().is_session(day)
+
+
+def test_dates_snap_to_sessions():
+    calendar = get_calendar()
+
+    # Good Friday 2024 closes the long weekend
+    assert calendar.previous_session('2024-03-31').isoformat() == '2024-03-28'
+    assert calendar.previous_session('2024-03-28').isoformat() == '2024-03-28'
+    assert calendar.next_session('2024-03-28').isoformat() == '2024-04-01'
+    assert calendar.offset('2024-07-06', -1).isoformat() == '2024-07-03'
+    assert [d.isoformat() for d in calendar.sessions_after('2024-12-23', 3)] == ['2024-12-24', '2024-12-26', '2024-12-27']
+
+
+def test_early_close_moves_the_last_close():
+    calendar = get_calendar()
+
+    assert calendar.session_close('2024-07-03').time() == datetime.time(13, 0)
+    assert calendar.last_close(eastern(calendar, '2024-07-03T12:59')).isoformat() == '2024-07-02'
+    assert calendar.last_close(eastern(calendar, '2024-07-03T13:00')).isoformat() == '2024-07-03'
+
+
+def test_cache_lifetimes():
+    calendar = get_calendar()
+    saturday = eastern(calendar, '2024-03-30T12:00')
+
+    assert calendar.quote_ttl(60, eastern(calendar, '2024-04-01T10:00')) == 60
+    # Closed until Monday's open
+    assert calendar.quote_ttl(60, saturday) == (eastern(calendar, '2024-04-01T09:30') - saturday).total_seconds()
+    assert calendar.close_ttl('2024-03-28', 60, saturday) is None
+    assert calendar.close_ttl('2024-04-01', 60, saturday) is not None
+
+
+def test_dates_past_the_precomputed_range_step_over_weekends():
+    calendar = TradingCalendar(2020, 2021)
+
+    assert calendar.offset('2021-12-31', 1).isoformat() == '2022-01-03'
+    assert calendar.previous_session('2022-01-09').isoformat() == '2022-01-07'
@@ -0,0 +1,56 @@
+"""Unified stock service: per-provider circuit breakers and hedging"""
+import time
+
+from services.unified_stock_service import UnifiedStockService
+
+
+class FakeProvider:
+    """Quote provider answering `price` after `delay` seconds"""
+
+    def __init__(self, price=None, delay=0.0):
+        self.price = price
+        self.delay = delay
+        self.calls = 0
+
+    def get_real_time_price(self, ticker):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.price
+
+
+def service(yahoo, alpha_vantage=None, failures=2):
+    stock_service = UnifiedStockService(None, breaker_failures=failures, breaker_cooldown=60,
+                                        hedge_max_delay=0.02)
+    stock_service.yahoo = yahoo
+    if alpha_vantage is not None:
+        stock_service.alpha_vantage = alpha_vantage
+        stock_service.use_alpha_vantage = True
+    return stock_service
+
+
+def test_yahoo_breaker_fails_fast_once_open():
+    yahoo = FakeProvider(price=None)
+    stock_service = service(yahoo)
+    for _ in range(4):
+        assert stock_service.get_real_time_price('AAA') is None
+
+    assert yahoo.calls == 2
+    assert stock_service.breakers['yahoo'].state == 'open'
+
+
+def test_open_yahoo_breaker_skips_the_hedge():
+    alpha_vantage = FakeProvider(price=101.0, delay=0.1)
+    stock_service = service(FakeProvider(price=None), alpha_vantage)
+    stock_service.breakers['yahoo'].record(False, stock_service.breakers['yahoo'].allow())
+    stock_service.breakers['yahoo'].record(False, stock_service.breakers['yahoo'].allow())
+
+    assert stock_service.get_real_time_price('AAA') == 101.0
+    assert stock_service.yahoo.calls == 0
+
+
+def test_slow_alpha_vantage_is_hedged_by_yahoo():
+    stock_service = service(FakeProvider(price=99.0), FakeProvider(price=101.0, delay=0.5))
+
+    start = time.monotonic()
+    assert stock_service.get_real_time_price('AAA') == 99.0
+    assert time.monotonic() - start < 0.3